@@ -0,0 +1,41 @@
+"""Génération d'itinéraires alternatifs: points de passage déterministes et diversité par recouvrement"""
+from math import sqrt
+
+# Décalages perpendiculaires au trajet, en fraction de la distance directe
+VIA_OFFSETS = (0.25, -0.25, 0.45, -0.45, 0.65, -0.65)
+
+# Au-delà de cette part de longueur commune avec un itinéraire déjà retenu, on rejette
+MAX_OVERLAP = 0.8
+
+
+def generate_via_points(start, end, num_points=5):
+    """Points de passage de part et d'autre du milieu du trajet (déterministes).
+
+    Les points sont placés sur la médiatrice du segment départ-arrivée, à
+    des distances croissantes et en alternant les côtés: chaque requête
+    OSRM a ainsi de bonnes chances de produire un tracé différent.
+    """
+    mid_lat = (start["lat"] + end["lat"]) / 2
+    mid_lon = (start["lon"] + end["lon"]) / 2
+    dlat = end["lat"] - start["lat"]
+    dlon = end["lon"] - start["lon"]
+    norm = sqrt(dlat * dlat + dlon * dlon)
+    if norm == 0:
+        return []
+
+    # Vecteur unitaire perpendiculaire (en degrés, suffisant près de l'équateur)
+    perp_lat, perp_lon = -dlon / norm, dlat / norm
+    points = []
+    for offset in VIA_OFFSETS[:num_points]:
+        points.append({
+            "lat": round(mid_lat + perp_lat * offset * norm, 6),
+            "lon": round(mid_lon + perp_lon * offset * norm, 6),
+        })
+    return points
+
+
+def is_diverse(shape, accepted_shapes, max_overlap=MAX_OVERLAP):
+    """Vrai si le tracé (RouteGeometry) ne recouvre aucun tracé déjà retenu au-delà de max_overlap"""
+    if len(shape) < 2:
+        return False
+    return all(shape.overlap(other) <= max_overlap for other in accepted_shapes)
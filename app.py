@@ -1,15 +1,47 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
-import requests
-import random
+from flask import Flask, Response, g, redirect, render_template, request, jsonify, send_from_directory, stream_with_context
 import base64
+import contextvars
 import os
-from math import radians, sin, cos, sqrt, atan2
+import time
+import click
+import gzip
+import json
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+import numpy as np
+
+from geo import calculate_distance, haversine_km
+from geometry import RouteGeometry
+from alternatives import generate_via_points, is_diverse
+from places import PlaceStore
+from osrm_client import DeadlineExceededError, OSRMClient
+from local_router import LocalRouter, RoadGraph
+from contraction import build_contraction_hierarchy, save_index
+from route_cache import create_route_cache
+from singleflight import SingleFlight
+from metrics import REGISTRY, SamplingProfiler, end_trace, server_timing, stage, start_trace
+from precompute import PrecomputedRoutes, RouteBundle, build_landmark_artifact, build_route_bundle, save_artifact
+from traffic import TrafficModel, build_profiles, parse_depart_at, read_observations
+from tiles import TileStore, build_mbtiles, places_bbox, tile_count, tile_url
+from geo_encoding import GEOMETRY_FORMATS, format_geometry
+
+try:
+    import brotli
+except ImportError:  # compression brotli optionnelle
+    brotli = None
 
 app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
+app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
+# Réponses JSON compressées (gzip, ou brotli si installé) au-delà de cette taille
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_MIMETYPES = ("application/json", "application/x-ndjson", "text/html", "text/css",
+                      "text/javascript", "application/javascript")
+# Les URLs d'images sont versionnées (?v=mtime): on peut les garder en cache longtemps
+IMAGE_CACHE_MAX_AGE = int(os.environ.get("IMAGE_CACHE_MAX_AGE", str(365 * 24 * 3600)))
 
+@lru_cache(maxsize=64)
 def image_to_base64(image_path):
-    """Convertit une image en base64 avec gestion d'erreur"""
+    """Convertit une image en base64 avec gestion d'erreur (mémoïsé, à la demande)"""
     try:
         if os.path.exists(image_path):
             with open(image_path, "rb") as image_file:
@@ -31,12 +63,21 @@ def image_to_base64(image_path):
         print(f"Erreur conversion image {image_path}: {e}")
         return None
 
-def get_landmark_image(landmark_name, local_path=None):
-    """Retourne l'image d'un landmark avec fallback"""
-    if local_path:
-        base64_image = image_to_base64(local_path)
-        if base64_image:
-            return base64_image
+def inline_image(image_url):
+    """Remplace une URL /uploads/... par l'image encodée en base64 (sinon inchangée)"""
+    if not image_url or not image_url.startswith("/uploads/"):
+        return image_url
+    filename = image_url[len("/uploads/"):].split("?", 1)[0]
+    path = os.path.join(app.config['UPLOAD_FOLDER'], os.path.basename(filename))
+    return image_to_base64(path) or image_url
+
+def get_landmark_image(landmark_name, filename=None):
+    """Retourne l'URL de l'image d'un landmark avec fallback"""
+    if filename:
+        local_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        if os.path.exists(local_path):
+            return f"/uploads/{filename}?v={int(os.path.getmtime(local_path))}"
+        print(f"Image non trouvée: {local_path}")
     
     # Images par défaut depuis Unsplash
     default_images = {
@@ -53,247 +94,234 @@ def get_landmark_image(landmark_name, local_path=None):
     }
     return default_images.get(landmark_name, "https://images.unsplash.com/photo-1552733407-5d5c46c3bb3b?w=400&h=300&fit=crop")
 
-# Coordonnées corrigées basées sur vos données (NE PAS CHANGER)
-LANDMARKS = {
-    "Rond-point Victoire": {
-        "lat": -4.340787, 
-        "lon": 15.313731,
-        "image": get_landmark_image("Rond-point Victoire", "/Users/mac/Downloads/conduite/Project/static/uploads/victoire.webp"),
-        "description": "Point central de Kinshasa, lieu de rassemblement important"
-    },
-    "Gare Centrale": { 
-        "lat": -4.301203, 
-        "lon": 15.317859,
-        "image": get_landmark_image("Gare Centrale", "/Users/mac/Downloads/conduite/Project/static/uploads/gare.jpg"),
-        "description": "Principale gare routière et ferroviaire de Kinshasa"
-    }, 
-    "Gombe": {
-        "lat": -4.30306, 
-        "lon": 15.30333,
-        "image": get_landmark_image("Gombe", "/Users/mac/Downloads/conduite/Project/static/uploads/Gombe.jpeg"),
-        "description": "Quartier administratif et commercial"
-    },
-    "Lingwala": {
-        "lat": -4.325425071279868,
-        "lon": 15.296128605102115,
-        "image": get_landmark_image("Lingwala", "/Users/mac/Downloads/conduite/Project/static/uploads/lingwala.png"),
-        "description": "Quartier résidentiel et commercial animé"
-    },
-    "Kasa-Vubu": {
-        "lat": -4.34250, 
-        "lon": 15.30528,
-        "image": get_landmark_image("Kasavubu", "/Users/mac/Downloads/conduite/Project/static/uploads/KASAVUBU.jpeg"),
-        "description": "Commune populaire au cœur de Kinshasa"
-    },
-    "Matonge": {
-        "lat": -4.34022, 
-        "lon": 15.31599,
-        "image": get_landmark_image("Matonge", "/Users/mac/Downloads/conduite/Project/static/uploads/matonge.png"),
-        "description": "Quartier culturel et commercial réputé"
-    },
-    "Barumbu": {
-        "lat": -4.31694, 
-        "lon": 15.32778,
-        "image": get_landmark_image("Barumbu", "/Users/mac/Downloads/conduite/Project/static/uploads/ndolo.jpeg"),
-        "description": "Commune historique près du fleuve Congo"
-    },
-    "Ngaliema": {
-        "lat": -4.37247, 
-        "lon": 15.25459,
-        "image": get_landmark_image("Ngaliema", "/Users/mac/Downloads/conduite/Project/static/uploads/ngaliema.webp"),
-        "description": "Quartier résidentiel huppé avec vue sur le fleuve"
-    },
-    "Lemba": {
-        "lat": -4.39611, 
-        "lon": 15.31917,
-        "image": get_landmark_image("Lemba", "/Users/mac/Downloads/conduite/Project/static/uploads/lemba.jpeg"),
-        "description": "Quartier universitaire et résidentiel"
-    },
-    "Limete": {
-        "lat": -4.37439, 
-        "lon": 15.34542,
-        "image": get_landmark_image("Limete", "/Users/mac/Downloads/conduite/Project/static/uploads/limete.jpeg"),
-        "description": "Zone industrielle et résidentielle importante"
-    }
-}
+# Landmarks et points d'intérêt (fichiers JSON, rechargés à chaud quand ils changent).
+# places() donne l'instantané courant: index par nom, index spatial des POIs pour les arrêts
+LANDMARKS_PATH = os.environ.get("LANDMARKS_PATH", os.path.join(app.root_path, "data", "landmarks.json"))
+POINTS_OF_INTEREST_PATH = os.environ.get("POINTS_OF_INTEREST_PATH",
+                                         os.path.join(app.root_path, "data", "points_of_interest.json"))
+place_store = PlaceStore(LANDMARKS_PATH, POINTS_OF_INTEREST_PATH, get_landmark_image,
+                         check_interval=float(os.environ.get("PLACES_RELOAD_INTERVAL", "2")))
+places = place_store.current
+STOP_CORRIDOR_M = float(os.environ.get("STOP_CORRIDOR_M", "400"))
+OSRM_BASE = os.environ.get("OSRM_BASE", "https://router.project-osrm.org")
+OSRM_TIMEOUT = float(os.environ.get("OSRM_TIMEOUT", "15"))
 
-# Points d'intérêt: coordonnées réalistes et positionnées sur/près des routes principales
-POINTS_OF_INTEREST = {
-    "Marché Central": {
-        "lat": -4.3070,
-        "lon": 15.3120,
-        "image": get_landmark_image("Marché Central", "/Users/mac/Downloads/conduite/Project/static/uploads/marche_central.jpeg"),
-        "type": "commerce",
-        "description": "Grand marché situé sur un axe commercial proche de Gombe/Victoire"
-    },
-    "Stade des Martyrs": {
-        "lat": -4.3278,
-        "lon": 15.3149,
-        "image": get_landmark_image("Stade des Martyrs", "/Users/mac/Downloads/conduite/Project/static/uploads/stade_martyrs.jpeg"),
-        "type": "sport",
-        "description": "Stade national situé le long d'un grand boulevard"
-    },
-    "Université de Kinshasa": {
-        "lat": -4.4120,
-        "lon": 15.3050,
-        "image": get_landmark_image("Université de Kinshasa", "/Users/mac/Downloads/conduite/Project/static/uploads/unikin.jpeg"),
-        "type": "éducation",
-        "description": "Campus universitaire à Lemba, accessible par la route principale"
-    },
-    "Place de la Gare": {
-        "lat": -4.30125,
-        "lon": 15.31800,
-        "image": get_landmark_image("Place de la Gare", "/Users/mac/Downloads/conduite/Project/static/uploads/place_gare.jpeg"),
-        "type": "transport",
-        "description": "Place immédiatement devant la Gare Centrale"
-    },
-    "Hôpital Général": {
-        "lat": -4.3145,
-        "lon": 15.2920,
-        "image": get_landmark_image("Hôpital Général", "/Users/mac/Downloads/conduite/Project/static/uploads/images.jpeg"),
-        "type": "santé",
-        "description": "Hôpital principal sur un axe médical bien desservi"
-    },
-    "Tour de l'Échangeur": {
-        "lat": -4.3245,
-        "lon": 15.3048,
-        "image": get_landmark_image("Tour de l'Échangeur", "/Users/mac/Downloads/conduite/Project/static/uploads/limete.jpeg"),
-        "type": "infrastructure",
-        "description": "Intersection / échangeur important sur le réseau routier"
-    },
-    "Palais du Peuple": {
-        "lat": -4.3198,
-        "lon": 15.3152,
-        "image": get_landmark_image("Palais du Peuple", "/Users/mac/Downloads/conduite/Project/static/uploads/palais-du-peuple.jpg"),
-        "type": "gouvernement",
-        "description": "Siège du parlement, situé en zone administrative"
-    },
-    "Ambassade de France": {
-        "lat": -4.3079,
-        "lon": 15.2751,
-        "image": get_landmark_image("Ambassade de France", "/Users/mac/Downloads/conduite/Project/static/uploads/ambassade_de_france.jpeg"),
-        "type": "diplomatie",
-        "description": "Représentation diplomatique sur un axe sécurisé"
-    },
-    "Aéroport de Ndjili": {
-        "lat": -4.3850,
-        "lon": 15.4448,
-        "image": get_landmark_image("Aéroport de Ndjili", "/Users/mac/Downloads/conduite/Project/static/uploads/ndjili.jpeg"),
-        "type": "transport",
-        "description": "Aéroport international, connecté via la route d'accès principale"
-    },
-    "Pont Maréchal": {
-        "lat": -4.3005,
-        "lon": 15.2945,
-        "image": get_landmark_image("Pont Maréchal", "/Users/mac/Downloads/conduite/Project/static/uploads/pont_marechal.jpeg"),
-        "type": "infrastructure",
-        "description": "Pont sur le fleuve/local, positionné sur un axe routier stratégique"
-    },
-    "Stade Tata Raphaël": {
-        "lat": -4.3385,
-        "lon": 15.2810,
-        "image": get_landmark_image("Stade Tata Raphaël", "/Users/mac/Downloads/conduite/Project/static/uploads/matonge.png"),
-        "type": "sport",
-        "description": "Stade historique accessible depuis les grands boulevards"
-    },
-    "Musée National": {
-        "lat": -4.3183,
-        "lon": 15.2982,
-        "image": get_landmark_image("Musée National", "/Users/mac/Downloads/conduite/Project/static/uploads/musee_national.jpeg"),
-        "type": "culture",
-        "description": "Musée situé proche d'axes piétonniers et routiers principaux"
-    },
-    "Jardin Botanique": {
-        "lat": -4.3495,
-        "lon": 15.2952,
-        "image": get_landmark_image("Jardin Botanique", "/Users/mac/Downloads/conduite/Project/static/uploads/jardin.jpeg"),
-        "type": "nature",
-        "description": "Espace vert en périphérie, accessible par une route secondaire connectée"
-    },
-    "Grand Hôtel Kinshasa": {
-        "lat": -4.3021,
-        "lon": 15.3022,
-        "image": get_landmark_image("Grand Hôtel Kinshasa", "/Users/mac/Downloads/conduite/Project/static/uploads/grand_hotel.jpeg"),
-        "type": "hôtellerie",
-        "description": "Hôtel situé sur un axe hôtelier près du centre"
-    },
-    "Centre Commercial": {
-        "lat": -4.3075,
-        "lon": 15.3048,
-        "image": get_landmark_image("Centre Commercial", "/Users/mac/Downloads/conduite/Project/static/uploads/commercial.jpeg"),
-        "type": "commerce",
-        "description": "Grand centre commercial sur un boulevard principal"
-    }
+# Appels OSRM en parallèle: taille du pool et délai global par requête /api/routes
+OSRM_MAX_WORKERS = int(os.environ.get("OSRM_MAX_WORKERS", "8"))
+ROUTES_DEADLINE = float(os.environ.get("ROUTES_DEADLINE", "20"))
+
+osrm_executor = ThreadPoolExecutor(max_workers=OSRM_MAX_WORKERS, thread_name_prefix="osrm")
+
+# Endpoints de lot (/api/routes/batch, /api/matrix): paires traitées en parallèle
+BATCH_MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", "4"))
+BATCH_MAX_PAIRS = int(os.environ.get("BATCH_MAX_PAIRS", "500"))
+MATRIX_MAX_COORDS = int(os.environ.get("MATRIX_MAX_COORDS", "100"))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix="batch")
+
+# Session keep-alive partagée: pool de connexions, retries sur 429/5xx et disjoncteur
+osrm_client = OSRMClient(
+    OSRM_BASE,
+    timeout=OSRM_TIMEOUT,
+    pool_size=int(os.environ.get("OSRM_POOL_SIZE", str(OSRM_MAX_WORKERS))),
+    max_retries=int(os.environ.get("OSRM_MAX_RETRIES", "2")),
+    backoff_factor=float(os.environ.get("OSRM_BACKOFF_FACTOR", "0.3")),
+    backoff_jitter=float(os.environ.get("OSRM_BACKOFF_JITTER", "0.3")),
+    failure_threshold=int(os.environ.get("OSRM_BREAKER_THRESHOLD", "5")),
+    reset_timeout=float(os.environ.get("OSRM_BREAKER_RESET", "30")),
+)
+
+# Moteur de routage: "osrm" (serveur OSRM_BASE) ou "local" (graphe routier LOCAL_GRAPH_PATH)
+ROUTING_BACKEND = os.environ.get("ROUTING_BACKEND", "osrm")
+LOCAL_GRAPH_PATH = os.environ.get("LOCAL_GRAPH_PATH", os.path.join(app.root_path, "data", "kinshasa_test_graph.json"))
+# Index de hiérarchies de contraction (flask build-ch), mappé en mémoire s'il existe
+LOCAL_CH_PATH = os.environ.get("LOCAL_CH_PATH", os.path.splitext(LOCAL_GRAPH_PATH)[0] + ".ch")
+if ROUTING_BACKEND == "local":
+    routing_backend = LocalRouter.load(LOCAL_GRAPH_PATH, LOCAL_CH_PATH)
+elif ROUTING_BACKEND == "osrm":
+    routing_backend = osrm_client
+else:
+    raise ValueError(f"ROUTING_BACKEND inconnu: {ROUTING_BACKEND}")
+
+# Cache des réponses OSRM (memory par worker, ou sqlite partagé entre workers),
+# clés préfixées par le moteur de routage
+route_cache = create_route_cache(
+    backend=os.environ.get("ROUTE_CACHE_BACKEND", "memory"),
+    path=os.environ.get("ROUTE_CACHE_PATH", os.path.join(app.root_path, "cache", "routes.sqlite3")),
+    ttl=float(os.environ.get("ROUTE_CACHE_TTL", str(6 * 3600))),
+    precision=int(os.environ.get("ROUTE_CACHE_PRECISION", "5")),
+    max_entries=int(os.environ.get("ROUTE_CACHE_MAX_ENTRIES", "2000")),
+    max_bytes=int(os.environ.get("ROUTE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    namespace=routing_backend.base_url,
+)
+
+# Appels /route identiques en vol regroupés (par processus) après un défaut de cache
+route_flight = SingleFlight()
+
+# Métriques exportées sur /metrics (format Prometheus)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "kinshasa_http_request_duration_seconds", "Durée des requêtes HTTP", ["endpoint", "method", "status"])
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "kinshasa_upstream_errors_total", "Erreurs du moteur de routage (exception ou code != Ok)", ["backend", "kind"])
+ROUTES_DISCARDED = REGISTRY.counter(
+    "kinshasa_routes_discarded_total", "Itinéraires trouvés mais écartés", ["reason"])
+REGISTRY.callback("kinshasa_route_cache_requests_total", "Consultations du cache des itinéraires",
+                  lambda: [(("hit",), route_cache.stats().get("hits")), (("miss",), route_cache.stats().get("misses"))],
+                  ["result"], type="counter")
+REGISTRY.callback("kinshasa_route_cache_hit_ratio", "Part des consultations du cache servies",
+                  lambda: [((), route_cache.stats().get("hit_rate"))])
+REGISTRY.callback("kinshasa_precomputed_hits_total", "Réponses servies par les itinéraires pré-calculés",
+                  lambda: [((), precomputed_routes.hits)], type="counter")
+# Single-flight et client OSRM par chemin de service: "wsgi" (routes Flask, threads) ici,
+# "asgi" (/api/routes sous uvicorn: asyncio, aiohttp) ajouté par asgi.py au chargement
+ROUTE_FLIGHTS = {"wsgi": route_flight}
+OSRM_CLIENTS = {"wsgi": osrm_client}
+REGISTRY.callback("kinshasa_singleflight_calls_total", "Appels /route après défaut de cache",
+                  lambda: [sample for path, flight in ROUTE_FLIGHTS.items()
+                           for sample in (((path, "executed"), flight.executions),
+                                          ((path, "coalesced"), flight.coalesced))],
+                  ["path", "result"], type="counter")
+REGISTRY.callback("kinshasa_osrm_requests_total", "Requêtes envoyées à OSRM (hors retries)",
+                  lambda: [((path,), client.requests_sent) for path, client in OSRM_CLIENTS.items()],
+                  ["path"], type="counter")
+REGISTRY.callback("kinshasa_osrm_errors_total", "Requêtes OSRM en échec (exception ou 429/5xx)",
+                  lambda: [((path,), client.errors) for path, client in OSRM_CLIENTS.items()],
+                  ["path"], type="counter")
+REGISTRY.callback("kinshasa_osrm_breaker_open", "Disjoncteur OSRM ouvert (1) ou fermé (0)",
+                  lambda: [((path,), int(client.breaker.state != "closed")) for path, client in OSRM_CLIENTS.items()],
+                  ["path"])
+
+# Traces par requête (en-tête Server-Timing) si X-Trace est présent, ou toujours
+METRICS_TRACE_ALL = os.environ.get("METRICS_TRACE_ALL", "0") == "1"
+# Profilage cProfile d'une fraction des requêtes (0 = désactivé), un .prof par requête
+profiler = SamplingProfiler(rate=float(os.environ.get("PROFILE_SAMPLE_RATE", "0")),
+                            directory=os.environ.get("PROFILE_DIR", "profiles"))
+
+# Itinéraires pré-calculés entre landmarks (flask precompute-routes)
+PRECOMPUTED_ROUTES_PATH = os.environ.get("PRECOMPUTED_ROUTES_PATH",
+                                         os.path.join(app.root_path, "data", "landmark_routes.json.gz"))
+# Ignorés si produits par un autre moteur (ROUTING_BACKEND ou OSRM_BASE différent)
+precomputed_routes = PrecomputedRoutes.load(PRECOMPUTED_ROUTES_PATH, routing_backend.base_url)
+
+# Durées selon l'heure de départ (flask build-traffic-profile); profil par défaut si le fichier manque
+TRAFFIC_ENABLED = os.environ.get("TRAFFIC_ENABLED", "1") == "1"
+TRAFFIC_PROFILE_PATH = os.environ.get("TRAFFIC_PROFILE_PATH", os.path.join(app.root_path, "data", "traffic_profiles.bin"))
+traffic_model = TrafficModel.load(TRAFFIC_PROFILE_PATH) if TRAFFIC_ENABLED else None
+
+# Tuiles hors ligne (flask build-tiles) servies par /tiles; sans fichier, la carte charge MAP_TILE_URL.
+# TILES_SOURCE_URL (construction du fichier) n'a pas de valeur par défaut: le fournisseur doit
+# autoriser le téléchargement en masse, ce que le serveur tile.openstreetmap.org interdit
+TILES_PATH = os.environ.get("TILES_PATH", os.path.join(app.root_path, "data", "kinshasa.mbtiles"))
+TILES_SOURCE_URL = os.environ.get("TILES_SOURCE_URL", "")
+TILES_ATTRIBUTION = os.environ.get("TILES_ATTRIBUTION", "")
+# Tuiles affichées à la demande (sans fichier, ou hors du fichier): usage interactif normal
+MAP_TILE_URL = os.environ.get("MAP_TILE_URL", "https://tile.openstreetmap.org/{z}/{x}/{y}.png")
+MAP_TILE_ATTRIBUTION = os.environ.get("MAP_TILE_ATTRIBUTION", "&copy; OpenStreetMap contributors")
+TILES_CACHE_MAX_AGE = int(os.environ.get("TILES_CACHE_MAX_AGE", str(30 * 24 * 3600)))
+tile_store = TileStore.open(TILES_PATH)
+
+# Lot d'itinéraires entre landmarks mis en cache par le service worker (flask export-route-bundle)
+ROUTE_BUNDLE_PATH = os.environ.get("ROUTE_BUNDLE_PATH", os.path.join(app.root_path, "data", "route_bundle.json.gz"))
+route_bundle = RouteBundle(ROUTE_BUNDLE_PATH)
+
+OSRM_DIRECT_PARAMS = {
+    "overview": "full",
+    "geometries": "geojson",
+    "steps": "false",
+    "alternatives": "true"
 }
-OSRM_BASE = "https://router.project-osrm.org"
+OSRM_WAYPOINT_PARAMS = dict(OSRM_DIRECT_PARAMS, alternatives="false")
 
 # Route pour servir les images
 @app.route('/uploads/<filename>')
 def serve_image(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calcule la distance en km entre deux points géographiques"""
-    R = 6371
-    lat1_rad = radians(lat1)
-    lon1_rad = radians(lon1)
-    lat2_rad = radians(lat2)
-    lon2_rad = radians(lon2)
-    
-    dlon = lon2_rad - lon1_rad
-    dlat = lat2_rad - lat1_rad
-    
-    a = sin(dlat/2)**2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    
-    return R * c
+    # send_from_directory gère ETag / If-None-Match; Cache-Control long car URLs versionnées
+    return send_from_directory(app.config['UPLOAD_FOLDER'], filename, max_age=IMAGE_CACHE_MAX_AGE)
 
-def generate_intermediate_points(start, end, num_points=3):
-    """Génère des points intermédiaires pour créer des itinéraires alternatifs"""
-    points = []
-    mid_lat = (start["lat"] + end["lat"]) / 2
-    mid_lon = (start["lon"] + end["lon"]) / 2
-    
-    for i in range(num_points):
-        variation_lat = random.uniform(-0.02, 0.02)
-        variation_lon = random.uniform(-0.02, 0.02)
-        points.append({
-            "lat": mid_lat + variation_lat,
-            "lon": mid_lon + variation_lon
-        })
-    
-    return points
+def cached_route(points, params):
+    """Réponse /route pré-calculée ou en cache: (données ou None, clé du cache)"""
+    precomputed = precomputed_routes.get(points, params)
+    if precomputed is not None:
+        return precomputed, None
+
+    key = route_cache.key("route", points, params)
+    return route_cache.get(key), key
+
+def fetch_upstream_route(key, coords, params, timeout):
+    with stage("upstream"):
+        try:
+            data = routing_backend.route(coords, params, timeout=timeout)
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(ROUTING_BACKEND, type(e).__name__)
+            raise
+    if data.get("code") == "Ok":
+        route_cache.set(key, data)
+    else:
+        UPSTREAM_ERRORS.inc(ROUTING_BACKEND, str(data.get("code")))
+    return data
+
+def call_timeout(deadline=None):
+    """Délai d'un appel au moteur, calculé quand il part: OSRM_TIMEOUT borné par `deadline` (time.monotonic)"""
+    if deadline is None:
+        return OSRM_TIMEOUT
+    return min(OSRM_TIMEOUT, deadline - time.monotonic())
+
+def fetch_osrm_route(points, params, deadline=None):
+    """Appel OSRM /route: pré-calculé, puis cache, puis réseau.
+
+    Sur un défaut de cache, les requêtes simultanées de même clé partagent
+    un seul appel au moteur (route_flight). Le délai de l'appel est calculé
+    à son départ (un appel resté en file sur osrm_executor ne dépasse pas
+    `deadline`); sans temps restant, le moteur n'est pas appelé.
+    """
+    cached, key = cached_route(points, params)
+    if cached is not None:
+        return cached
+    timeout = call_timeout(deadline)
+    if timeout <= 0:
+        raise DeadlineExceededError("Délai épuisé avant l'appel au moteur")
 
-def get_route_via_waypoints(start, end, waypoints=None):
+    coords = ";".join(f"{p['lon']},{p['lat']}" for p in points)
+    return route_flight.do(key, lambda: fetch_upstream_route(key, coords, params, timeout), timeout=timeout)
+
+def get_route_via_waypoints(start, end, waypoints=None, deadline=None):
     """Obtient un itinéraire via des points de passage"""
     if waypoints is None:
         waypoints = []
     
-    coords_list = [f"{start['lon']},{start['lat']}"]
-    for wp in waypoints:
-        coords_list.append(f"{wp['lon']},{wp['lat']}")
-    coords_list.append(f"{end['lon']},{end['lat']}")
-    coords = ";".join(coords_list)
-    
-    params = {
-        "overview": "full",
-        "geometries": "geojson",
-        "steps": "false",
-        "alternatives": "false"
-    }
-    
-    url = f"{OSRM_BASE}/route/v1/driving/{coords}"
-    
     try:
-        r = requests.get(url, params=params, timeout=15)
-        r.raise_for_status()
-        return r.json()
+        with stage("route_waypoint"):
+            return fetch_osrm_route([start] + list(waypoints) + [end], OSRM_WAYPOINT_PARAMS, deadline)
     except Exception as e:
         print(f"Erreur OSRM avec waypoints: {e}")
         return None
 
-def generate_stops_for_route(route_type, start, end, route_index):
-    """Génère des arrêts pertinents pour un itinéraire donné"""
+def get_direct_routes(start, end, deadline=None):
+    """Obtient l'itinéraire direct et les alternatives proposées par OSRM"""
+    try:
+        with stage("route_direct"):
+            return fetch_osrm_route([start, end], OSRM_DIRECT_PARAMS, deadline)
+    except Exception as e:
+        print(f"Erreur OSRM direct: {e}")
+        return None
+
+def generate_stops_for_route(route_type, start, end, route_index, shape=None):
+    """Génère des arrêts pertinents pour un itinéraire donné (shape: RouteGeometry du tracé)"""
+    snapshot = places()
+    if shape is not None and len(shape):
+        along_route = snapshot.poi_index.within_corridor(shape, STOP_CORRIDOR_M)
+        if len(along_route) >= 2:
+            # Les 3 POIs les plus proches du tracé, dans l'ordre du trajet
+            closest = sorted(along_route, key=lambda item: item[1])[:3]
+            closest.sort(key=lambda item: item[2])
+            stops = []
+            for record, distance_m, position_m in closest:
+                stop_info = record.to_dict()
+                stop_info["distance_to_route_m"] = round(distance_m)
+                stop_info["distance_along_route_m"] = round(position_m)
+                stops.append(stop_info)
+            return stops
+
+    # Sinon: modèles d'arrêts par type d'itinéraire
     route_stops_templates = {
         "direct": [
             ["Marché Central", "Place de la Gare", "Centre Commercial"],
@@ -317,206 +345,810 @@ def generate_stops_for_route(route_type, start, end, route_index):
     selected_template = templates[route_index % len(templates)]
     
     filtered_stops = []
-    for stop_name in selected_template:
-        if stop_name in POINTS_OF_INTEREST:
-            stop_coords = POINTS_OF_INTEREST[stop_name]
-            dist_to_start = calculate_distance(start["lat"], start["lon"], 
-                                             stop_coords["lat"], stop_coords["lon"])
-            dist_to_end = calculate_distance(stop_coords["lat"], stop_coords["lon"],
-                                           end["lat"], end["lon"])
-            direct_dist = calculate_distance(start["lat"], start["lon"], end["lat"], end["lon"])
-            
-            # on garde les arrêts qui restent raisonnables le long du trajet
-            if (dist_to_start + dist_to_end) < direct_dist * 2.0:
-                stop_info = POINTS_OF_INTEREST[stop_name].copy()
-                stop_info["name"] = stop_name
-                filtered_stops.append(stop_info)
-    
+    candidates = [snapshot.points_of_interest[name].to_dict()
+                  for name in selected_template if name in snapshot.points_of_interest]
+    if candidates:
+        lats = np.array([stop["lat"] for stop in candidates])
+        lons = np.array([stop["lon"] for stop in candidates])
+        dist_to_start = haversine_km(start["lat"], start["lon"], lats, lons)
+        dist_to_end = haversine_km(lats, lons, end["lat"], end["lon"])
+        direct_dist = calculate_distance(start["lat"], start["lon"], end["lat"], end["lon"])
+
+        # on garde les arrêts qui restent raisonnables le long du trajet
+        keep = (dist_to_start + dist_to_end) < direct_dist * 2.0
+        filtered_stops = [stop for stop, kept in zip(candidates, keep) if kept]
+        if shape is not None and len(shape) > 1:
+            filtered_stops = [dict(stop, distance_along_route_m=round(position_m))
+                              for stop, _, position_m in shape.order_along(filtered_stops)]
+
     # Si pas assez d'arrêts filtrés, retourner les premiers modèles (fallback)
     if len(filtered_stops) >= 2:
         return filtered_stops[:3]
     else:
         fallback = []
         for stop in selected_template[:3]:
-            poi = POINTS_OF_INTEREST.get(stop)
+            poi = snapshot.points_of_interest.get(stop)
             if poi:
-                entry = poi.copy()
-                entry["name"] = stop
-                fallback.append(entry)
+                fallback.append(poi.to_dict())
             else:
-                fallback.append({"name": stop, "description": "Point d'intérêt", "image": get_landmark_image(stop, "static/uploads/placeholder.webp")})
+                fallback.append({"name": stop, "description": "Point d'intérêt", "image": get_landmark_image(stop)})
         return fallback
 
 @app.route("/")
 def index():
-    return render_template("index.html", landmarks=sorted(LANDMARKS.keys()))
+    if tile_store is not None:
+        tiles = "/tiles/{z}/{x}/{y}.png"
+        attribution = tile_store.metadata.get("attribution") or MAP_TILE_ATTRIBUTION
+    else:
+        tiles, attribution = MAP_TILE_URL, MAP_TILE_ATTRIBUTION
+    return render_template("index.html", landmarks=sorted(places().landmarks), tile_url=tiles,
+                           tile_attribution=attribution)
 
-@app.route("/api/routes", methods=["POST"])
-def api_routes():
-    data = request.get_json(force=True)
+@app.route("/sw.js")
+def service_worker():
+    # Servi à la racine: le service worker contrôle toute l'application (/, /api, /tiles)
+    response = send_from_directory(app.static_folder, "sw.js", max_age=0)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
-    if "start_name" in data:
-        sname = data["start_name"]
-        if sname not in LANDMARKS:
-            return jsonify({"error": f"Start landmark '{sname}' unknown"}), 400
-        start = LANDMARKS[sname].copy()
-        start["name"] = sname
-    elif "start" in data:
-        start = data["start"]
-        start["name"] = "Point de départ"
-    else:
-        return jsonify({"error": "start or start_name required"}), 400
-
-    if "end_name" in data:
-        ename = data["end_name"]
-        if ename not in LANDMARKS:
-            return jsonify({"error": f"End landmark '{ename}' unknown"}), 400
-        end = LANDMARKS[ename].copy()
-        end["name"] = ename
-    elif "end" in data:
-        end = data["end"]
-        end["name"] = "Point d'arrivée"
+@app.route("/tiles/<int:z>/<int:x>/<int:y>.<fmt>")
+def serve_tile(z, x, y, fmt):
+    """Tuile lue dans le fichier MBTiles; absente du fichier, redirection vers MAP_TILE_URL"""
+    if z > 22 or x >= (1 << z) or y >= (1 << z):
+        return jsonify({"error": "tile out of range"}), 404
+    data = tile_store.get(z, x, y) if tile_store is not None else None
+    if data is None:
+        if not MAP_TILE_URL:
+            return jsonify({"error": "tile not found"}), 404
+        return redirect(tile_url(MAP_TILE_URL, z, x, y))
+    response = Response(data, mimetype=tile_store.mimetype)
+    response.add_etag()
+    response.cache_control.public = True
+    response.cache_control.max_age = TILES_CACHE_MAX_AGE
+    return response.make_conditional(request)
+
+def build_waypoint_candidates(start, end):
+    """Liste ordonnée des points de passage à essayer: (type d'itinéraire, waypoint)"""
+    candidates = []
+
+    # 1. Points de part et d'autre du milieu du trajet (déterministes, donc cachables)
+    for point in generate_via_points(start, end, num_points=4):
+        candidates.append(("via_intermediate", point))
+
+    # 2. Landmarks raisonnablement proches du trajet
+    direct_dist = calculate_distance(start["lat"], start["lon"], end["lat"], end["lon"])
+    landmark_waypoints = []
+    for landmark in places().landmarks.values():
+        if (landmark.lat == start["lat"] and landmark.lon == start["lon"]) or \
+           (landmark.lat == end["lat"] and landmark.lon == end["lon"]):
+            continue
+
+        dist_to_start = calculate_distance(start["lat"], start["lon"], landmark.lat, landmark.lon)
+        dist_to_end = calculate_distance(landmark.lat, landmark.lon, end["lat"], end["lon"])
+
+        if (dist_to_start + dist_to_end) < direct_dist * 1.8:
+            landmark_waypoints.append({"lat": landmark.lat, "lon": landmark.lon})
+
+    for waypoint in landmark_waypoints[:3]:
+        candidates.append(("via_landmark", waypoint))
+
+    return candidates
+
+def make_route_entry(route, route_type, start, end, stops_index, shape=None, depart_at=None):
+    """Construit l'entrée de réponse pour un itinéraire OSRM (shape: son RouteGeometry, s'il est déjà calculé).
+
+    Avec un modèle de trafic et une heure de départ, ajoute predicted_duration_min.
+    """
+    dist_km = route.get("distance", 0) / 1000.0
+    dur_min = route.get("duration", 0) / 60.0
+    if shape is None:
+        shape = RouteGeometry.from_geometry(route.get("geometry"))
+    with stage("stops"):
+        stops = generate_stops_for_route(route_type, start, end, stops_index, shape)
+    entry = {
+        "distance_km": round(dist_km, 3),
+        "duration_min": round(dur_min, 1),
+        "geometry": route.get("geometry"),
+        "summary": route.get("legs", [{}])[0].get("summary", ""),
+        "type": route_type,
+        "stops": stops
+    }
+    if traffic_model is not None and depart_at is not None:
+        with stage("traffic"):
+            predicted_s = traffic_model.predict_duration(shape, route.get("duration", 0), depart_at)
+        entry["predicted_duration_min"] = round(predicted_s / 60.0, 1)
+    return entry
+
+def route_rank(route):
+    """Clé de classement: durée prévue (seulement avec depart_at), sinon distance"""
+    if "predicted_duration_min" not in route:
+        return (route["distance_km"],)
+    return (route["predicted_duration_min"], route["distance_km"])
+
+def shortest_position(routes, order):
+    """Position, dans l'ordre de classement, de l'itinéraire le plus court en distance"""
+    return min(range(len(order)), key=lambda i: routes[order[i]]["distance_km"])
+
+def fastest_position(routes, order):
+    """Position, dans l'ordre de classement, de l'itinéraire le plus rapide (durée prévue, sinon OSRM)"""
+    return min(range(len(order)),
+               key=lambda i: routes[order[i]].get("predicted_duration_min", routes[order[i]]["duration_min"]))
+
+def is_unique_route(shape, accepted_shapes):
+    """Un itinéraire (RouteGeometry) est gardé s'il ne recouvre pas trop un itinéraire déjà retenu"""
+    with stage("uniqueness"):
+        unique = is_diverse(shape, accepted_shapes)
+    if not unique:
+        ROUTES_DISCARDED.inc("duplicate")
+    return unique
+
+def iter_routes(start, end, alternatives, deadline, depart_at=None):
+    """Génère les itinéraires au fur et à mesure qu'ils sont trouvés.
+
+    L'appel direct et tous les appels via points de passage partent en
+    parallèle sur osrm_executor. On s'arrête dès que `alternatives`
+    itinéraires uniques sont trouvés ou que `deadline` (time.monotonic)
+    est dépassée; les appels restants sont alors annulés.
+    """
+    def remaining():
+        return max(0.0, deadline - time.monotonic())
+
+    # copy_context: les étapes chronométrées dans les threads rejoignent la trace de la requête
+    direct_future = osrm_executor.submit(contextvars.copy_context().run, get_direct_routes,
+                                         start, end, deadline)
+    waypoint_futures = {}
+    if alternatives > 1:
+        for route_type, waypoint in build_waypoint_candidates(start, end):
+            future = osrm_executor.submit(contextvars.copy_context().run, get_route_via_waypoints,
+                                          start, end, [waypoint], deadline)
+            waypoint_futures[future] = route_type
+
+    routes = []
+    shapes = []  # RouteGeometry des itinéraires retenus, calculées une fois par tracé
+    try:
+        # L'itinéraire direct passe en premier: il sert de référence pour l'unicité
+        done, _ = wait([direct_future], timeout=remaining())
+        osrm = direct_future.result() if done else None
+        if osrm and "routes" in osrm and len(osrm["routes"]) > 0:
+            for route in osrm["routes"][:min(3, alternatives)]:
+                shape = RouteGeometry.from_geometry(route.get("geometry"))
+                if not is_unique_route(shape, shapes):
+                    continue
+                entry = make_route_entry(route, "direct", start, end, len(routes), shape, depart_at)
+                routes.append(entry)
+                shapes.append(shape)
+                yield entry
+
+        if len(routes) >= alternatives or not waypoint_futures:
+            return
+
+        try:
+            for future in as_completed(waypoint_futures, timeout=remaining()):
+                route_data = future.result()
+                if not (route_data and "routes" in route_data and len(route_data["routes"]) > 0):
+                    continue
+
+                route = route_data["routes"][0]
+                shape = RouteGeometry.from_geometry(route.get("geometry"))
+                if is_unique_route(shape, shapes):
+                    entry = make_route_entry(route, waypoint_futures[future], start, end, len(routes),
+                                             shape, depart_at)
+                    routes.append(entry)
+                    shapes.append(shape)
+                    yield entry
+                    if len(routes) >= alternatives:
+                        return
+        except TimeoutError:
+            print(f"Délai global dépassé ({ROUTES_DEADLINE}s), {len(routes)} itinéraire(s) retenu(s)")
+    finally:
+        direct_future.cancel()
+        for future in waypoint_futures:
+            future.cancel()
+
+def resolve_point(data, key):
+    """Départ ou arrivée d'une requête: landmark nommé (`{key}_name`) ou coordonnées (`{key}`).
+
+    Retourne (point, erreur).
+    """
+    label = "Start" if key == "start" else "End"
+    if f"{key}_name" in data:
+        name = data[f"{key}_name"]
+        landmark = places().find_landmark(name)
+        if landmark is None:
+            return None, f"{label} landmark '{name}' unknown"
+        point = landmark.to_dict()
+    elif key in data:
+        point = dict(data[key])
+        point["name"] = "Point de départ" if key == "start" else "Point d'arrivée"
     else:
-        return jsonify({"error": "end or end_name required"}), 400
+        return None, f"{key} or {key}_name required"
+    return point, None
 
+def parse_route_options(data, defaults=None):
+    """Options communes des requêtes d'itinéraires; retourne (options, erreur)"""
+    data = dict(defaults or {}, **data)
     alternatives = int(data.get("alternatives", 5))
     if alternatives < 1:
         alternatives = 1
     if alternatives > 8:
         alternatives = 8
 
+    geometry_format = data.get("geometry_format", "geojson")
+    if geometry_format not in GEOMETRY_FORMATS:
+        return None, f"geometry_format must be one of {', '.join(GEOMETRY_FORMATS)}"
+    zoom = data.get("zoom")
+    if zoom is not None:
+        zoom = max(0, min(int(zoom), 19))
+    depart_at, error = parse_depart_at(data.get("depart_at"))
+    if error:
+        return None, error
+
+    return {
+        "alternatives": alternatives,
+        "geometry_format": geometry_format,
+        "zoom": zoom,
+        "inline_images": bool(data.get("inline_images")),
+        "depart_at": depart_at,
+    }, None
+
+def format_route_output(route, options):
+    """Applique les options de sortie (images inline, format de géométrie) à un itinéraire"""
+    if options["inline_images"]:
+        route = dict(route, stops=[dict(stop, image=inline_image(stop.get("image")))
+                                   for stop in route["stops"]])
+    if options["geometry_format"] != "geojson" or options["zoom"] is not None:
+        route = dict(route, geometry=format_geometry(route["geometry"], options["geometry_format"],
+                                                     options["zoom"]))
+    return route
+
+def format_endpoints(start, end, options):
+    if options["inline_images"]:
+        start = dict(start, image=inline_image(start.get("image")))
+        end = dict(end, image=inline_image(end.get("image")))
+    return start, end
+
+def precomputed_age_for(start, end):
+    if precomputed_routes.has_pair(start["name"], end["name"]):
+        return precomputed_routes.age_s()
+    return None
+
+def ranking_fields(options):
+    if traffic_model is None or options["depart_at"] is None:
+        return {"ranking": "distance"}
+    return {"ranking": "predicted_duration", "depart_at": options["depart_at"].isoformat(timespec="minutes")}
+
+def finalize_routes(start, end, routes, options):
+    """Trie les itinéraires (durée prévue, sinon distance) et construit la réponse de /api/routes"""
+    routes = sorted(routes, key=route_rank)
+    start, end = format_endpoints(start, end, options)
+    return {
+        "start": start,
+        "end": end,
+        "routes": [format_route_output(route, options) for route in routes],
+        "shortest_index": shortest_position(routes, range(len(routes))),
+        "fastest_index": fastest_position(routes, range(len(routes))),
+        "total_routes_found": len(routes),
+        "osrm_raw_code": 200,
+        "precomputed_age_s": precomputed_age_for(start, end),
+        **ranking_fields(options)
+    }
+
+def compute_routes(start, end, options):
+    """Calcule la réponse complète pour une paire, ou None si aucun itinéraire"""
+    deadline = time.monotonic() + ROUTES_DEADLINE
+    routes = list(iter_routes(start, end, options["alternatives"], deadline, options["depart_at"]))
+    if len(routes) == 0:
+        return None
+    return finalize_routes(start, end, routes, options)
+
+def sse_event(event, data):
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n"
+
+def stream_routes(start, end, options):
+    """Version SSE de /api/routes: chaque itinéraire est envoyé dès qu'il est trouvé.
+
+    Événements: `start` (départ/arrivée), `route` ({"id", "route"}, dans l'ordre
+    d'arrivée: le direct d'abord), puis `done` avec `order` (ids triés comme
+    la réponse JSON), `shortest_index` et `fastest_index`, ou `error` si aucun itinéraire.
+    """
+    formatted_start, formatted_end = format_endpoints(start, end, options)
+    yield sse_event("start", {"start": formatted_start, "end": formatted_end})
+
+    deadline = time.monotonic() + ROUTES_DEADLINE
     routes = []
-    
-    # 1. Itinéraire direct (OSRM standard)
-    coords = f"{start['lon']},{start['lat']};{end['lon']},{end['lat']}"
+    for route in iter_routes(start, end, options["alternatives"], deadline, options["depart_at"]):
+        yield sse_event("route", {"id": len(routes), "route": format_route_output(route, options)})
+        routes.append(route)
+
+    if not routes:
+        yield sse_event("error", {"error": "Aucun itinéraire trouvé"})
+        return
+    order = sorted(range(len(routes)), key=lambda i: route_rank(routes[i]))
+    yield sse_event("done", {
+        "order": order,
+        "shortest_index": shortest_position(routes, order),
+        "fastest_index": fastest_position(routes, order),
+        "total_routes_found": len(routes),
+        "osrm_raw_code": 200,
+        "precomputed_age_s": precomputed_age_for(start, end),
+        **ranking_fields(options)
+    })
+
+def wants_stream(data, accept):
+    return bool(data.get("stream")) or "text/event-stream" in accept
+
+@app.route("/api/routes", methods=["POST"])
+def api_routes():
+    data = request.get_json(force=True)
+
+    start, error = resolve_point(data, "start")
+    if error:
+        return jsonify({"error": error}), 400
+    end, error = resolve_point(data, "end")
+    if error:
+        return jsonify({"error": error}), 400
+    options, error = parse_route_options(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    if wants_stream(data, request.headers.get("Accept", "")):
+        response = Response(stream_with_context(stream_routes(start, end, options)),
+                            mimetype="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        # Pas de mise en tampon par nginx/Render: le premier itinéraire doit partir tout de suite
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    payload = compute_routes(start, end, options)
+    if payload is None:
+        return jsonify({"error": "Aucun itinéraire trouvé"}), 404
+    with stage("serialize"):
+        return jsonify(payload)
+
+def ndjson_line(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+def leg_key(start, end, options):
+    """Clé d'un trajet pour dédupliquer les paires identiques d'un lot"""
+    return (
+        start["name"], round(float(start["lat"]), 5), round(float(start["lon"]), 5),
+        end["name"], round(float(end["lat"]), 5), round(float(end["lon"]), 5),
+        tuple(sorted(options.items())),
+    )
+
+@app.route("/api/routes/batch", methods=["POST"])
+def api_routes_batch():
+    """Lot de paires départ/arrivée; résultats en NDJSON, une ligne par paire dès qu'elle est prête"""
+    data = request.get_json(force=True)
+    pairs = data.get("pairs")
+    if not isinstance(pairs, list) or not pairs:
+        return jsonify({"error": "pairs (non-empty list) required"}), 400
+    if len(pairs) > BATCH_MAX_PAIRS:
+        return jsonify({"error": f"at most {BATCH_MAX_PAIRS} pairs per batch"}), 400
+
+    # Options du lot = valeurs par défaut de chaque paire
+    defaults = {k: data[k] for k in ("alternatives", "geometry_format", "zoom", "inline_images") if k in data}
+    legs = {}
+    errors = []
+    for index, pair in enumerate(pairs):
+        start, error = resolve_point(pair, "start")
+        if not error:
+            end, error = resolve_point(pair, "end")
+        if not error:
+            options, error = parse_route_options(pair, defaults)
+        if error:
+            errors.append({"index": index, "error": error})
+            continue
+        key = leg_key(start, end, options)
+        if key not in legs:
+            legs[key] = (start, end, options, [])
+        legs[key][3].append(index)
+
+    def generate():
+        for line in errors:
+            yield ndjson_line(line)
+        futures = {batch_executor.submit(compute_routes, start, end, options): indices
+                   for start, end, options, indices in legs.values()}
+        for future in as_completed(futures):
+            try:
+                payload = future.result()
+                error = None if payload is not None else "Aucun itinéraire trouvé"
+            except Exception as e:
+                print(f"Erreur lot d'itinéraires: {e}")
+                payload, error = None, "Erreur interne"
+            for index in futures[future]:
+                if error:
+                    yield ndjson_line({"index": index, "error": error})
+                else:
+                    yield ndjson_line(dict(payload, index=index))
+        yield ndjson_line({"done": True, "pairs": len(pairs), "unique_legs": len(legs),
+                           "errors": len(errors)})
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+def resolve_matrix_point(item, label):
+    """Point d'une matrice: nom de landmark ou {"lat", "lon"}; retourne (point, erreur)"""
+    if isinstance(item, str):
+        landmark = places().find_landmark(item)
+        if landmark is None:
+            return None, f"{label} landmark '{item}' unknown"
+        return {"name": landmark.name, "lat": landmark.lat, "lon": landmark.lon}, None
+    if isinstance(item, dict) and "lat" in item and "lon" in item:
+        try:
+            lat, lon = float(item["lat"]), float(item["lon"])
+        except (TypeError, ValueError):
+            return None, f"{label} lat and lon must be numbers"
+        return {"name": item.get("name"), "lat": lat, "lon": lon}, None
+    return None, f"{label} must be a landmark name or {{lat, lon}}"
+
+def precomputed_matrix_rows(origins, destinations):
+    """Lignes de la matrice servies par la table pré-calculée, si tous les points y sont"""
+    names = precomputed_routes.landmarks
+    table = precomputed_routes.table
+    if not names or not table.get("durations"):
+        return None
+    position = {name: i for i, name in enumerate(names)}
+    if not all(p["name"] in position for p in origins + destinations):
+        return None
+    rows = []
+    for origin_index, origin in enumerate(origins):
+        i = position[origin["name"]]
+        columns = [position[d["name"]] for d in destinations]
+        distances = table.get("distances") or [[None] * len(names) for _ in names]
+        rows.append({
+            "origin_index": origin_index,
+            "durations_s": [table["durations"][i][j] for j in columns],
+            "distances_m": [distances[i][j] for j in columns],
+        })
+    return rows
+
+def fetch_matrix_block(block, destinations):
+    """Appel /table pour un bloc d'origines (points uniques) vers toutes les destinations"""
+    points = block + destinations
+    coords = ";".join(f"{p['lon']},{p['lat']}" for p in points)
     params = {
-        "overview": "full",
-        "geometries": "geojson",
-        "steps": "false",
-        "alternatives": "true"
+        "sources": ";".join(str(i) for i in range(len(block))),
+        "destinations": ";".join(str(i) for i in range(len(block), len(points))),
+        "annotations": "duration,distance",
     }
-    url = f"{OSRM_BASE}/route/v1/driving/{coords}"
+    return routing_backend.table(coords, params, timeout=OSRM_TIMEOUT)
 
-    try:
-        r = requests.get(url, params=params, timeout=15)
-        r.raise_for_status()
-        osrm = r.json()
-        
-        if "routes" in osrm and len(osrm["routes"]) > 0:
-            for idx, route in enumerate(osrm["routes"][:min(3, alternatives)]):
-                dist_km = route.get("distance", 0) / 1000.0
-                dur_min = route.get("duration", 0) / 60.0
-                stops = generate_stops_for_route("direct", start, end, idx)
-                
-                routes.append({
-                    "distance_km": round(dist_km, 3),
-                    "duration_min": round(dur_min, 1),
-                    "geometry": route.get("geometry"),
-                    "summary": route.get("legs", [{}])[0].get("summary", ""),
-                    "type": "direct",
-                    "stops": stops
-                })
-    except Exception as e:
-        print(f"Erreur OSRM direct: {e}")
+@app.route("/api/matrix", methods=["POST"])
+def api_matrix():
+    """Matrice durées/distances origines x destinations, en NDJSON (une ligne par origine)"""
+    data = request.get_json(force=True)
+    origins, destinations = [], []
+    for key, label, target in (("origins", "Origin", origins), ("destinations", "Destination", destinations)):
+        items = data.get(key)
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": f"{key} (non-empty list) required"}), 400
+        for item in items:
+            point, error = resolve_matrix_point(item, label)
+            if error:
+                return jsonify({"error": error}), 400
+            target.append(point)
 
-    # 2. Générer des itinéraires avec points intermédiaires
-    if len(routes) < alternatives:
-        intermediate_points = generate_intermediate_points(start, end, num_points=5)
-        
-        for i, point in enumerate(intermediate_points):
-            if len(routes) >= alternatives:
-                break
-                
-            route_data = get_route_via_waypoints(start, end, [point])
-            
-            if route_data and "routes" in route_data and len(route_data["routes"]) > 0:
-                route = route_data["routes"][0]
-                dist_km = route.get("distance", 0) / 1000.0
-                dur_min = route.get("duration", 0) / 60.0
-                
-                is_unique = True
-                for existing_route in routes:
-                    existing_dist = existing_route["distance_km"]
-                    if abs(dist_km - existing_dist) < 0.5:
-                        is_unique = False
-                        break
-                
-                if is_unique:
-                    stops = generate_stops_for_route("via_intermediate", start, end, len(routes))
-                    routes.append({
-                        "distance_km": round(dist_km, 3),
-                        "duration_min": round(dur_min, 1),
-                        "geometry": route.get("geometry"),
-                        "summary": route.get("legs", [{}])[0].get("summary", ""),
-                        "type": "via_intermediate",
-                        "stops": stops
-                    })
+    # Points identiques envoyés une seule fois à /table
+    def unique(points):
+        keys, uniques, mapping = {}, [], []
+        for p in points:
+            key = (round(p["lat"], 5), round(p["lon"], 5))
+            if key not in keys:
+                keys[key] = len(uniques)
+                uniques.append(p)
+            mapping.append(keys[key])
+        return uniques, mapping
+
+    unique_origins, origin_map = unique(origins)
+    unique_destinations, destination_map = unique(destinations)
+    if len(unique_destinations) >= MATRIX_MAX_COORDS:
+        return jsonify({"error": f"at most {MATRIX_MAX_COORDS - 1} distinct destinations"}), 400
 
-    # 3. Utiliser des landmarks comme points de passage
-    if len(routes) < alternatives:
-        potential_waypoints = []
-        
-        for landmark_name, landmark_coords in LANDMARKS.items():
-            if (landmark_coords["lat"] == start["lat"] and landmark_coords["lon"] == start["lon"]) or \
-               (landmark_coords["lat"] == end["lat"] and landmark_coords["lon"] == end["lon"]):
+    def generate():
+        rows = precomputed_matrix_rows(origins, destinations)
+        if rows is not None:
+            for row in rows:
+                yield ndjson_line(row)
+            yield ndjson_line({"done": True, "source": "precomputed",
+                               "precomputed_age_s": precomputed_routes.age_s()})
+            return
+
+        block_size = MATRIX_MAX_COORDS - len(unique_destinations)
+        blocks = [unique_origins[i:i + block_size] for i in range(0, len(unique_origins), block_size)]
+        futures = {osrm_executor.submit(fetch_matrix_block, block, unique_destinations): n * block_size
+                   for n, block in enumerate(blocks)}
+        origins_for = {}
+        for origin_index, u in enumerate(origin_map):
+            origins_for.setdefault(u, []).append(origin_index)
+
+        failed = 0
+        for future in as_completed(futures):
+            first = futures[future]
+            try:
+                table = future.result()
+            except Exception as e:
+                print(f"Erreur matrice: {e}")
+                table = None
+            if not table or table.get("code") != "Ok":
+                failed += 1
+                block_len = min(block_size, len(unique_origins) - first)
+                for u in range(first, first + block_len):
+                    for origin_index in origins_for.get(u, []):
+                        yield ndjson_line({"origin_index": origin_index, "error": "Matrice indisponible"})
                 continue
-            
-            dist_to_start = calculate_distance(start["lat"], start["lon"], 
-                                             landmark_coords["lat"], landmark_coords["lon"])
-            dist_to_end = calculate_distance(landmark_coords["lat"], landmark_coords["lon"],
-                                           end["lat"], end["lon"])
-            direct_dist = calculate_distance(start["lat"], start["lon"], end["lat"], end["lon"])
-            
-            if (dist_to_start + dist_to_end) < direct_dist * 1.8:
-                potential_waypoints.append(landmark_coords)
-        
-        for i, waypoint in enumerate(potential_waypoints[:3]):
-            if len(routes) >= alternatives:
-                break
-                
-            route_data = get_route_via_waypoints(start, end, [waypoint])
-            
-            if route_data and "routes" in route_data and len(route_data["routes"]) > 0:
-                route = route_data["routes"][0]
-                dist_km = route.get("distance", 0) / 1000.0
-                dur_min = route.get("duration", 0) / 60.0
-                
-                is_unique = True
-                for existing_route in routes:
-                    existing_dist = existing_route["distance_km"]
-                    if abs(dist_km - existing_dist) < 0.5:
-                        is_unique = False
-                        break
-                
-                if is_unique:
-                    stops = generate_stops_for_route("via_landmark", start, end, len(routes))
-                    routes.append({
-                        "distance_km": round(dist_km, 3),
-                        "duration_min": round(dur_min, 1),
-                        "geometry": route.get("geometry"),
-                        "summary": route.get("legs", [{}])[0].get("summary", ""),
-                        "type": "via_landmark",
-                        "stops": stops
+            durations = table.get("durations") or []
+            distances = table.get("distances") or [[None] * len(unique_destinations) for _ in durations]
+            for k, (row_d, row_l) in enumerate(zip(durations, distances)):
+                for origin_index in origins_for.get(first + k, []):
+                    yield ndjson_line({
+                        "origin_index": origin_index,
+                        "durations_s": [row_d[j] for j in destination_map],
+                        "distances_m": [row_l[j] for j in destination_map],
                     })
+        yield ndjson_line({"done": True, "source": ROUTING_BACKEND, "blocks": len(blocks),
+                           "failed_blocks": failed, "unique_origins": len(unique_origins),
+                           "unique_destinations": len(unique_destinations)})
 
-    if len(routes) == 0:
-        return jsonify({"error": "Aucun itinéraire trouvé"}), 404
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
-    routes.sort(key=lambda x: x["distance_km"])
-    shortest_index = 0
+def wants_trace(header_value):
+    """Trace demandée par l'en-tête X-Trace (ou activée pour toutes les requêtes)"""
+    return METRICS_TRACE_ALL or header_value not in ("", "0")
 
-    return jsonify({
-        "start": start,
-        "end": end,
-        "routes": routes,
-        "shortest_index": shortest_index,
-        "total_routes_found": len(routes),
-        "osrm_raw_code": 200
-    })
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    g.trace_token = start_trace() if wants_trace(request.headers.get("X-Trace", "")) else None
+    g.profile = profiler.start()
+
+# Enregistré avant compress_response: Flask l'appelle après, compression comprise
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop("metrics_started", None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or "unknown"
+    REQUEST_SECONDS.observe(elapsed, endpoint, request.method, str(response.status_code))
+    # Réponse en flux: le générateur n'a pas encore tourné, trace et profil seraient vides
+    trace_token = g.pop("trace_token", None)
+    if trace_token is not None:
+        trace = end_trace(trace_token)
+        if not response.is_streamed:
+            response.headers["Server-Timing"] = server_timing(trace + [("total", elapsed)])
+    profile = g.pop("profile", None)
+    if profile is not None:
+        if response.is_streamed:
+            profiler.discard(profile)
+        else:
+            profiler.stop(profile, endpoint)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compresse les réponses texte/JSON selon Accept-Encoding (br puis gzip)"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+
+    body, encoding = compress_body(response.get_data(), request.headers.get("Accept-Encoding", ""))
+    if encoding is None:
+        return response
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+def compress_body(body, accept_encoding):
+    """(corps compressé, encodage) selon Accept-Encoding, ou (body, None) si inutile"""
+    if len(body) < COMPRESS_MIN_SIZE:
+        return body, None
+    if brotli is not None and "br" in accept_encoding:
+        return brotli.compress(body, quality=5), "br"
+    if "gzip" in accept_encoding:
+        return gzip.compress(body, compresslevel=6), "gzip"
+    return body, None
+
+@app.route("/api/landmarks")
+def api_landmarks():
+    """Landmarks courants (avec ETag: 304 si inchangés). ?lat=&lon=[&radius_m=] : les plus proches d'abord"""
+    snapshot = places()
+    if "lat" in request.args and "lon" in request.args:
+        try:
+            lat, lon = float(request.args["lat"]), float(request.args["lon"])
+            radius_m = float(request.args.get("radius_m", 5000))
+        except ValueError:
+            return jsonify({"error": "lat, lon and radius_m must be numbers"}), 400
+        nearest = snapshot.landmark_index.nearest(lat, lon, radius_m, limit=len(snapshot.landmarks))
+        body = json.dumps({"landmarks": [dict(place.to_dict(), distance_m=round(distance_m))
+                                         for place, distance_m in nearest]},
+                          ensure_ascii=False, separators=(",", ":"))
+        response = Response(body, mimetype="application/json")
+        response.add_etag()
+    else:
+        response = Response(snapshot.landmarks_json, mimetype="application/json")
+        response.set_etag(snapshot.etag)
+    # Toujours revalider: un rechargement des lieux change l'ETag
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+@app.route("/api/routes/bundle")
+def api_routes_bundle():
+    """Lot d'itinéraires entre landmarks (gzip tel quel, ETag: 304 si inchangé)"""
+    data, etag = route_bundle.current()
+    if data is None:
+        return jsonify({"error": "route bundle not built (flask export-route-bundle)"}), 404
+    route_bundle.served += 1
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        response = Response(data, mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(gzip.decompress(data), mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
 
 @app.route("/api/health")
 def health_check():
-    return jsonify({"status": "healthy", "service": "Kinshasa Routes API"})
+    return jsonify({
+        "status": "healthy",
+        "service": "Kinshasa Routes API",
+        "routing_backend": ROUTING_BACKEND,
+        "precomputed_routes": precomputed_routes.stats(),
+        "traffic": traffic_model.stats() if traffic_model is not None else None,
+        "places": place_store.stats(),
+        "tiles": tile_store.stats() if tile_store is not None else None,
+        "route_bundle": route_bundle.stats()
+    })
+
+@app.route("/api/health/osrm")
+def osrm_pool_stats():
+    """Clients OSRM par chemin de service (wsgi: routes Flask, asgi: /api/routes sous uvicorn)"""
+    if routing_backend is not osrm_client:
+        return jsonify(routing_backend.stats())
+    return jsonify({path: client.stats() for path, client in OSRM_CLIENTS.items()})
+
+@app.route("/api/health/cache")
+def route_cache_stats():
+    return jsonify(route_cache.stats())
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route("/api/health/singleflight")
+def route_flight_stats():
+    return jsonify({path: flight.stats() for path, flight in ROUTE_FLIGHTS.items()})
+
+def landmark_route_variants(start, end):
+    """Requêtes OSRM faites par l'API pour une paire de landmarks pré-calculée"""
+    variants = [([start, end], OSRM_DIRECT_PARAMS)]
+    for _, waypoint in build_waypoint_candidates(start, end):
+        variants.append(([start, waypoint, end], OSRM_WAYPOINT_PARAMS))
+    return variants
+
+@app.cli.command("precompute-routes")
+@click.option("--output", default=PRECOMPUTED_ROUTES_PATH, show_default=True,
+              help="Fichier gzip à produire")
+@click.option("--delay", default=0.2, show_default=True,
+              help="Pause entre deux appels OSRM (s), pour ménager le serveur public")
+def precompute_routes_command(output, delay):
+    """Recalcule la matrice des itinéraires entre tous les landmarks."""
+    started = time.monotonic()
+    landmarks = {name: place.to_dict() for name, place in places().landmarks.items()}
+    artifact = build_landmark_artifact(landmarks, routing_backend, landmark_route_variants,
+                                       precision=route_cache.precision, delay=delay)
+    save_artifact(artifact, output)
+    click.echo(f"{len(artifact['pairs'])} paires, {len(artifact['responses'])} réponses OSRM, "
+               f"{artifact['failures']} échec(s) -> {output} "
+               f"({time.monotonic() - started:.1f}s)")
+
+@app.cli.command("build-ch")
+@click.option("--graph", "graph_path", default=LOCAL_GRAPH_PATH, show_default=True,
+              help="Graphe routier JSON")
+@click.option("--output", default=LOCAL_CH_PATH, show_default=True,
+              help="Index CH à produire")
+def build_ch_command(graph_path, output):
+    """Pré-calcule l'index de hiérarchies de contraction du moteur local."""
+    started = time.monotonic()
+    graph = RoadGraph.load(graph_path)
+    arrays = build_contraction_hierarchy(graph)
+    save_index(arrays, output, graph.names)
+    shortcuts = int((arrays["fwd_mids"] >= 0).sum() + (arrays["bwd_mids"] >= 0).sum())
+    click.echo(f"{graph.num_nodes} nœuds, {graph.num_edges} arcs, {shortcuts} raccourcis -> {output} "
+               f"({time.monotonic() - started:.1f}s)")
+
+@app.cli.command("build-traffic-profile")
+@click.option("--observations", "observations_path", required=True,
+              help="CSV lat,lon,weekday,hour,speed_ratio (vitesse observée / vitesse libre)")
+@click.option("--output", default=TRAFFIC_PROFILE_PATH, show_default=True,
+              help="Fichier de profils à produire")
+@click.option("--cell-deg", default=0.02, show_default=True, help="Taille des cellules (degrés)")
+@click.option("--min-samples", default=3, show_default=True,
+              help="Observations minimum par créneau (sinon profil par défaut)")
+def build_traffic_profile_command(observations_path, output, cell_deg, min_samples):
+    """Construit les profils de vitesse par zone, jour et heure."""
+    started = time.monotonic()
+    model = build_profiles(read_observations(observations_path), cell_deg, min_samples)
+    model.save(output)
+    click.echo(f"{len(model.keys)} cellules, {model.meta['samples']} observations -> {output} "
+               f"({os.path.getsize(output)} octets, {time.monotonic() - started:.1f}s)")
+
+@app.cli.command("build-tiles")
+@click.option("--output", default=TILES_PATH, show_default=True, help="Fichier MBTiles à produire (ou compléter)")
+@click.option("--source", default=TILES_SOURCE_URL,
+              help="Modèle d'URL des tuiles amont ({z}, {x}, {y}, {s}), ou TILES_SOURCE_URL. Les conditions "
+                   "du fournisseur doivent autoriser le téléchargement en masse et le stockage hors ligne "
+                   "(pas tile.openstreetmap.org: sa politique d'usage l'interdit)")
+@click.option("--min-zoom", default=11, show_default=True)
+@click.option("--max-zoom", default=16, show_default=True)
+@click.option("--margin", default=0.02, show_default=True, help="Marge autour des landmarks (degrés)")
+@click.option("--delay", default=0.1, show_default=True,
+              help="Pause entre deux tuiles (s), pour respecter la politique d'usage du serveur amont")
+@click.option("--max-tiles", default=20000, show_default=True, help="Refuse au-delà de ce nombre de tuiles")
+@click.option("--attribution", default=TILES_ATTRIBUTION,
+              help="Attribution exigée par la licence des tuiles (ex: données © OpenStreetMap contributors, "
+                   "ODbL, plus le fournisseur), affichée sur la carte; ou TILES_ATTRIBUTION")
+def build_tiles_command(output, source, min_zoom, max_zoom, margin, delay, max_tiles, attribution):
+    """Télécharge les tuiles de l'emprise des landmarks dans un fichier MBTiles.
+
+    Utiliser son propre serveur de tuiles ou un fournisseur dont la licence permet
+    le pré-téléchargement, et respecter son attribution.
+    """
+    if not source:
+        raise click.UsageError("--source (ou TILES_SOURCE_URL) requis: serveur de tuiles qui autorise "
+                               "le téléchargement en masse")
+    if not attribution:
+        raise click.UsageError("--attribution (ou TILES_ATTRIBUTION) requis par la licence des tuiles")
+    started = time.monotonic()
+    bbox = places_bbox(places().landmarks.values(), margin)
+    count = tile_count(bbox, min_zoom, max_zoom)
+    if count > max_tiles:
+        raise click.ClickException(f"{count} tuiles (zoom {min_zoom}-{max_zoom}) > --max-tiles {max_tiles}")
+    click.echo(f"{count} tuiles, zoom {min_zoom}-{max_zoom}, emprise {', '.join(f'{v:.4f}' for v in bbox)}")
+    counts = build_mbtiles(output, bbox, min_zoom, max_zoom, source, delay=delay, attribution=attribution,
+                           progress=lambda c: click.echo(f"  {c['fetched']} téléchargées..."))
+    click.echo(f"{counts['fetched']} téléchargées, {counts['skipped']} déjà présentes, "
+               f"{counts['failed']} échec(s) -> {output} "
+               f"({os.path.getsize(output)} octets, {time.monotonic() - started:.1f}s)")
+
+@app.cli.command("export-route-bundle")
+@click.option("--output", default=ROUTE_BUNDLE_PATH, show_default=True, help="Fichier gzip à produire")
+@click.option("--alternatives", default=5, show_default=True)
+@click.option("--zoom", default=16, show_default=True,
+              help="Tracés simplifiés pour ce niveau de zoom (-1: tracés complets)")
+def export_route_bundle_command(output, alternatives, zoom):
+    """Exporte les itinéraires entre landmarks pour le service worker."""
+    started = time.monotonic()
+    snapshot = places()
+    pairs = sorted(pair for pair in precomputed_routes.pairs
+                   if pair[0] in snapshot.landmarks and pair[1] in snapshot.landmarks)
+    if not pairs:
+        click.echo("Aucune paire pré-calculée (flask precompute-routes): toutes les paires sont calculées")
+        pairs = [(s, e) for s in sorted(snapshot.landmarks) for e in sorted(snapshot.landmarks) if s != e]
+    options, _ = parse_route_options({"alternatives": alternatives, "geometry_format": "polyline6",
+                                      "zoom": zoom if zoom >= 0 else None})
+    # Lot valable à toute heure: pas de durée prévue, classement par distance
+    options["depart_at"] = None
+
+    def compute_pair(start_name, end_name):
+        return compute_routes(snapshot.landmarks[start_name].to_dict(), snapshot.landmarks[end_name].to_dict(),
+                              options)
+
+    bundle = build_route_bundle(pairs, compute_pair, meta={
+        "precomputed_generated_at": precomputed_routes.generated_at,
+        "landmarks_etag": snapshot.etag,
+        "alternatives": options["alternatives"],
+        "geometry_format": options["geometry_format"],
+        "zoom": options["zoom"],
+    })
+    save_artifact(bundle, output)
+    click.echo(f"{bundle['pairs']} paires, {bundle['failures']} sans itinéraire -> {output} "
+               f"({os.path.getsize(output)} octets, {time.monotonic() - started:.1f}s)")
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,386 @@
+"""Point d'entrée ASGI (uvicorn): /api/routes non bloquant, le reste de l'application Flask en WSGI.
+
+    uvicorn asgi:application --workers 2
+
+Un appel /api/routes n'occupe plus un thread pendant qu'il attend OSRM: les
+appels partent sur une session aiohttp partagée, et un seul processus garde
+des centaines de requêtes en vol. Les autres routes Flask (pages, images,
+lots, santé) passent par un pool de threads WSGI (a2wsgi).
+Le contrat de requête/réponse de /api/routes est identique (JSON ou SSE).
+"""
+import asyncio
+import json
+import os
+import time
+
+from a2wsgi import WSGIMiddleware
+
+import app as flask_module
+from geometry import RouteGeometry
+from osrm_client import AsyncOSRMClient, DeadlineExceededError
+from places import check_files
+from singleflight import AsyncSingleFlight
+from metrics import end_trace, server_timing, stage, start_trace
+
+# Requêtes /api/routes traitées en même temps par processus (au-delà: attente)
+ASYNC_MAX_INFLIGHT = int(os.environ.get("ASYNC_MAX_INFLIGHT", "500"))
+# Connexions keep-alive vers OSRM pour tout le processus
+ASYNC_OSRM_POOL_SIZE = int(os.environ.get("ASYNC_OSRM_POOL_SIZE", "100"))
+# Threads servant les routes Flask restantes
+WSGI_THREADS = int(os.environ.get("WSGI_THREADS", "8"))
+
+flask_app = flask_module.app
+wsgi_app = WSGIMiddleware(flask_app, workers=WSGI_THREADS)
+
+# Le moteur local calcule en CPU: il tourne dans un thread, sans client HTTP
+if flask_module.ROUTING_BACKEND == "osrm":
+    async_client = AsyncOSRMClient(
+        flask_module.OSRM_BASE,
+        timeout=flask_module.OSRM_TIMEOUT,
+        pool_size=ASYNC_OSRM_POOL_SIZE,
+        max_retries=int(os.environ.get("OSRM_MAX_RETRIES", "2")),
+        backoff_factor=float(os.environ.get("OSRM_BACKOFF_FACTOR", "0.3")),
+        backoff_jitter=float(os.environ.get("OSRM_BACKOFF_JITTER", "0.3")),
+        failure_threshold=int(os.environ.get("OSRM_BREAKER_THRESHOLD", "5")),
+        reset_timeout=float(os.environ.get("OSRM_BREAKER_RESET", "30")),
+    )
+else:
+    async_client = None
+
+inflight = asyncio.Semaphore(ASYNC_MAX_INFLIGHT)
+# Appels /route identiques en vol regroupés après un défaut de cache
+route_flight = AsyncSingleFlight()
+
+# Exportés sur /metrics avec path="asgi", à côté des objets synchrones des routes Flask (path="wsgi")
+flask_module.ROUTE_FLIGHTS["asgi"] = route_flight
+if async_client is not None:
+    flask_module.OSRM_CLIENTS["asgi"] = async_client
+stats = {"requests": 0, "in_flight": 0, "streams": 0}
+
+# Cache sqlite: lectures (qui mettent à jour l'ordre LRU) et écritures sont des accès disque
+# bloquants; ils passent dans un thread pour ne pas figer les autres requêtes en vol
+CACHE_IN_THREAD = flask_module.route_cache.backend.name != "memory"
+
+
+async def call_cache(fn, *args):
+    if CACHE_IN_THREAD:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
+async def call_formatter(options, fn, *args):
+    """Mise en forme de la réponse; avec inline_images, lectures des images sur disque dans un thread"""
+    if options["inline_images"]:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
+async def fetch_osrm_route(points, params, deadline=None):
+    """Version asynchrone de app.fetch_osrm_route (pré-calculé, cache, puis réseau)"""
+    cached, key = await call_cache(flask_module.cached_route, points, params)
+    if cached is not None:
+        return cached
+    timeout = flask_module.call_timeout(deadline)
+    if timeout <= 0:
+        raise DeadlineExceededError("Délai épuisé avant l'appel au moteur")
+
+    coords = ";".join(f"{p['lon']},{p['lat']}" for p in points)
+    return await route_flight.do(key, lambda: fetch_upstream_route(key, coords, params, timeout))
+
+
+async def fetch_upstream_route(key, coords, params, timeout):
+    with stage("upstream"):
+        try:
+            if async_client is not None:
+                data = await async_client.route(coords, params, timeout=timeout)
+            else:
+                data = await asyncio.to_thread(flask_module.routing_backend.route, coords, params, timeout)
+        except Exception as e:
+            flask_module.UPSTREAM_ERRORS.inc(flask_module.ROUTING_BACKEND, type(e).__name__)
+            raise
+    if data.get("code") == "Ok":
+        await call_cache(flask_module.route_cache.set, key, data)
+    else:
+        flask_module.UPSTREAM_ERRORS.inc(flask_module.ROUTING_BACKEND, str(data.get("code")))
+    return data
+
+
+async def get_route_via_waypoints(start, end, waypoints, deadline=None):
+    try:
+        with stage("route_waypoint"):
+            return await fetch_osrm_route([start] + list(waypoints) + [end], flask_module.OSRM_WAYPOINT_PARAMS,
+                                          deadline)
+    except Exception as e:
+        print(f"Erreur OSRM avec waypoints: {e}")
+        return None
+
+
+async def get_direct_routes(start, end, deadline=None):
+    try:
+        with stage("route_direct"):
+            return await fetch_osrm_route([start, end], flask_module.OSRM_DIRECT_PARAMS, deadline)
+    except Exception as e:
+        print(f"Erreur OSRM direct: {e}")
+        return None
+
+
+async def iter_routes(start, end, alternatives, deadline, depart_at=None):
+    """Même sélection que app.iter_routes, avec des tâches asyncio au lieu de threads"""
+    def remaining():
+        return max(0.0, deadline - time.monotonic())
+
+    direct_task = asyncio.create_task(get_direct_routes(start, end, deadline))
+    waypoint_tasks = {}
+    if alternatives > 1:
+        for route_type, waypoint in flask_module.build_waypoint_candidates(start, end):
+            task = asyncio.create_task(get_route_via_waypoints(start, end, [waypoint], deadline))
+            waypoint_tasks[task] = route_type
+
+    routes = []
+    shapes = []
+    try:
+        # L'itinéraire direct passe en premier: il sert de référence pour l'unicité
+        done, _ = await asyncio.wait([direct_task], timeout=remaining())
+        osrm = direct_task.result() if done else None
+        if osrm and "routes" in osrm and len(osrm["routes"]) > 0:
+            for route in osrm["routes"][:min(3, alternatives)]:
+                shape = RouteGeometry.from_geometry(route.get("geometry"))
+                if not flask_module.is_unique_route(shape, shapes):
+                    continue
+                entry = flask_module.make_route_entry(route, "direct", start, end, len(routes),
+                                                      shape, depart_at)
+                routes.append(entry)
+                shapes.append(shape)
+                yield entry
+
+        if len(routes) >= alternatives:
+            return
+
+        pending = set(waypoint_tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=remaining(),
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                print(f"Délai global dépassé ({flask_module.ROUTES_DEADLINE}s), "
+                      f"{len(routes)} itinéraire(s) retenu(s)")
+                return
+            for task in done:
+                route_data = task.result()
+                if not (route_data and "routes" in route_data and len(route_data["routes"]) > 0):
+                    continue
+
+                route = route_data["routes"][0]
+                shape = RouteGeometry.from_geometry(route.get("geometry"))
+                if flask_module.is_unique_route(shape, shapes):
+                    entry = flask_module.make_route_entry(route, waypoint_tasks[task], start, end,
+                                                          len(routes), shape, depart_at)
+                    routes.append(entry)
+                    shapes.append(shape)
+                    yield entry
+                    if len(routes) >= alternatives:
+                        return
+    finally:
+        direct_task.cancel()
+        for task in waypoint_tasks:
+            task.cancel()
+
+
+async def compute_routes(start, end, options):
+    deadline = time.monotonic() + flask_module.ROUTES_DEADLINE
+    routes = [route async for route in iter_routes(start, end, options["alternatives"], deadline,
+                                                   options["depart_at"])]
+    if len(routes) == 0:
+        return None
+    return await call_formatter(options, flask_module.finalize_routes, start, end, routes, options)
+
+
+async def stream_routes(start, end, options):
+    """Version asynchrone de app.stream_routes (mêmes événements SSE)"""
+    formatted_start, formatted_end = await call_formatter(options, flask_module.format_endpoints,
+                                                         start, end, options)
+    yield flask_module.sse_event("start", {"start": formatted_start, "end": formatted_end})
+
+    deadline = time.monotonic() + flask_module.ROUTES_DEADLINE
+    routes = []
+    async for route in iter_routes(start, end, options["alternatives"], deadline, options["depart_at"]):
+        formatted = await call_formatter(options, flask_module.format_route_output, route, options)
+        yield flask_module.sse_event("route", {"id": len(routes), "route": formatted})
+        routes.append(route)
+
+    if not routes:
+        yield flask_module.sse_event("error", {"error": "Aucun itinéraire trouvé"})
+        return
+    order = sorted(range(len(routes)), key=lambda i: flask_module.route_rank(routes[i]))
+    yield flask_module.sse_event("done", {
+        "order": order,
+        "shortest_index": flask_module.shortest_position(routes, order),
+        "fastest_index": flask_module.fastest_position(routes, order),
+        "total_routes_found": len(routes),
+        "osrm_raw_code": 200,
+        "precomputed_age_s": flask_module.precomputed_age_for(start, end),
+        **flask_module.ranking_fields(options)
+    })
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def send_json(send, payload, status=200, accept_encoding=""):
+    # Même sérialisation que jsonify (clés triées, compacte)
+    with stage("serialize"):
+        body = flask_app.json.dumps(payload, separators=(",", ":")).encode("utf-8") + b"\n"
+    headers = [(b"content-type", b"application/json")]
+    body, encoding = flask_module.compress_body(body, accept_encoding)
+    if encoding is not None:
+        headers += [(b"content-encoding", encoding.encode()), (b"vary", b"Accept-Encoding")]
+    headers.append((b"content-length", str(len(body)).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_event_stream(send, receive, events):
+    """Envoie le flux SSE; s'arrête (et annule les appels OSRM) si le client se déconnecte"""
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        disconnected.set()
+
+    watcher = asyncio.create_task(watch_disconnect())
+    await send({"type": "http.response.start", "status": 200, "headers": [
+        (b"content-type", b"text/event-stream; charset=utf-8"),
+        (b"cache-control", b"no-cache"),
+        (b"x-accel-buffering", b"no"),
+    ]})
+    try:
+        async for chunk in events:
+            if disconnected.is_set():
+                break
+            await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+    finally:
+        watcher.cancel()
+        await events.aclose()
+    if not disconnected.is_set():
+        await send({"type": "http.response.body", "body": b""})
+
+
+async def api_routes(scope, receive, send):
+    """POST /api/routes avec les métriques des routes Flask (durée, Server-Timing).
+
+    Pas de profil cProfile ici: actif à travers les await, il mélangerait toutes
+    les requêtes en cours sur la boucle. Pas de Server-Timing en SSE: les
+    en-têtes partent avant le calcul des itinéraires.
+    """
+    headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+    started = time.perf_counter()
+    trace = {"token": start_trace() if flask_module.wants_trace(headers.get("x-trace", "")) else None}
+    status = {"code": 500}
+
+    async def send_with_metrics(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+            streamed = any(k.lower() == b"content-type" and v.startswith(b"text/event-stream")
+                           for k, v in message["headers"])
+            if trace["token"] is not None and not streamed:
+                timings = end_trace(trace["token"]) + [("total", time.perf_counter() - started)]
+                trace["token"] = None
+                message = dict(message, headers=list(message["headers"]) + [
+                    (b"server-timing", server_timing(timings).encode("latin-1"))])
+        await send(message)
+
+    try:
+        await handle_routes(receive, send_with_metrics, headers)
+    finally:
+        if trace["token"] is not None:
+            end_trace(trace["token"])
+        flask_module.REQUEST_SECONDS.observe(time.perf_counter() - started, "api_routes", "POST",
+                                             str(status["code"]))
+
+
+async def handle_routes(receive, send, headers):
+    accept_encoding = headers.get("accept-encoding", "")
+    body = await read_body(receive)
+    if body is None:
+        return
+    try:
+        data = json.loads(body or b"null")
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        await send_json(send, {"error": "JSON body required"}, 400)
+        return
+
+    # Lieux: stat et rechargement éventuel des fichiers dans un thread, puis, pour cette
+    # requête et ses tâches, places() sert l'instantané sans toucher au disque
+    check_files.set(False)
+    await asyncio.to_thread(flask_module.place_store.refresh)
+
+    start, error = flask_module.resolve_point(data, "start")
+    if not error:
+        end, error = flask_module.resolve_point(data, "end")
+    if not error:
+        options, error = flask_module.parse_route_options(data)
+    if error:
+        await send_json(send, {"error": error}, 400)
+        return
+
+    stats["requests"] += 1
+    async with inflight:
+        stats["in_flight"] += 1
+        try:
+            if flask_module.wants_stream(data, headers.get("accept", "")):
+                stats["streams"] += 1
+                await send_event_stream(send, receive, stream_routes(start, end, options))
+                return
+            payload = await compute_routes(start, end, options)
+        finally:
+            stats["in_flight"] -= 1
+
+    if payload is None:
+        await send_json(send, {"error": "Aucun itinéraire trouvé"}, 404, accept_encoding)
+    else:
+        await send_json(send, payload, 200, accept_encoding)
+
+
+async def health_async(send):
+    await send_json(send, {
+        "status": "ok",
+        "routing_backend": flask_module.ROUTING_BACKEND,
+        "max_inflight": ASYNC_MAX_INFLIGHT,
+        "wsgi_threads": WSGI_THREADS,
+        **stats,
+        "osrm_client": async_client.stats() if async_client is not None else None,
+        "singleflight": route_flight.stats(),
+    })
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if async_client is not None:
+                await async_client.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+    elif scope["type"] == "http" and scope["path"] == "/api/routes" and scope["method"] == "POST":
+        await api_routes(scope, receive, send)
+    elif scope["type"] == "http" and scope["path"] == "/api/health/async" and scope["method"] == "GET":
+        await health_async(send)
+    else:
+        await wsgi_app(scope, receive, send)
@@ -0,0 +1,11 @@
+"""Benchmarks: micro-benchmarks, serveur OSRM de substitution et générateur de charge (python -m bench.<module>)"""
+import subprocess
+
+
+def git_commit():
+    """Commit courant (court) pour identifier les résultats, ou None hors dépôt git"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
@@ -0,0 +1,161 @@
+"""Serveur OSRM de substitution pour les benchmarks, sans réseau.
+
+    python -m bench.fake_osrm --port 5055 --latency-ms 80 --jitter-ms 40 --error-rate 0.02
+
+Les réponses viennent, dans l'ordre:
+  1. des enregistrements (--replay): fichiers JSONL écrits par --record-to, ou
+     artefacts d'itinéraires pré-calculés (flask precompute-routes), mêmes clés;
+  2. sinon, du moteur de routage local sur --graph (réponses synthétiques
+     au format OSRM), pour que n'importe quelle paire de points réponde.
+
+--record-upstream URL relaie les défauts vers un vrai OSRM et les ajoute à
+--record-to, pour constituer un jeu d'enregistrements rejouable hors ligne.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import time
+
+from aiohttp import ClientSession, ClientTimeout, web
+
+from local_router import LocalRouter
+from route_cache import make_route_key
+
+DEFAULT_GRAPH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "data", "kinshasa_test_graph.json")
+
+
+def load_recordings(paths, precision=5):
+    """{clé make_route_key: réponse OSRM} depuis des JSONL ou des artefacts pré-calculés"""
+    recordings = {}
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            if path.endswith(".jsonl"):
+                for line in f:
+                    if line.strip():
+                        item = json.loads(line)
+                        recordings[item["key"]] = item["response"]
+            else:
+                recordings.update(json.load(f).get("responses", {}))
+    return recordings
+
+
+def parse_points(coords):
+    points = []
+    for pair in coords.split(";"):
+        lon, lat = pair.split(",")
+        points.append({"lat": float(lat), "lon": float(lon)})
+    return points
+
+
+class FakeOSRM:
+    def __init__(self, recordings, router, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 timeout_rate=0.0, timeout_s=30.0, precision=5, seed=None,
+                 record_upstream=None, record_to=None):
+        self.recordings = recordings
+        self.router = router
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_s = timeout_s
+        self.precision = precision
+        self.random = random.Random(seed)
+        self.record_upstream = record_upstream.rstrip("/") if record_upstream else None
+        self.record_to = record_to
+        self.session = None
+        self.counts = {"requests": 0, "replayed": 0, "synthesized": 0, "recorded": 0,
+                       "errors_injected": 0, "timeouts_injected": 0}
+
+    async def handle(self, request):
+        service = request.match_info["service"]
+        coords = request.match_info["coords"]
+        params = dict(request.query)
+        self.counts["requests"] += 1
+
+        # Latence simulée (gaussienne tronquée), puis pannes injectées
+        delay = max(0.0, self.random.gauss(self.latency_ms, self.jitter_ms)) / 1000.0
+        roll = self.random.random()
+        if roll < self.timeout_rate:
+            self.counts["timeouts_injected"] += 1
+            await asyncio.sleep(self.timeout_s)
+        elif roll < self.timeout_rate + self.error_rate:
+            self.counts["errors_injected"] += 1
+            await asyncio.sleep(delay)
+            return web.json_response({"code": "InternalError", "message": "injected"}, status=503)
+        await asyncio.sleep(delay)
+
+        key = make_route_key(service, parse_points(coords), params, self.precision)
+        data = self.recordings.get(key)
+        if data is not None:
+            self.counts["replayed"] += 1
+        elif self.record_upstream:
+            data = await self.fetch_upstream(service, coords, params, key)
+        else:
+            data = await asyncio.to_thread(self.synthesize, service, coords, params)
+            self.counts["synthesized"] += 1
+        return web.json_response(data)
+
+    def synthesize(self, service, coords, params):
+        if service == "table":
+            return self.router.table(coords, params)
+        return self.router.route(coords, params)
+
+    async def fetch_upstream(self, service, coords, params, key):
+        if self.session is None:
+            self.session = ClientSession(timeout=ClientTimeout(total=30))
+        url = f"{self.record_upstream}/{service}/v1/driving/{coords}"
+        async with self.session.get(url, params=params) as r:
+            data = await r.json(content_type=None)
+        if data.get("code") == "Ok":
+            self.recordings[key] = data
+            if self.record_to:
+                with open(self.record_to, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"key": key, "response": data}, separators=(",", ":")) + "\n")
+            self.counts["recorded"] += 1
+        return data
+
+    async def stats(self, request):
+        return web.json_response(dict(self.counts, recordings=len(self.recordings)))
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/{service}/v1/driving/{coords}", self.handle)
+        app.router.add_get("/_stats", self.stats)
+        return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--replay", action="append", default=[],
+                        help="Enregistrements: .jsonl (--record-to) ou artefact .json.gz pré-calculé")
+    parser.add_argument("--graph", default=DEFAULT_GRAPH, help="Graphe du moteur local pour les réponses synthétiques")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Part des appels en 503")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Part des appels qui ne répondent pas à temps")
+    parser.add_argument("--timeout-s", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--record-upstream", default=None, help="URL d'un vrai OSRM pour enregistrer les défauts")
+    parser.add_argument("--record-to", default=None, help="Fichier JSONL où ajouter les réponses enregistrées")
+    args = parser.parse_args(argv)
+
+    started = time.monotonic()
+    recordings = load_recordings(args.replay)
+    router = LocalRouter.load(args.graph, os.path.splitext(args.graph)[0] + ".ch")
+    print(f"{len(recordings)} réponses enregistrées, graphe {router.graph.num_nodes} nœuds "
+          f"({time.monotonic() - started:.1f}s)")
+    fake = FakeOSRM(recordings, router, args.latency_ms, args.jitter_ms, args.error_rate,
+                    args.timeout_rate, args.timeout_s, seed=args.seed,
+                    record_upstream=args.record_upstream, record_to=args.record_to)
+    web.run_app(fake.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Générateur de charge en boucle ouverte sur POST /api/routes, résultats en JSON.
+
+    python -m bench.load --serve asgi --rps 50 --duration 30 --output bench/results/load.json
+    python -m bench.load --url http://127.0.0.1:8000 --rps 20 --duration 60
+
+Les requêtes partent à cadence fixe (--rps), qu'il y ait ou non des réponses
+en attente: la latence est mesurée depuis l'heure d'envoi prévue, donc un
+serveur saturé fait monter les percentiles au lieu de ralentir le générateur.
+--serve lance le faux OSRM (bench.fake_osrm) et l'application pointée dessus,
+sans pré-calcul, pour que chaque itinéraire passe par le client OSRM.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+from bench import git_commit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Emprise des points aléatoires (centre de Kinshasa, couvert par le graphe de test)
+RANDOM_BBOX = (-4.42, 15.24, -4.30, 15.36)
+
+
+def landmark_names(base_url):
+    """Noms des landmarks servis par l'application (GET /api/landmarks)"""
+    with urllib.request.urlopen(f"{base_url}/api/landmarks", timeout=10) as r:
+        return sorted(place["name"] for place in json.load(r)["landmarks"])
+
+
+def make_payloads(count, names, landmark_ratio, alternatives, seed):
+    """Suite reproductible de corps de requête: paires de landmarks ou points aléatoires"""
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(count):
+        if names and rng.random() < landmark_ratio:
+            start, end = rng.sample(names, 2)
+            payload = {"start_name": start, "end_name": end}
+        else:
+            south, west, north, east = RANDOM_BBOX
+            payload = {key: {"lat": round(rng.uniform(south, north), 6), "lon": round(rng.uniform(west, east), 6)}
+                       for key in ("start", "end")}
+        payload["alternatives"] = alternatives
+        payloads.append(payload)
+    return payloads
+
+
+async def run_load(url, payloads, rps, timeout, max_inflight):
+    """Envoie payloads[i] à t0 + i/rps; retourne [(latence s, statut ou nom d'exception)]"""
+    results = []
+    limit = asyncio.Semaphore(max_inflight)
+    connector = TCPConnector(limit=max_inflight)
+    async with ClientSession(connector=connector, timeout=ClientTimeout(total=timeout)) as session:
+
+        async def one(payload, scheduled):
+            async with limit:
+                try:
+                    async with session.post(url, json=payload) as r:
+                        await r.read()
+                        outcome = r.status
+                except Exception as e:
+                    outcome = type(e).__name__
+            results.append((time.perf_counter() - scheduled, outcome))
+
+        loop_start = time.perf_counter()
+        tasks = []
+        for i, payload in enumerate(payloads):
+            scheduled = loop_start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(one(payload, scheduled)))
+        send_elapsed = time.perf_counter() - loop_start
+        await asyncio.gather(*tasks)
+        total_elapsed = time.perf_counter() - loop_start
+    return results, send_elapsed, total_elapsed
+
+
+def summarize(results, send_elapsed, total_elapsed, target_rps):
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    ok = np.array([latency * 1000 for latency, outcome in results if outcome == 200])
+    outcomes = {}
+    for _, outcome in results:
+        outcomes[str(outcome)] = outcomes.get(str(outcome), 0) + 1
+
+    def percentiles(values):
+        if not len(values):
+            return None
+        return {
+            "p50": round(float(np.percentile(values, 50)), 1),
+            "p95": round(float(np.percentile(values, 95)), 1),
+            "p99": round(float(np.percentile(values, 99)), 1),
+            "max": round(float(values.max()), 1),
+            "mean": round(float(values.mean()), 1),
+        }
+
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else 0.0,
+        "outcomes": outcomes,
+        "target_rps": target_rps,
+        "offered_rps": round(len(results) / send_elapsed, 2) if send_elapsed else None,
+        "throughput_rps": round(len(ok) / total_elapsed, 2) if total_elapsed else None,
+        "elapsed_s": round(total_elapsed, 2),
+        "latency_ms": percentiles(latencies),
+        "latency_ok_ms": percentiles(ok),
+    }
+
+
+def wait_for(url, process, timeout=60.0):
+    """Attend qu'un serveur local (lancé par process) réponde (HTTP) sur url"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} arrêté (code {process.returncode})")
+        try:
+            urllib.request.urlopen(url, timeout=2).read()
+            return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} ne répond pas après {timeout}s")
+
+
+def serve(args, processes):
+    """Lance le faux OSRM et l'application (asgi ou wsgi), ajoutés à processes; retourne l'url de base"""
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    fake_cmd = [sys.executable, "-m", "bench.fake_osrm", "--port", str(args.fake_port),
+                "--latency-ms", str(args.fake_latency_ms), "--jitter-ms", str(args.fake_jitter_ms),
+                "--error-rate", str(args.fake_error_rate), "--seed", str(args.seed)]
+    for path in args.fake_replay:
+        fake_cmd += ["--replay", path]
+    processes.append(subprocess.Popen(fake_cmd, cwd=ROOT))
+    wait_for(f"{fake_url}/_stats", processes[-1])
+
+    env = dict(os.environ, OSRM_BASE=fake_url, ROUTING_BACKEND="osrm", PRECOMPUTED_ROUTES_PATH="")
+    bind = f"127.0.0.1:{args.port}"
+    if args.serve == "asgi":
+        app_cmd = [sys.executable, "-m", "uvicorn", "asgi:application", "--host", "127.0.0.1",
+                   "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"]
+    else:
+        app_cmd = [sys.executable, "-m", "gunicorn", "app:app", "--bind", bind,
+                   "--workers", str(args.workers), "--threads", "8"]
+    processes.append(subprocess.Popen(app_cmd, cwd=ROOT, env=env))
+    wait_for(f"http://{bind}/api/health", processes[-1])
+    return f"http://{bind}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base de l'application (ignorée avec --serve)")
+    parser.add_argument("--rps", type=float, default=20.0, help="Cadence cible (requêtes/s)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Durée d'envoi (s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Délai maximum par requête (s)")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="Requêtes simultanées côté générateur")
+    parser.add_argument("--landmark-ratio", type=float, default=0.8, help="Part des paires de landmarks")
+    parser.add_argument("--alternatives", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Fichier JSON des résultats (sinon sortie standard)")
+    parser.add_argument("--serve", choices=["none", "asgi", "wsgi"], default="none",
+                        help="Lancer faux OSRM + application avant la charge")
+    parser.add_argument("--port", type=int, default=8055, help="Port de l'application lancée par --serve")
+    parser.add_argument("--workers", type=int, default=1, help="Processus de l'application lancée par --serve")
+    parser.add_argument("--fake-port", type=int, default=5055)
+    parser.add_argument("--fake-latency-ms", type=float, default=50.0)
+    parser.add_argument("--fake-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--fake-error-rate", type=float, default=0.0)
+    parser.add_argument("--fake-replay", action="append", default=[])
+    args = parser.parse_args(argv)
+
+    processes = []
+    base_url = args.url.rstrip("/")
+    try:
+        if args.serve != "none":
+            base_url = serve(args, processes)
+        names = landmark_names(base_url) if args.landmark_ratio > 0 else []
+        payloads = make_payloads(max(1, int(args.rps * args.duration)), names,
+                                 args.landmark_ratio, args.alternatives, args.seed)
+        results, send_elapsed, total_elapsed = asyncio.run(
+            run_load(f"{base_url}/api/routes", payloads, args.rps, args.timeout, args.max_inflight))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    summary = summarize(results, send_elapsed, total_elapsed, args.rps)
+    print(f"{summary['ok']}/{summary['requests']} OK, {summary['throughput_rps']} req/s, "
+          f"latence {summary['latency_ms']}", file=sys.stderr)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "url": base_url,
+            "serve": args.serve,
+            "workers": args.workers if args.serve != "none" else None,
+            "seed": args.seed,
+            "landmark_ratio": args.landmark_ratio,
+            "alternatives": args.alternatives,
+            "fake_osrm": {"latency_ms": args.fake_latency_ms, "jitter_ms": args.fake_jitter_ms,
+                          "error_rate": args.fake_error_rate} if args.serve != "none" else None,
+        },
+        "results": summary,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
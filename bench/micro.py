@@ -0,0 +1,180 @@
+"""Micro-benchmarks des chemins chauds de /api/routes, résultats en JSON.
+
+    python -m bench.micro --output bench/results/micro-$(git rev-parse --short HEAD).json
+    python -m bench.micro --compare bench/results/micro-abc123.json
+
+Les entrées (tracés, réponses) sont produites par le moteur local sur le
+graphe de test: aucun réseau, mêmes données d'un commit à l'autre.
+Les tracés sont redécoupés tous les ~25 m, la densité des tracés OSRM réels.
+--compare affiche l'écart avec un résultat précédent et sort en erreur
+au-delà de --threshold (régression relative du meilleur temps, moins
+sensible au bruit que la médiane).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+os.environ.setdefault("ROUTING_BACKEND", "local")
+os.environ.setdefault("PRECOMPUTED_ROUTES_PATH", "")
+
+import app  # noqa: E402  (la configuration ci-dessus doit précéder le chargement de l'application)
+from alternatives import is_diverse  # noqa: E402
+from bench import git_commit  # noqa: E402
+from geo import calculate_distance, haversine_km  # noqa: E402
+from geo_encoding import format_geometry  # noqa: E402
+from geometry import RouteGeometry  # noqa: E402
+from traffic import TrafficModel, parse_depart_at  # noqa: E402
+
+
+def measure(fn, min_time=0.2, repeat=7):
+    """Temps par appel (s) sur `repeat` séries, chaque série durant au moins min_time"""
+    # Calibrage: nombre d'appels par série pour qu'elle dure environ min_time
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / 10:
+            break
+        number *= 10
+    number = max(1, int(number * min_time / elapsed))
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - started) / number)
+    timings.sort()
+    return {
+        "median_us": round(timings[len(timings) // 2] * 1e6, 3),
+        "min_us": round(timings[0] * 1e6, 3),
+        "max_us": round(timings[-1] * 1e6, 3),
+        "ops_per_s": round(1 / timings[len(timings) // 2], 1),
+        "loops": number,
+        "repeat": repeat,
+    }
+
+
+def densify(coordinates, step_m=25.0):
+    """Ajoute des points intermédiaires sur chaque segment [lon, lat] (un point tous les step_m)"""
+    dense = [coordinates[0]]
+    for (lon1, lat1), (lon2, lat2) in zip(coordinates, coordinates[1:]):
+        steps = max(1, int(calculate_distance(lat1, lon1, lat2, lon2) * 1000 / step_m))
+        for k in range(1, steps + 1):
+            t = k / steps
+            dense.append([round(lon1 + (lon2 - lon1) * t, 6), round(lat1 + (lat2 - lat1) * t, 6)])
+    return dense
+
+
+def sample_inputs():
+    """Réponses du moteur local pour une paire de landmarks, comme les verrait /api/routes"""
+    start = app.places().landmarks["Rond-point Victoire"].to_dict()
+    end = app.places().landmarks["Lemba"].to_dict()
+    direct = app.fetch_osrm_route([start, end], app.OSRM_DIRECT_PARAMS)
+    routes = [dict(route, geometry=dict(route["geometry"], coordinates=densify(route["geometry"]["coordinates"])))
+              for route in direct["routes"]]
+    options, _ = app.parse_route_options({"alternatives": 5})
+    entries = [app.make_route_entry(route, "direct", start, end, i) for i, route in enumerate(routes)]
+    payload = app.finalize_routes(start, end, entries, options)
+    return start, end, routes, payload
+
+
+def benchmarks():
+    start, end, routes, payload = sample_inputs()
+    route = routes[0]
+    geometry = route["geometry"]
+    shape = RouteGeometry.from_geometry(geometry)
+    others = [RouteGeometry.from_geometry(r["geometry"]) for r in routes[1:]] or [shape]
+    coordinates = geometry["coordinates"]
+    lats = [c[1] for c in coordinates]
+    lons = [c[0] for c in coordinates]
+    lat_array, lon_array = np.array(lats), np.array(lons)
+    traffic_model = app.traffic_model or TrafficModel.default()
+    depart_at, _ = parse_depart_at("2024-05-13T08:00")
+
+    return {
+        "calculate_distance": lambda: calculate_distance(start["lat"], start["lon"], end["lat"], end["lon"]),
+        "calculate_distance_polyline": lambda: sum(
+            calculate_distance(lats[i], lons[i], lats[i + 1], lons[i + 1]) for i in range(len(lats) - 1)),
+        "haversine_km_polyline": lambda: haversine_km(lat_array[:-1], lon_array[:-1],
+                                                      lat_array[1:], lon_array[1:]).sum(),
+        "route_geometry": lambda: RouteGeometry.from_geometry(geometry).segments(),
+        "generate_stops_for_route": lambda: app.generate_stops_for_route("direct", start, end, 0, shape),
+        "is_diverse": lambda: is_diverse(shape, others),
+        "traffic_predict_duration": lambda: traffic_model.predict_duration(shape, route["duration"], depart_at),
+        "format_geometry_polyline6": lambda: format_geometry(geometry, "polyline6", None),
+        "format_geometry_zoom14": lambda: format_geometry(geometry, "polyline6", 14),
+        "serialize_json": lambda: json.dumps(payload, separators=(",", ":")),
+        "serialize_jsonify": lambda: app.app.json.dumps(payload),
+    }, {"route_points": len(coordinates), "routes": len(routes),
+        "payload_bytes": len(json.dumps(payload, separators=(",", ":")))}
+
+
+def compare(results, previous, threshold):
+    """Affiche l'écart par benchmark; retourne les noms en régression"""
+    regressions = []
+    for name, result in results.items():
+        before = previous.get("results", {}).get(name)
+        if before is None:
+            print(f"{name:32s} {result['min_us']:>12.3f} us   (nouveau)")
+            continue
+        change = result["min_us"] / before["min_us"] - 1 if before["min_us"] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  <-- régression"
+            regressions.append(name)
+        print(f"{name:32s} {before['min_us']:>12.3f} -> {result['min_us']:>12.3f} us  {change:+.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="Fichier JSON des résultats (sinon sortie standard)")
+    parser.add_argument("--compare", help="Résultat JSON précédent à comparer")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Régression tolérée (0.25 = +25%%)")
+    parser.add_argument("--filter", default="", help="Ne lancer que les benchmarks contenant ce texte")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Durée minimum d'une série (s)")
+    args = parser.parse_args(argv)
+
+    cases, inputs = benchmarks()
+    results = {}
+    with app.app.app_context():
+        for name, fn in cases.items():
+            if args.filter in name:
+                results[name] = measure(fn, args.min_time)
+                print(f"{name:32s} {results[name]['median_us']:>12.3f} us", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "inputs": inputs,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        if compare(results, previous, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
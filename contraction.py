@@ -0,0 +1,340 @@
+"""Hiérarchies de contraction (CH) pour le moteur de routage local.
+
+Le pré-calcul (hors-ligne) ordonne les nœuds, les contracte en ajoutant
+des raccourcis, puis écrit un index binaire mappable en mémoire:
+
+    b"KCH1" | longueur de l'en-tête (uint32) | en-tête JSON | tableaux alignés
+
+Tous les workers mappent le même fichier (mmap): les pages sont
+partagées par le cache du système et chargées une seule fois.
+"""
+import heapq
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"KCH1"
+ALIGN = 64
+
+
+def _witness_exists(out_edges, contracted, source, target, skip, max_weight, settle_limit):
+    """Cherche un chemin source -> target <= max_weight qui évite `skip`"""
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    settled = 0
+    while heap and settled < settle_limit:
+        d, u = heapq.heappop(heap)
+        if d > dist.get(u, float("inf")):
+            continue
+        if u == target:
+            return True
+        if d > max_weight:
+            return False
+        settled += 1
+        for v, (w, _, _) in out_edges[u].items():
+            if v == skip or contracted[v]:
+                continue
+            dv = d + w
+            if dv <= max_weight and dv < dist.get(v, float("inf")):
+                dist[v] = dv
+                heapq.heappush(heap, (dv, v))
+    return dist.get(target, float("inf")) <= max_weight
+
+
+def _shortcuts_for(v, out_edges, in_edges, contracted, settle_limit):
+    """Raccourcis nécessaires si on contracte v: [(u, x, poids, longueur)]"""
+    shortcuts = []
+    incoming = [(u, e) for u, e in in_edges[v].items() if not contracted[u]]
+    outgoing = [(x, e) for x, e in out_edges[v].items() if not contracted[x]]
+    for u, (w_in, len_in, _) in incoming:
+        for x, (w_out, len_out, _) in outgoing:
+            if u == x:
+                continue
+            weight = w_in + w_out
+            existing = out_edges[u].get(x)
+            if existing is not None and existing[0] <= weight:
+                continue
+            if not _witness_exists(out_edges, contracted, u, x, v, weight, settle_limit):
+                shortcuts.append((u, x, weight, len_in + len_out))
+    return shortcuts
+
+
+def build_contraction_hierarchy(graph, settle_limit=200):
+    """Contracte le graphe (RoadGraph) et retourne les tableaux de l'index CH"""
+    n = graph.num_nodes
+    out_edges = [dict() for _ in range(n)]
+    in_edges = [dict() for _ in range(n)]
+    names = {}
+    for u in range(n):
+        for i in range(graph.fwd_offsets[u], graph.fwd_offsets[u + 1]):
+            v = int(graph.fwd_targets[i])
+            w = float(graph.fwd_durations[i])
+            if u == v:
+                continue
+            if v not in out_edges[u] or w < out_edges[u][v][0]:
+                edge = (w, float(graph.fwd_lengths[i]), -1)
+                out_edges[u][v] = edge
+                in_edges[v][u] = edge
+                names[(u, v)] = int(graph.fwd_names[i])
+
+    contracted = [False] * n
+    contracted_neighbors = [0] * n
+    rank = np.zeros(n, dtype=np.int32)
+
+    def priority(v):
+        shortcuts = _shortcuts_for(v, out_edges, in_edges, contracted, settle_limit // 4)
+        removed = sum(1 for u in in_edges[v] if not contracted[u]) + \
+            sum(1 for x in out_edges[v] if not contracted[x])
+        return len(shortcuts) - removed + contracted_neighbors[v]
+
+    heap = [(priority(v), v) for v in range(n)]
+    heapq.heapify(heap)
+    order = 0
+    while heap:
+        _, v = heapq.heappop(heap)
+        if contracted[v]:
+            continue
+        # Mise à jour paresseuse: on recalcule la priorité avant de contracter
+        p = priority(v)
+        if heap and p > heap[0][0]:
+            heapq.heappush(heap, (p, v))
+            continue
+
+        for u, x, weight, length in _shortcuts_for(v, out_edges, in_edges, contracted, settle_limit):
+            edge = (weight, length, v)
+            out_edges[u][x] = edge
+            in_edges[x][u] = edge
+        contracted[v] = True
+        rank[v] = order
+        order += 1
+        for u in list(in_edges[v]) + list(out_edges[v]):
+            contracted_neighbors[u] += 1
+
+    # Graphe montant: avant = arcs u -> v vers un rang supérieur (stockés en u),
+    # arrière = arcs u -> v depuis un rang supérieur (stockés en v, parcourus à l'envers)
+    fwd, bwd = [], []
+    for u in range(n):
+        for v, (w, length, mid) in out_edges[u].items():
+            name = names.get((u, v), -1) if mid < 0 else -1
+            if rank[u] < rank[v]:
+                fwd.append((u, v, w, length, mid, name))
+            else:
+                bwd.append((v, u, w, length, mid, name))
+
+    arrays = {"rank": rank, "lat": graph.lat.astype(np.float64), "lon": graph.lon.astype(np.float64)}
+    for prefix, edges in (("fwd", fwd), ("bwd", bwd)):
+        edges.sort(key=lambda e: e[0])
+        counts = np.bincount(np.array([e[0] for e in edges], dtype=np.int64), minlength=n)
+        offsets = np.zeros(n + 1, dtype=np.int32)
+        np.cumsum(counts, out=offsets[1:])
+        arrays[f"{prefix}_offsets"] = offsets
+        arrays[f"{prefix}_targets"] = np.array([e[1] for e in edges], dtype=np.int32)
+        arrays[f"{prefix}_weights"] = np.array([e[2] for e in edges], dtype=np.float32)
+        arrays[f"{prefix}_lengths"] = np.array([e[3] for e in edges], dtype=np.float32)
+        arrays[f"{prefix}_mids"] = np.array([e[4] for e in edges], dtype=np.int32)
+        arrays[f"{prefix}_names"] = np.array([e[5] for e in edges], dtype=np.int32)
+    return arrays
+
+
+def save_index(arrays, path, names=()):
+    """Écrit l'index CH (écriture atomique)"""
+    specs = []
+    offset = 0
+    for key, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[key] = array
+        specs.append({"name": key, "dtype": array.dtype.str, "shape": list(array.shape), "offset": offset})
+        offset += array.nbytes
+        offset += (-offset) % ALIGN
+    header = json.dumps({"arrays": specs, "names": list(names)}, ensure_ascii=False).encode("utf-8")
+    data_start = len(MAGIC) + 4 + len(header)
+    data_start += (-data_start) % ALIGN
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(b"\0" * (data_start - f.tell()))
+        for spec in specs:
+            f.seek(data_start + spec["offset"])
+            f.write(arrays[spec["name"]].tobytes())
+    os.replace(tmp_path, path)
+
+
+class ContractionHierarchy:
+    """Index CH mappable en mémoire: requêtes point à point et matrices many-to-many"""
+
+    def __init__(self, arrays, names=(), path=None):
+        self.path = path
+        self.names = list(names)
+        for key, array in arrays.items():
+            setattr(self, key, array)
+        self.num_nodes = len(self.rank)
+        self.queries = 0
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Index CH invalide: {path}")
+            (header_len,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+            # Vues ndarray simples sur un seul mmap (np.memmap est lent en indexation)
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data_start = len(MAGIC) + 4 + header_len
+        data_start += (-data_start) % ALIGN
+        arrays = {}
+        for spec in header["arrays"]:
+            dtype = np.dtype(spec["dtype"])
+            shape = tuple(spec["shape"])
+            count = int(np.prod(shape))
+            arrays[spec["name"]] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                                 offset=data_start + spec["offset"]).reshape(shape)
+        return cls(arrays, header.get("names", ()), path=path)
+
+    def _upward_search(self, source, offsets, targets, weights, lengths, best=None):
+        """Dijkstra sur le graphe montant: {nœud: (poids, longueur, parent)}"""
+        dist = {source: (0.0, 0.0, -1)}
+        settled = {}
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            if best is not None and d >= best:
+                break
+            settled[u] = dist[u]
+            length_u = dist[u][1]
+            a, b = int(offsets[u]), int(offsets[u + 1])
+            for v, w, length in zip(targets[a:b].tolist(), weights[a:b].tolist(), lengths[a:b].tolist()):
+                dv = d + w
+                if v not in dist or dv < dist[v][0]:
+                    dist[v] = (dv, length_u + length, u)
+                    heapq.heappush(heap, (dv, v))
+        return settled
+
+    def query(self, source, target):
+        """Plus court chemin source -> target: (nœuds, durée, longueur) ou (None, inf, inf)"""
+        self.queries += 1
+        if source == target:
+            return [source], 0.0, 0.0
+
+        fwd = {source: (0.0, 0.0, -1)}
+        bwd = {target: (0.0, 0.0, -1)}
+        heaps = ([(0.0, source)], [(0.0, target)])
+        dists = (fwd, bwd)
+        settled = (set(), set())
+        graphs = (
+            (self.fwd_offsets, self.fwd_targets, self.fwd_weights, self.fwd_lengths),
+            (self.bwd_offsets, self.bwd_targets, self.bwd_weights, self.bwd_lengths),
+        )
+        best = float("inf")
+        meeting = -1
+        side = 0
+        while heaps[0] or heaps[1]:
+            # Chaque côté s'arrête quand sa clé minimale dépasse le meilleur chemin
+            if not heaps[side] or heaps[side][0][0] >= best:
+                if not heaps[1 - side] or heaps[1 - side][0][0] >= best:
+                    break
+                side = 1 - side
+                continue
+            d, u = heapq.heappop(heaps[side])
+            if u in settled[side]:
+                side = 1 - side
+                continue
+            settled[side].add(u)
+            dist = dists[side]
+            other = dists[1 - side]
+            if u in other and d + other[u][0] < best:
+                best = d + other[u][0]
+                meeting = u
+            offsets, targets, weights, lengths = graphs[side]
+            length_u = dist[u][1]
+            a, b = int(offsets[u]), int(offsets[u + 1])
+            for v, w, length in zip(targets[a:b].tolist(), weights[a:b].tolist(), lengths[a:b].tolist()):
+                dv = d + w
+                if v not in dist or dv < dist[v][0]:
+                    dist[v] = (dv, length_u + length, u)
+                    heapq.heappush(heaps[side], (dv, v))
+            side = 1 - side
+
+        if meeting < 0:
+            return None, float("inf"), float("inf")
+
+        up = []
+        v = meeting
+        while v != -1:
+            up.append(v)
+            v = fwd[v][2]
+        up.reverse()
+        down = []
+        v = bwd[meeting][2]
+        while v != -1:
+            down.append(v)
+            v = bwd[v][2]
+        ch_path = up + down
+        path = [ch_path[0]]
+        for u, v in zip(ch_path, ch_path[1:]):
+            path.extend(self.unpack_edge(u, v)[1:])
+        return path, best, fwd[meeting][1] + bwd[meeting][1]
+
+    def _find_edge(self, u, v):
+        """Index et côté ("fwd"/"bwd") de l'arc u -> v dans l'index CH"""
+        if self.rank[u] < self.rank[v]:
+            a, b = int(self.fwd_offsets[u]), int(self.fwd_offsets[u + 1])
+            targets = self.fwd_targets[a:b].tolist()
+            return "fwd", a + targets.index(v)
+        a, b = int(self.bwd_offsets[v]), int(self.bwd_offsets[v + 1])
+        targets = self.bwd_targets[a:b].tolist()
+        return "bwd", a + targets.index(u)
+
+    def unpack_edge(self, u, v):
+        """Déroule un raccourci u -> v en nœuds du graphe d'origine"""
+        path = [u]
+        stack = [(u, v)]
+        while stack:
+            a, b = stack.pop()
+            side, i = self._find_edge(a, b)
+            mid = int(getattr(self, f"{side}_mids")[i])
+            if mid < 0:
+                path.append(b)
+            else:
+                stack.append((mid, b))
+                stack.append((a, mid))
+        return path
+
+    def many_to_many(self, sources, targets):
+        """Matrices (durées, longueurs) sources x targets, algorithme à buckets"""
+        buckets = {}
+        for j, target in enumerate(targets):
+            settled = self._upward_search(target, self.bwd_offsets, self.bwd_targets,
+                                          self.bwd_weights, self.bwd_lengths)
+            for v, (d, length, _) in settled.items():
+                buckets.setdefault(v, []).append((j, d, length))
+
+        durations = [[None] * len(targets) for _ in sources]
+        lengths = [[None] * len(targets) for _ in sources]
+        for i, source in enumerate(sources):
+            settled = self._upward_search(source, self.fwd_offsets, self.fwd_targets,
+                                          self.fwd_weights, self.fwd_lengths)
+            row_d, row_l = durations[i], lengths[i]
+            for v, (d, length, _) in settled.items():
+                for j, d2, length2 in buckets.get(v, ()):
+                    total = d + d2
+                    if row_d[j] is None or total < row_d[j]:
+                        row_d[j] = total
+                        row_l[j] = length + length2
+        self.queries += len(sources)
+        return durations, lengths
+
+    def stats(self):
+        return {
+            "index": self.path,
+            "nodes": self.num_nodes,
+            "upward_edges": int(len(self.fwd_targets) + len(self.bwd_targets)),
+            "queries": self.queries,
+        }
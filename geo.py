@@ -0,0 +1,33 @@
+"""Fonctions géographiques communes (distances haversine)"""
+from math import radians, sin, cos, sqrt, atan2
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """Calcule la distance en km entre deux points géographiques"""
+    R = EARTH_RADIUS_KM
+    lat1_rad = radians(lat1)
+    lon1_rad = radians(lon1)
+    lat2_rad = radians(lat2)
+    lon2_rad = radians(lon2)
+
+    dlon = lon2_rad - lon1_rad
+    dlat = lat2_rad - lat1_rad
+
+    a = sin(dlat/2)**2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlon/2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1-a))
+
+    return R * c
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Version vectorisée de calculate_distance (scalaires ou tableaux NumPy, en km)"""
+    lat1 = np.radians(lat1)
+    lon1 = np.radians(lon1)
+    lat2 = np.radians(lat2)
+    lon2 = np.radians(lon2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
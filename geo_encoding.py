@@ -0,0 +1,131 @@
+"""Encodages compacts des géométries d'itinéraires (polyline, polyline6, delta) et simplification"""
+from math import cos, radians
+
+GEOMETRY_FORMATS = ("geojson", "polyline", "polyline6", "delta")
+
+# Mètres par pixel à l'équateur au zoom 0 (tuiles 256 px)
+METERS_PER_PIXEL_Z0 = 156543.03392
+METERS_PER_DEGREE = 111320.0
+
+
+def _encode_value(value, out):
+    value = ~(value << 1) if value < 0 else (value << 1)
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def encode_polyline(coordinates, precision=5):
+    """Encode une liste [lon, lat] au format Google polyline (ordre lat, lon)"""
+    factor = 10 ** precision
+    out = []
+    prev_lat = prev_lon = 0
+    for lon, lat in coordinates:
+        ilat = int(round(lat * factor))
+        ilon = int(round(lon * factor))
+        _encode_value(ilat - prev_lat, out)
+        _encode_value(ilon - prev_lon, out)
+        prev_lat, prev_lon = ilat, ilon
+    return "".join(out)
+
+
+def decode_polyline(encoded, precision=5):
+    """Inverse de encode_polyline: retourne une liste [lon, lat]"""
+    factor = 10 ** precision
+    coordinates = []
+    index = lat = lon = 0
+    length = len(encoded)
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                b = ord(encoded[index]) - 63
+                index += 1
+                result |= (b & 0x1f) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        coordinates.append([lon / factor, lat / factor])
+    return coordinates
+
+
+def encode_delta(coordinates, precision=6):
+    """Tableau d'entiers [lon0, lat0, dlon1, dlat1, ...] à 10^-precision degré"""
+    factor = 10 ** precision
+    values = []
+    prev_lon = prev_lat = 0
+    for lon, lat in coordinates:
+        ilon = int(round(lon * factor))
+        ilat = int(round(lat * factor))
+        values.append(ilon - prev_lon)
+        values.append(ilat - prev_lat)
+        prev_lon, prev_lat = ilon, ilat
+    return values
+
+
+def zoom_tolerance(zoom, lat=-4.32):
+    """Tolérance de simplification (degrés) équivalente à un pixel au zoom donné"""
+    meters_per_pixel = METERS_PER_PIXEL_Z0 * cos(radians(lat)) / (2 ** zoom)
+    return meters_per_pixel / METERS_PER_DEGREE
+
+
+def simplify(coordinates, tolerance):
+    """Douglas-Peucker itératif sur des coordonnées [lon, lat] (tolérance en degrés)"""
+    n = len(coordinates)
+    if n < 3 or tolerance <= 0:
+        return list(coordinates)
+
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    tolerance_sq = tolerance * tolerance
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = coordinates[first]
+        x2, y2 = coordinates[last]
+        dx, dy = x2 - x1, y2 - y1
+        seg_len_sq = dx * dx + dy * dy
+        max_dist_sq = 0.0
+        index = first
+        for i in range(first + 1, last):
+            px, py = coordinates[i]
+            if seg_len_sq == 0:
+                ex, ey = px - x1, py - y1
+            else:
+                t = ((px - x1) * dx + (py - y1) * dy) / seg_len_sq
+                t = 0.0 if t < 0 else (1.0 if t > 1 else t)
+                ex, ey = px - (x1 + t * dx), py - (y1 + t * dy)
+            dist_sq = ex * ex + ey * ey
+            if dist_sq > max_dist_sq:
+                max_dist_sq = dist_sq
+                index = i
+        if max_dist_sq > tolerance_sq:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [coord for coord, kept in zip(coordinates, keep) if kept]
+
+
+def format_geometry(geometry, fmt="geojson", zoom=None):
+    """Retourne la géométrie GeoJSON d'OSRM dans le format demandé (simplifiée si zoom)"""
+    if not geometry:
+        return geometry
+    coordinates = geometry.get("coordinates", [])
+    if zoom is not None:
+        coordinates = simplify(coordinates, zoom_tolerance(zoom))
+
+    if fmt == "polyline":
+        return {"type": "polyline", "value": encode_polyline(coordinates, 5)}
+    if fmt == "polyline6":
+        return {"type": "polyline6", "value": encode_polyline(coordinates, 6)}
+    if fmt == "delta":
+        return {"type": "delta6", "value": encode_delta(coordinates, 6)}
+    if zoom is None:
+        return geometry
+    return {"type": "LineString", "coordinates": coordinates}
@@ -0,0 +1,111 @@
+"""Géométrie vectorisée des tracés: distances cumulées, recouvrement entre itinéraires, position des arrêts"""
+import numpy as np
+
+from geo import haversine_km
+
+METERS_PER_DEGREE_LAT = 110540.0
+METERS_PER_DEGREE_LON = 111320.0
+
+
+class RouteGeometry:
+    """Tracé [lon, lat] converti une seule fois en tableaux NumPy.
+
+    Les mesures (longueur des segments, distance cumulée, recouvrement,
+    projection de points) sont calculées sur ces tableaux, sans boucle
+    Python par sommet: le coût reste quasi constant quand le tracé s'allonge.
+    """
+
+    def __init__(self, coordinates, precision=5):
+        line = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        self.lon = line[:, 0]
+        self.lat = line[:, 1]
+        self.precision = precision
+        if len(line) > 1:
+            self.segment_km = haversine_km(self.lat[:-1], self.lon[:-1], self.lat[1:], self.lon[1:])
+        else:
+            self.segment_km = np.zeros(0)
+        self.cumulative_m = np.concatenate(([0.0], np.cumsum(self.segment_km) * 1000.0))
+        self._segments = None
+
+    @classmethod
+    def from_geometry(cls, geometry, precision=5):
+        """Depuis une géométrie GeoJSON LineString (dict), éventuellement absente"""
+        return cls((geometry or {}).get("coordinates") or [], precision)
+
+    def __len__(self):
+        return len(self.lon)
+
+    @property
+    def length_m(self):
+        return float(self.cumulative_m[-1])
+
+    def segments(self):
+        """(clés des segments non orientés, longueur en km), sans doublons ni segments nuls.
+
+        Les sommets sont arrondis à `precision` décimales: deux tracés qui
+        empruntent la même rue partagent alors les mêmes clés.
+        """
+        if self._segments is None:
+            scale = 10 ** self.precision
+            points = np.stack((np.round(self.lon * scale), np.round(self.lat * scale)), axis=1).astype(np.int64)
+            a, b = points[:-1], points[1:]
+            # Orientation canonique: le plus petit sommet (lon, puis lat) en premier
+            swap = (a[:, 0] > b[:, 0]) | ((a[:, 0] == b[:, 0]) & (a[:, 1] > b[:, 1]))
+            first = np.where(swap[:, None], b, a)
+            second = np.where(swap[:, None], a, b)
+            nonzero = (first != second).any(axis=1)
+            pairs = np.ascontiguousarray(np.concatenate((first, second), axis=1)[nonzero])
+            keys = pairs.view(np.dtype((np.void, pairs.dtype.itemsize * 4))).ravel()
+            keys, index = np.unique(keys, return_index=True)
+            self._segments = (keys, self.segment_km[nonzero][index])
+        return self._segments
+
+    def overlap(self, other):
+        """Part de la longueur de ce tracé partagée avec `other` (0 à 1)"""
+        keys, lengths = self.segments()
+        total = lengths.sum()
+        if total == 0:
+            return 1.0
+        other_keys, _ = other.segments()
+        shared = lengths[np.isin(keys, other_keys, assume_unique=True)].sum()
+        return float(shared / total)
+
+    def project(self, lats, lons):
+        """Point du tracé le plus proche de chaque point (lats, lons).
+
+        Retourne (distance au tracé en m, position le long du tracé en m
+        depuis le départ), deux tableaux. Projection locale plane (équirectangulaire),
+        précise à l'échelle d'une ville.
+        """
+        lats = np.asarray(lats, dtype=np.float64).reshape(-1)
+        lons = np.asarray(lons, dtype=np.float64).reshape(-1)
+        if len(self) == 0 or len(lats) == 0:
+            return np.full(len(lats), np.inf), np.zeros(len(lats))
+        if len(self) == 1:
+            return haversine_km(lats, lons, self.lat[0], self.lon[0]) * 1000.0, np.zeros(len(lats))
+
+        sx = METERS_PER_DEGREE_LON * np.cos(np.radians(self.lat.mean()))
+        ax, ay = self.lon[:-1] * sx, self.lat[:-1] * METERS_PER_DEGREE_LAT
+        dx = self.lon[1:] * sx - ax
+        dy = self.lat[1:] * METERS_PER_DEGREE_LAT - ay
+        px = (lons * sx)[:, None]
+        py = (lats * METERS_PER_DEGREE_LAT)[:, None]
+        seg_len_sq = dx * dx + dy * dy
+        t = ((px - ax) * dx + (py - ay) * dy) / np.where(seg_len_sq == 0, 1.0, seg_len_sq)
+        t = np.clip(t, 0.0, 1.0)
+        ex = px - (ax + t * dx)
+        ey = py - (ay + t * dy)
+        dist = np.sqrt(ex * ex + ey * ey)
+        best = dist.argmin(axis=1)
+        rows = np.arange(len(lats))
+        positions = self.cumulative_m[best] + t[rows, best] * self.segment_km[best] * 1000.0
+        return dist[rows, best], positions
+
+    def order_along(self, records):
+        """Points {lat, lon} ordonnés le long du tracé: [(record, distance au tracé m, position m)]"""
+        if not records:
+            return []
+        distances, positions = self.project([r["lat"] for r in records], [r["lon"] for r in records])
+        order = np.argsort(positions, kind="stable")
+        return [(records[i], float(distances[i]), float(positions[i])) for i in order]
+
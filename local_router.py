@@ -0,0 +1,388 @@
+"""Moteur de routage local sur un graphe routier (alternative hors-ligne au serveur OSRM).
+
+Format du graphe (JSON):
+    {"nodes": [[lat, lon], ...],
+     "names": ["Boulevard ...", ...],
+     "edges": [[u, v, vitesse_kmh, sens_unique (0/1), index_nom], ...]}
+
+Le graphe est chargé en tableaux CSR (offsets int32, cibles int32, poids
+float32) dans les deux sens pour la recherche bidirectionnelle. Les
+réponses ont la même forme que celles d'OSRM /route et /table.
+"""
+import heapq
+import json
+import os
+from collections import defaultdict
+
+import numpy as np
+
+from alternatives import MAX_OVERLAP
+from contraction import ContractionHierarchy
+from geo import calculate_distance, haversine_km
+
+
+def _csr(num_nodes, sources, targets, *columns):
+    """Trie les arcs par source et retourne (offsets, targets, colonnes...)"""
+    order = np.argsort(sources, kind="stable")
+    counts = np.bincount(sources, minlength=num_nodes)
+    offsets = np.zeros(num_nodes + 1, dtype=np.int32)
+    np.cumsum(counts, out=offsets[1:])
+    return (offsets, targets[order].astype(np.int32)) + tuple(c[order] for c in columns)
+
+
+class RoadGraph:
+    """Graphe routier en tableaux compacts (CSR avant et arrière)"""
+
+    def __init__(self, lat, lon, sources, targets, speeds_kmh, name_ids, names):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.names = list(names)
+        self.num_nodes = len(self.lat)
+
+        sources = np.asarray(sources, dtype=np.int32)
+        targets = np.asarray(targets, dtype=np.int32)
+        lengths = haversine_km(self.lat[sources], self.lon[sources],
+                               self.lat[targets], self.lon[targets]) * 1000.0
+        speeds_ms = np.asarray(speeds_kmh, dtype=np.float64) / 3.6
+        durations = lengths / speeds_ms
+        self.max_speed_ms = float(speeds_ms.max()) if len(speeds_ms) else 1.0
+
+        lengths = lengths.astype(np.float32)
+        durations = durations.astype(np.float32)
+        name_ids = np.asarray(name_ids, dtype=np.int32)
+        self.num_edges = len(sources)
+
+        # CSR avant: arcs sortants; CSR arrière: arcs entrants (pour la recherche inverse)
+        (self.fwd_offsets, self.fwd_targets, self.fwd_durations,
+         self.fwd_lengths, self.fwd_names) = _csr(self.num_nodes, sources, targets,
+                                                  durations, lengths, name_ids)
+        (self.bwd_offsets, self.bwd_targets, self.bwd_durations,
+         self.bwd_lengths, self.bwd_names) = _csr(self.num_nodes, targets, sources,
+                                                  durations, lengths, name_ids)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+        nodes = np.asarray(raw["nodes"], dtype=np.float64)
+        sources, targets, speeds, name_ids = [], [], [], []
+        for u, v, speed, oneway, name_id in raw["edges"]:
+            sources.append(u)
+            targets.append(v)
+            speeds.append(speed)
+            name_ids.append(name_id)
+            if not oneway:
+                sources.append(v)
+                targets.append(u)
+                speeds.append(speed)
+                name_ids.append(name_id)
+        return cls(nodes[:, 0], nodes[:, 1], sources, targets, speeds, name_ids,
+                   raw.get("names", []))
+
+    def nearest_node(self, lat, lon):
+        """Nœud le plus proche (projection équirectangulaire, suffisante à l'échelle d'une ville)"""
+        dx = (self.lon - lon) * np.cos(np.radians(lat))
+        dy = self.lat - lat
+        return int(np.argmin(dx * dx + dy * dy))
+
+    def edge(self, u, v):
+        """(durée, longueur, nom) de l'arc u -> v le plus rapide"""
+        best = None
+        for i in range(self.fwd_offsets[u], self.fwd_offsets[u + 1]):
+            if self.fwd_targets[i] == v and (best is None or self.fwd_durations[i] < self.fwd_durations[best]):
+                best = i
+        if best is None:
+            raise KeyError(f"Pas d'arc {u} -> {v}")
+        return float(self.fwd_durations[best]), float(self.fwd_lengths[best]), int(self.fwd_names[best])
+
+
+class LocalRouter:
+    """Recherche A* bidirectionnelle, heuristique haversine (calculate_distance).
+
+    Si un index de hiérarchies de contraction est fourni (contraction.py),
+    il sert aux requêtes point à point et aux matrices.
+    """
+
+    def __init__(self, graph, path=None, ch=None):
+        self.graph = graph
+        self.path = path
+        self.ch = ch
+        self.base_url = f"local:{path}" if path else "local"
+        self.queries = 0
+
+    @classmethod
+    def load(cls, path, ch_path=None):
+        graph = RoadGraph.load(path)
+        ch = None
+        if ch_path and os.path.exists(ch_path):
+            ch = ContractionHierarchy.load(ch_path)
+            if ch.num_nodes != graph.num_nodes:
+                print(f"Index CH {ch_path} ignoré: construit pour un autre graphe")
+                ch = None
+        return cls(graph, path=path, ch=ch)
+
+    def _potential(self, source, target):
+        """Potentiel moyen p(v) = (h_t(v) - h_s(v)) / 2, cohérent dans les deux sens"""
+        graph = self.graph
+        speed = graph.max_speed_ms
+        slat, slon = graph.lat[source], graph.lon[source]
+        tlat, tlon = graph.lat[target], graph.lon[target]
+        cache = {}
+
+        def potential(v):
+            p = cache.get(v)
+            if p is None:
+                lat, lon = graph.lat[v], graph.lon[v]
+                h_t = calculate_distance(lat, lon, tlat, tlon) * 1000.0 / speed
+                h_s = calculate_distance(slat, slon, lat, lon) * 1000.0 / speed
+                p = cache[v] = (h_t - h_s) / 2.0
+            return p
+
+        return potential
+
+    def shortest_path(self, source, target, weights=None):
+        """Plus court chemin (en durée) source -> target: (liste de nœuds, durée) ou (None, inf).
+
+        `weights` optionnel: (poids_avant, poids_arrière) float32 alignés sur les CSR,
+        pour rechercher avec des durées pénalisées.
+        """
+        self.queries += 1
+        if source == target:
+            return [source], 0.0
+        if self.ch is not None and weights is None:
+            path, duration, _ = self.ch.query(source, target)
+            return path, duration
+
+        graph = self.graph
+        fwd_w, bwd_w = weights if weights is not None else (graph.fwd_durations, graph.bwd_durations)
+        potential = self._potential(source, target)
+        sides = (
+            (graph.fwd_offsets, graph.fwd_targets, fwd_w, 1.0),
+            (graph.bwd_offsets, graph.bwd_targets, bwd_w, -1.0),
+        )
+        dist = ({source: 0.0}, {target: 0.0})
+        parent = ({source: -1}, {target: -1})
+        settled = (set(), set())
+        heaps = ([(potential(source), source)], [(-potential(target), target)])
+        best = float("inf")
+        meeting = -1
+
+        while heaps[0] and heaps[1]:
+            # Arrêt: clé min avant + clé min arrière >= meilleur chemin connu
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+            offsets, targets, w, sign = sides[side]
+            key, u = heapq.heappop(heaps[side])
+            if u in settled[side]:
+                continue
+            settled[side].add(u)
+            du = dist[side][u]
+            other = dist[1 - side]
+            for i in range(offsets[u], offsets[u + 1]):
+                v = int(targets[i])
+                dv = du + float(w[i])
+                if dv < dist[side].get(v, float("inf")):
+                    dist[side][v] = dv
+                    parent[side][v] = u
+                    heapq.heappush(heaps[side], (dv + sign * potential(v), v))
+                    if v in other and dv + other[v] < best:
+                        best = dv + other[v]
+                        meeting = v
+
+        if meeting < 0:
+            return None, float("inf")
+
+        path = []
+        v = meeting
+        while v != -1:
+            path.append(v)
+            v = parent[0][v]
+        path.reverse()
+        v = parent[1][meeting]
+        while v != -1:
+            path.append(v)
+            v = parent[1][v]
+        return path, best
+
+    def _path_edges(self, path):
+        """{arc non orienté: longueur} d'un chemin"""
+        edges = {}
+        for u, v in zip(path, path[1:]):
+            edges[(u, v) if u < v else (v, u)] = self.graph.edge(u, v)[1]
+        return edges
+
+    def _penalize(self, path, fwd_w, bwd_w, penalty):
+        graph = self.graph
+        for u, v in zip(path, path[1:]):
+            for i in range(graph.fwd_offsets[u], graph.fwd_offsets[u + 1]):
+                if graph.fwd_targets[i] == v:
+                    fwd_w[i] *= penalty
+            for i in range(graph.bwd_offsets[v], graph.bwd_offsets[v + 1]):
+                if graph.bwd_targets[i] == u:
+                    bwd_w[i] *= penalty
+
+    def alternative_paths(self, source, target, count, penalty=1.4, max_overlap=MAX_OVERLAP):
+        """Méthode des pénalités: on recherche à nouveau après avoir alourdi les arcs
+        des chemins trouvés; un chemin est retenu si sa longueur partagée avec chaque
+        chemin déjà retenu reste sous max_overlap."""
+        path, _ = self.shortest_path(source, target)
+        if path is None:
+            return []
+        paths = [path]
+        accepted_edges = [self._path_edges(path)]
+        fwd_w = self.graph.fwd_durations.copy()
+        bwd_w = self.graph.bwd_durations.copy()
+        attempts = 0
+        while len(paths) < count and attempts < count * 3:
+            attempts += 1
+            self._penalize(path, fwd_w, bwd_w, penalty)
+            path, _ = self.shortest_path(source, target, (fwd_w, bwd_w))
+            if path is None:
+                break
+            edges = self._path_edges(path)
+            total = sum(edges.values()) or 1.0
+            if all(sum(length for key, length in edges.items() if key in other) / total <= max_overlap
+                   for other in accepted_edges):
+                paths.append(path)
+                accepted_edges.append(edges)
+        return paths
+
+    def _summary(self, name_lengths):
+        top = sorted(name_lengths.items(), key=lambda item: -item[1])[:2]
+        return ", ".join(self.graph.names[name_id] for name_id, _ in top if name_id < len(self.graph.names))
+
+    def path_to_route(self, legs_nodes):
+        """Convertit une liste de chemins (un par tronçon) en route au format OSRM"""
+        graph = self.graph
+        coordinates = []
+        legs = []
+        total_distance = total_duration = 0.0
+        for nodes in legs_nodes:
+            distance = duration = 0.0
+            name_lengths = defaultdict(float)
+            for u, v in zip(nodes, nodes[1:]):
+                d, length, name_id = graph.edge(u, v)
+                duration += d
+                distance += length
+                name_lengths[name_id] += length
+            start = 1 if coordinates else 0
+            coordinates.extend([float(graph.lon[n]), float(graph.lat[n])] for n in nodes[start:])
+            legs.append({
+                "distance": round(distance, 1),
+                "duration": round(duration, 1),
+                "summary": self._summary(name_lengths),
+            })
+            total_distance += distance
+            total_duration += duration
+        return {
+            "distance": round(total_distance, 1),
+            "duration": round(total_duration, 1),
+            "geometry": {"type": "LineString", "coordinates": coordinates},
+            "legs": legs,
+        }
+
+    def _parse_coords(self, coords):
+        points = []
+        for pair in coords.split(";"):
+            lon, lat = pair.split(",")
+            points.append((float(lat), float(lon)))
+        return points
+
+    def _waypoints(self, nodes):
+        return [{"location": [float(self.graph.lon[n]), float(self.graph.lat[n])], "name": ""}
+                for n in nodes]
+
+    def route(self, coords, params=None, timeout=None):
+        """Même contrat que OSRMClient.route: coords "lon,lat;lon,lat;..." -> JSON OSRM"""
+        nodes = [self.graph.nearest_node(lat, lon) for lat, lon in self._parse_coords(coords)]
+        alternatives = str((params or {}).get("alternatives", "false")).lower()
+        count = 3 if alternatives == "true" else (int(alternatives) if alternatives.isdigit() else 1)
+        if len(nodes) == 2 and count > 1:
+            paths = self.alternative_paths(nodes[0], nodes[1], count)
+            if not paths:
+                return {"code": "NoRoute", "message": "Impossible route between points"}
+            return {
+                "code": "Ok",
+                "routes": [self.path_to_route([path]) for path in paths],
+                "waypoints": self._waypoints(nodes),
+            }
+
+        legs_nodes = []
+        for source, target in zip(nodes, nodes[1:]):
+            path, _ = self.shortest_path(source, target)
+            if path is None:
+                return {"code": "NoRoute", "message": "Impossible route between points"}
+            legs_nodes.append(path)
+        return {
+            "code": "Ok",
+            "routes": [self.path_to_route(legs_nodes)],
+            "waypoints": self._waypoints(nodes),
+        }
+
+    def _one_to_all(self, source):
+        """Dijkstra complet depuis source: (durées, distances) par nœud atteint"""
+        graph = self.graph
+        durations = {source: 0.0}
+        distances = {source: 0.0}
+        settled = set()
+        heap = [(0.0, source)]
+        while heap:
+            du, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            for i in range(graph.fwd_offsets[u], graph.fwd_offsets[u + 1]):
+                v = int(graph.fwd_targets[i])
+                dv = du + float(graph.fwd_durations[i])
+                if dv < durations.get(v, float("inf")):
+                    durations[v] = dv
+                    distances[v] = distances[u] + float(graph.fwd_lengths[i])
+                    heapq.heappush(heap, (dv, v))
+        return durations, distances
+
+    def table(self, coords, params=None, timeout=None):
+        """Même contrat que OSRMClient.table (paramètres sources/destinations: indices séparés par ';')"""
+        params = params or {}
+        nodes = [self.graph.nearest_node(lat, lon) for lat, lon in self._parse_coords(coords)]
+        sources = self._table_indices(params.get("sources"), len(nodes))
+        destinations = self._table_indices(params.get("destinations"), len(nodes))
+        source_nodes = [nodes[i] for i in sources]
+        target_nodes = [nodes[i] for i in destinations]
+        if self.ch is not None:
+            durations, distances = self.ch.many_to_many(source_nodes, target_nodes)
+            return {
+                "code": "Ok",
+                "durations": [[None if d is None else round(d, 1) for d in row] for row in durations],
+                "distances": [[None if d is None else round(d, 1) for d in row] for row in distances],
+                "sources": self._waypoints(source_nodes),
+                "destinations": self._waypoints(target_nodes),
+            }
+        durations, distances = [], []
+        for source in source_nodes:
+            row_durations, row_distances = self._one_to_all(source)
+            durations.append([round(row_durations[t], 1) if t in row_durations else None for t in target_nodes])
+            distances.append([round(row_distances[t], 1) if t in row_distances else None for t in target_nodes])
+        return {
+            "code": "Ok",
+            "durations": durations,
+            "distances": distances,
+            "sources": self._waypoints(source_nodes),
+            "destinations": self._waypoints(target_nodes),
+        }
+
+    @staticmethod
+    def _table_indices(value, count):
+        if value is None or value == "all":
+            return list(range(count))
+        return [int(i) for i in str(value).split(";")]
+
+    def stats(self):
+        return {
+            "backend": "local",
+            "graph": self.path,
+            "nodes": self.graph.num_nodes,
+            "edges": self.graph.num_edges,
+            "queries": self.queries,
+            "contraction_hierarchy": self.ch.stats() if self.ch is not None else None,
+        }
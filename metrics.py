@@ -0,0 +1,240 @@
+"""Métriques au format texte Prometheus, chronométrage des étapes, traces par requête et profilage échantillonné"""
+import contextvars
+import cProfile
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Compteur monotone, par combinaison de valeurs de labels"""
+
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """Histogramme à seaux cumulés (le="...") avec _sum et _count"""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(state[0]), state[1], state[2]) for labels, state in self._values.items()]
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield (f"{self.name}_bucket",
+                       _labels(self.labelnames, labels, [("le", _number(float(bound)))]), cumulative)
+            yield f"{self.name}_bucket", _labels(self.labelnames, labels, [("le", "+Inf")]), count
+            yield f"{self.name}_sum", _labels(self.labelnames, labels), total
+            yield f"{self.name}_count", _labels(self.labelnames, labels), count
+
+
+class Callback:
+    """Valeurs lues au moment de l'export (stats déjà tenues ailleurs: cache, disjoncteur...).
+
+    fn() retourne une liste [(valeurs de labels, valeur)].
+    """
+
+    def __init__(self, name, help, fn, labelnames=(), type="gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.type = type
+
+    def samples(self):
+        for labels, value in self.fn():
+            if value is not None:
+                yield self.name, _labels(self.labelnames, labels), value
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, fn, labelnames=(), type="gauge"):
+        return self.register(Callback(name, help, fn, labelnames, type))
+
+    def render(self):
+        """Format d'exposition texte Prometheus 0.0.4"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            try:
+                for name, labels, value in metric.samples():
+                    lines.append(f"{name}{labels} {_number(value)}")
+            except Exception as e:
+                print(f"Erreur export métrique {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "kinshasa_stage_duration_seconds", "Durée des étapes du calcul d'itinéraires", ["stage"])
+
+# Étapes chronométrées de la requête en cours: [(étape, durée en s)], None hors trace
+_trace = contextvars.ContextVar("kinshasa_trace", default=None)
+
+
+@contextmanager
+def stage(name):
+    """Chronomètre une étape: histogramme global, et trace de la requête si elle est active"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, name)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((name, elapsed))
+
+
+def start_trace():
+    """Active la trace pour le contexte courant; retourne le jeton pour end_trace"""
+    return _trace.set([])
+
+
+def end_trace(token):
+    trace = _trace.get()
+    _trace.reset(token)
+    return trace or []
+
+
+def server_timing(trace):
+    """En-tête Server-Timing: durée cumulée et nombre d'occurrences par étape"""
+    totals = {}
+    for name, elapsed in trace:
+        total, count = totals.get(name, (0.0, 0))
+        totals[name] = (total + elapsed, count + 1)
+    return ", ".join(f'{name};dur={total * 1000:.1f};desc="x{count}"'
+                     for name, (total, count) in totals.items())
+
+
+class SamplingProfiler:
+    """Profile (cProfile) une fraction `rate` des requêtes et écrit un .prof par requête.
+
+    Un seul profil à la fois par processus; les requêtes tirées pendant un
+    profil en cours ne sont pas profilées. cProfile ne voit que le thread
+    qui l'a démarré: les appels faits sur osrm_executor n'apparaissent que
+    comme des attentes, et le corps des réponses en flux (SSE, NDJSON), qui
+    tourne après after_request, n'est pas couvert (ces profils sont jetés).
+    """
+
+    def __init__(self, rate=0.0, directory="profiles"):
+        self.rate = rate
+        self.directory = directory
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._active = False
+
+    def start(self):
+        """Profil démarré pour cette requête, ou None si elle n'est pas tirée"""
+        if self.rate <= 0 or random.random() >= self.rate:
+            return None
+        with self._lock:
+            if self._active:
+                return None
+            self._active = True
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def discard(self, profile):
+        """Arrête le profil sans l'écrire"""
+        profile.disable()
+        with self._lock:
+            self._active = False
+
+    def stop(self, profile, label):
+        profile.disable()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            safe_label = "".join(c if c.isalnum() else "_" for c in label)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_label}-{os.getpid()}-{self.samples}.prof"
+            path = os.path.join(self.directory, name)
+            profile.dump_stats(path)
+            self.samples += 1
+        except Exception as e:
+            print(f"Erreur écriture du profil: {e}")
+        finally:
+            with self._lock:
+                self._active = False
@@ -0,0 +1,292 @@
+"""Client HTTP partagé vers le serveur OSRM (pool keep-alive, retries, disjoncteur)"""
+import asyncio
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp n'est nécessaire que pour le serveur ASGI (asgi.py)
+    aiohttp = None
+
+
+class CircuitOpenError(Exception):
+    """Levée quand le disjoncteur est ouvert: on n'appelle pas OSRM"""
+
+
+class DeadlineExceededError(TimeoutError):
+    """Levée quand il ne reste plus de temps pour l'appel: on n'appelle pas OSRM"""
+
+
+class CircuitBreaker:
+    """Disjoncteur simple: fermé -> ouvert après N échecs -> semi-ouvert après un délai"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Indique si un appel peut partir; un seul appel test en semi-ouvert"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    self.rejected += 1
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout_s": self.reset_timeout,
+                "rejected": self.rejected,
+            }
+
+
+class OSRMClient:
+    """Session requests partagée par tous les threads d'un worker"""
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, base_url, timeout=15, pool_size=10, max_retries=2,
+                 backoff_factor=0.3, backoff_jitter=0.3,
+                 failure_threshold=5, reset_timeout=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset(["GET"]),
+            backoff_factor=backoff_factor,
+            backoff_jitter=backoff_jitter,
+            # Un Retry-After long bloquerait le worker: le disjoncteur s'en charge
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                                   max_retries=retry, pool_block=False)
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.session.headers["User-Agent"] = "kinshasa-itineraire/1.0"
+
+        self._lock = threading.Lock()
+        self.requests_sent = 0
+        self.errors = 0
+
+    def get(self, service, coords, params=None, timeout=None):
+        """GET {base}/{service}/v1/driving/{coords}; retourne le JSON ou lève une exception"""
+        timeout = self.timeout if timeout is None else timeout
+        # Délai épuisé: ni appel, ni échec compté par le disjoncteur
+        if timeout <= 0:
+            raise DeadlineExceededError(f"Délai OSRM épuisé ({service})")
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Disjoncteur OSRM ouvert ({self.base_url})")
+
+        url = f"{self.base_url}/{service}/v1/driving/{coords}"
+        with self._lock:
+            self.requests_sent += 1
+        try:
+            r = self.session.get(url, params=params, timeout=timeout)
+            if r.status_code in self.RETRY_STATUSES:
+                r.raise_for_status()
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            self.breaker.record_failure()
+            raise
+
+        # Les 4xx (ex: NoSegment) viennent de la requête, pas d'une panne du serveur
+        self.breaker.record_success()
+        r.raise_for_status()
+        return r.json()
+
+    def route(self, coords, params=None, timeout=None):
+        return self.get("route", coords, params, timeout)
+
+    def table(self, coords, params=None, timeout=None):
+        return self.get("table", coords, params, timeout)
+
+    def pool_stats(self):
+        """Connexions du pool urllib3, par hôte"""
+        pools = []
+        manager = self.adapter.poolmanager
+        for key in list(manager.pools.keys()):
+            pool = manager.pools.get(key)
+            if pool is None:
+                continue
+            pools.append({
+                "host": f"{pool.scheme}://{pool.host}:{pool.port}",
+                "maxsize": pool.pool.maxsize if pool.pool is not None else 0,
+                "idle_connections": pool.pool.qsize() if pool.pool is not None else 0,
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+            })
+        return pools
+
+    def stats(self):
+        with self._lock:
+            requests_sent = self.requests_sent
+            errors = self.errors
+        return {
+            "base_url": self.base_url,
+            "timeout_s": self.timeout,
+            "pool_size": self.pool_size,
+            "requests": requests_sent,
+            "errors": errors,
+            "breaker": self.breaker.stats(),
+            "pools": self.pool_stats(),
+        }
+
+
+class AsyncOSRMClient:
+    """Équivalent non bloquant de OSRMClient (aiohttp), pour asgi.py.
+
+    Même politique: retries avec attente exponentielle + aléa sur 429/5xx et
+    erreurs réseau, puis disjoncteur compté une fois par appel logique.
+    La session est créée au premier appel, dans la boucle d'événements du worker.
+    """
+
+    RETRY_STATUSES = OSRMClient.RETRY_STATUSES
+
+    def __init__(self, base_url, timeout=15, pool_size=100, max_retries=2,
+                 backoff_factor=0.3, backoff_jitter=0.3,
+                 failure_threshold=5, reset_timeout=30.0):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp est requis pour le client OSRM asynchrone (pip install aiohttp)")
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_jitter = backoff_jitter
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.session = None
+        self.requests_sent = 0
+        self.retries = 0
+        self.errors = 0
+
+    def _session(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                headers={"User-Agent": "kinshasa-itineraire/1.0"},
+            )
+        return self.session
+
+    def _backoff(self, consecutive_errors):
+        # Même calcul que urllib3: pas d'attente avant la première nouvelle tentative
+        if consecutive_errors <= 1:
+            return 0.0
+        delay = self.backoff_factor * (2 ** (consecutive_errors - 1))
+        return delay + random.uniform(0, self.backoff_jitter)
+
+    async def _get_once(self, url, params, timeout):
+        """(statut, JSON ou None) pour une tentative"""
+        async with self._session().get(url, params=params,
+                                       timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+            if r.status >= 400:
+                return r.status, None
+            return r.status, await r.json(content_type=None)
+
+    async def get(self, service, coords, params=None, timeout=None):
+        """GET {base}/{service}/v1/driving/{coords}; retourne le JSON ou lève une exception"""
+        timeout = self.timeout if timeout is None else timeout
+        # Délai épuisé: ni appel, ni échec compté par le disjoncteur
+        if timeout <= 0:
+            raise DeadlineExceededError(f"Délai OSRM épuisé ({service})")
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Disjoncteur OSRM ouvert ({self.base_url})")
+
+        url = f"{self.base_url}/{service}/v1/driving/{coords}"
+        self.requests_sent += 1
+        attempt = 0
+        try:
+            while True:
+                try:
+                    status, data = await self._get_once(url, params, timeout)
+                    if status not in self.RETRY_STATUSES:
+                        break
+                    if attempt >= self.max_retries:
+                        raise OSError(f"OSRM {service}: HTTP {status}")
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    if attempt >= self.max_retries:
+                        raise
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+        except Exception:
+            self.errors += 1
+            self.breaker.record_failure()
+            raise
+
+        # Les 4xx (ex: NoSegment) viennent de la requête, pas d'une panne du serveur
+        self.breaker.record_success()
+        if status >= 400:
+            raise OSError(f"OSRM {service}: HTTP {status}")
+        return data
+
+    async def route(self, coords, params=None, timeout=None):
+        return await self.get("route", coords, params, timeout)
+
+    async def table(self, coords, params=None, timeout=None):
+        return await self.get("table", coords, params, timeout)
+
+    async def aclose(self):
+        if self.session is not None:
+            await self.session.close()
+
+    def stats(self):
+        return {
+            "base_url": self.base_url,
+            "timeout_s": self.timeout,
+            "pool_size": self.pool_size,
+            "requests": self.requests_sent,
+            "retries": self.retries,
+            "errors": self.errors,
+            "breaker": self.breaker.stats(),
+        }
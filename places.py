@@ -0,0 +1,168 @@
+"""Landmarks et points d'intérêt: fichiers JSON rechargés à chaud, index par nom et par coordonnées.
+
+Les données sont lues dans des enregistrements compacts (Place, à __slots__)
+regroupés dans un instantané immuable (PlaceSet). Quand un fichier change,
+PlaceStore construit un nouvel instantané puis remplace la référence d'un
+coup: les requêtes en cours gardent l'ancien, les suivantes voient le nouveau.
+"""
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+
+from poi_index import PoiIndex
+
+# Faux dans les requêtes asyncio (asgi.py): PlaceStore.current() n'y fait ni stat ni
+# relecture sur la boucle d'événements, la vérification passe par refresh() dans un thread
+check_files = contextvars.ContextVar("places_check_files", default=True)
+
+
+class Place:
+    """Landmark ou point d'intérêt"""
+
+    __slots__ = ("name", "lat", "lon", "image", "type", "description")
+
+    def __init__(self, name, lat, lon, image=None, type="", description=""):
+        self.name = name
+        self.lat = float(lat)
+        self.lon = float(lon)
+        self.image = image
+        self.type = type
+        self.description = description
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "lat": self.lat,
+            "lon": self.lon,
+            "image": self.image,
+            "type": self.type,
+            "description": self.description,
+        }
+
+
+def name_key(name):
+    """Clé de recherche: sans accents, casse ni ponctuation ("rond point victoire" == "Rond-point Victoire")"""
+    text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii").lower()
+    return " ".join("".join(c if c.isalnum() else " " for c in text).split())
+
+
+def read_places(path, image_url):
+    """Places d'un fichier JSON: liste d'objets {name, lat, lon, image, type, description}.
+
+    image_url(name, fichier) donne l'URL servie pour l'image.
+    """
+    with open(path, encoding="utf-8") as f:
+        items = json.load(f)
+    return [Place(item["name"], item["lat"], item["lon"], image_url(item["name"], item.get("image")),
+                  item.get("type", ""), item.get("description", ""))
+            for item in items]
+
+
+class PlaceSet:
+    """Instantané immuable: landmarks et POIs par nom, index de noms et index spatiaux"""
+
+    def __init__(self, landmarks, points_of_interest, version=0):
+        self.landmarks = {place.name: place for place in landmarks}
+        self.points_of_interest = {place.name: place for place in points_of_interest}
+        self.landmark_names = {name_key(name): name for name in self.landmarks}
+        self.landmark_index = PoiIndex(self.landmarks.values())
+        self.poi_index = PoiIndex(self.points_of_interest.values())
+        self.version = version
+        # Corps de /api/landmarks et son ETag, calculés une fois par instantané (ETag issu du
+        # contenu seul: identique d'un worker à l'autre)
+        payload = {"landmarks": [place.to_dict() for place in self.landmarks.values()]}
+        self.landmarks_json = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.etag = hashlib.sha1(self.landmarks_json).hexdigest()[:16]
+
+    def find_landmark(self, name):
+        """Landmark par nom exact, sinon par clé normalisée; None si inconnu"""
+        place = self.landmarks.get(name)
+        if place is None:
+            place = self.landmarks.get(self.landmark_names.get(name_key(name), ""))
+        return place
+
+
+class PlaceStore:
+    """Instantané courant, rechargé quand un des fichiers change (vérifié au plus toutes les check_interval s).
+
+    Le rechargement se fait dans la requête qui constate le changement; les
+    autres requêtes ne l'attendent pas et servent l'instantané précédent. Un
+    fichier invalide (en cours d'écriture...) est ignoré jusqu'à sa prochaine
+    modification.
+    """
+
+    def __init__(self, landmarks_path, points_of_interest_path, image_url, check_interval=2.0):
+        self.landmarks_path = landmarks_path
+        self.points_of_interest_path = points_of_interest_path
+        self.image_url = image_url
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.errors = 0
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._signature = None
+        self._snapshot = PlaceSet([], [])
+        self.reload()
+
+    def _file_signature(self):
+        signature = []
+        for path in (self.landmarks_path, self.points_of_interest_path):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def reload(self):
+        """Relit les fichiers et publie un nouvel instantané; retourne False si la lecture échoue"""
+        signature = self._file_signature()
+        try:
+            landmarks = read_places(self.landmarks_path, self.image_url)
+            points_of_interest = read_places(self.points_of_interest_path, self.image_url)
+            snapshot = PlaceSet(landmarks, points_of_interest, version=self._snapshot.version + 1)
+        except Exception as e:
+            self.errors += 1
+            print(f"Erreur chargement des lieux ({self.landmarks_path}, {self.points_of_interest_path}): {e}")
+            return False
+        finally:
+            # Même en cas d'erreur: on ne relit qu'après une nouvelle modification
+            self._signature = signature
+        self._snapshot = snapshot
+        self.reloads += 1
+        self.loaded_at = time.time()
+        return True
+
+    def refresh(self):
+        """Recharge si un fichier a changé depuis la dernière vérification; retourne l'instantané"""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            if self._file_signature() != self._signature and self._lock.acquire(blocking=False):
+                try:
+                    self.reload()
+                finally:
+                    self._lock.release()
+        return self._snapshot
+
+    def current(self):
+        if check_files.get():
+            return self.refresh()
+        return self._snapshot
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "landmarks": len(snapshot.landmarks),
+            "points_of_interest": len(snapshot.points_of_interest),
+            "version": snapshot.version,
+            "etag": snapshot.etag,
+            "reloads": self.reloads,
+            "errors": self.errors,
+            "loaded_at": self.loaded_at,
+        }
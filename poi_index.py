@@ -0,0 +1,106 @@
+"""Index spatial des points d'intérêt (grille régulière) et requêtes de corridor le long d'un tracé"""
+from collections import defaultdict
+
+import numpy as np
+
+from geo import haversine_km
+from geometry import METERS_PER_DEGREE_LAT, RouteGeometry
+
+
+class PoiIndex:
+    """Grille de cellules de `cell_deg` degrés -> indices des POIs qu'elles contiennent.
+
+    records: objets avec attributs lat et lon (places.Place).
+    """
+
+    def __init__(self, records, cell_deg=0.01):
+        self.records = list(records)
+        self.cell_deg = cell_deg
+        self.lat = np.array([r.lat for r in self.records], dtype=np.float64)
+        self.lon = np.array([r.lon for r in self.records], dtype=np.float64)
+        cells = defaultdict(list)
+        for i, (ix, iy) in enumerate(zip(self._cell(self.lon), self._cell(self.lat))):
+            cells[(int(ix), int(iy))].append(i)
+        self.cells = {key: np.array(indices, dtype=np.int32) for key, indices in cells.items()}
+
+    def __len__(self):
+        return len(self.records)
+
+    def _cell(self, values):
+        return np.floor(np.asarray(values) / self.cell_deg).astype(np.int64)
+
+    def _candidates(self, lats, lons, radius_m, reach_extra=0):
+        """Indices des POIs dans les cellules touchées par les points, élargies de radius_m"""
+        reach = int(np.ceil(radius_m / (METERS_PER_DEGREE_LAT * self.cell_deg))) + reach_extra
+        ix = self._cell(lons)
+        iy = self._cell(lats)
+        visited = set(zip(ix.tolist(), iy.tolist()))
+        keys = set()
+        for cx, cy in visited:
+            for dx in range(-reach, reach + 1):
+                for dy in range(-reach, reach + 1):
+                    keys.add((cx + dx, cy + dy))
+        found = [self.cells[key] for key in keys if key in self.cells]
+        if not found:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate(found))
+
+    def _densify(self, lats, lons):
+        """Sommets du tracé plus des points intermédiaires: deux points consécutifs sont
+        à moins d'une cellule d'écart (en latitude comme en longitude)"""
+        if len(lats) < 2:
+            return lats, lons
+        dlat, dlon = np.diff(lats), np.diff(lons)
+        steps = np.maximum(1, np.ceil(np.maximum(np.abs(dlat), np.abs(dlon)) / self.cell_deg)).astype(np.int64)
+        segment = np.repeat(np.arange(len(steps)), steps)
+        first = np.repeat(np.cumsum(steps) - steps, steps)
+        t = (np.arange(int(steps.sum())) - first) / steps[segment]
+        return (np.append(lats[segment] + t * dlat[segment], lats[-1]),
+                np.append(lons[segment] + t * dlon[segment], lons[-1]))
+
+    def nearest(self, lat, lon, radius_m=1000.0, limit=5):
+        """POIs à moins de radius_m d'un point, du plus proche au plus loin: [(record, distance_m)]"""
+        candidates = self._candidates(np.array([lat]), np.array([lon]), radius_m)
+        if len(candidates) == 0:
+            return []
+        distances = haversine_km(lat, lon, self.lat[candidates], self.lon[candidates]) * 1000.0
+        order = np.argsort(distances)
+        return [(self.records[candidates[i]], float(distances[i]))
+                for i in order[:limit] if distances[i] <= radius_m]
+
+    def within_corridor(self, route, radius_m=500.0):
+        """POIs à moins de radius_m du tracé, ordonnés le long du trajet.
+
+        route: RouteGeometry, ou liste de coordonnées [lon, lat].
+        Retourne [(record, distance_m, position_m)] où position_m est la distance
+        parcourue depuis le départ jusqu'au point du tracé le plus proche.
+        """
+        if not isinstance(route, RouteGeometry):
+            route = RouteGeometry(route)
+        if len(self.records) == 0 or len(route) == 0:
+            return []
+        lats, lons = route.lat, route.lon
+        # Cellules de tous les segments, pas seulement de leurs sommets: un segment long
+        # traverse des cellules sans y avoir de sommet. Tout point d'un segment est à une
+        # cellule au plus d'un des points densifiés, d'où la cellule de marge
+        dense_lats, dense_lons = self._densify(lats, lons)
+        candidates = self._candidates(dense_lats, dense_lons, radius_m, reach_extra=1)
+        if len(candidates) == 0:
+            return []
+
+        # Présélection par haversine vers les sommets du tracé (matrice POIs x sommets)
+        vertex_km = haversine_km(self.lat[candidates][:, None], self.lon[candidates][:, None],
+                                 lats[None, :], lons[None, :])
+        # Une cellule peut contenir un POI plus loin que radius_m d'un sommet mais proche
+        # d'un segment: on garde une marge d'un demi-segment maximum
+        margin_km = float(route.segment_km.max()) / 2 if len(route.segment_km) else 0.0
+        keep = vertex_km.min(axis=1) * 1000.0 <= radius_m + margin_km * 1000.0
+        candidates = candidates[keep]
+        if len(candidates) == 0:
+            return []
+
+        distances, positions = route.project(self.lat[candidates], self.lon[candidates])
+        result = [(self.records[c], float(d), float(p))
+                  for c, d, p in zip(candidates, distances, positions) if d <= radius_m]
+        result.sort(key=lambda item: item[2])
+        return result
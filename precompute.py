@@ -0,0 +1,233 @@
+"""Matrice pré-calculée des itinéraires entre landmarks (fichier gzip chargé au démarrage)
+
+Le lot d'itinéraires (build_route_bundle) reprend ces paires sous la forme
+des réponses finales de /api/routes: le service worker le met en cache et
+répond sans réseau pour les trajets entre landmarks.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from route_cache import make_route_key
+
+ARTIFACT_VERSION = 1
+BUNDLE_VERSION = 1
+
+
+def compact_osrm_response(data, digits=6):
+    """Garde seulement ce que l'API utilise dans une réponse OSRM /route"""
+    routes = []
+    for route in data.get("routes", []):
+        geometry = route.get("geometry") or {}
+        coordinates = [[round(lon, digits), round(lat, digits)]
+                       for lon, lat in geometry.get("coordinates", [])]
+        routes.append({
+            "distance": route.get("distance", 0),
+            "duration": route.get("duration", 0),
+            "geometry": {"type": "LineString", "coordinates": coordinates},
+            "legs": [{"summary": leg.get("summary", "")} for leg in route.get("legs", [])],
+        })
+    return {"code": data.get("code", "Ok"), "routes": routes}
+
+
+def build_landmark_artifact(landmarks, osrm_client, variants_for_pair, precision=5, delay=0.0):
+    """Interroge OSRM (/table puis /route) pour toutes les paires de landmarks.
+
+    `variants_for_pair(start, end)` retourne la liste des requêtes à faire
+    pour une paire: tuples (points, params) tels qu'envoyés par l'API.
+    """
+    names = list(landmarks.keys())
+    coords = ";".join(f"{landmarks[n]['lon']},{landmarks[n]['lat']}" for n in names)
+    table = osrm_client.table(coords, {"annotations": "duration,distance"})
+
+    responses = {}
+    pairs = []
+    failures = 0
+    for sname in names:
+        for ename in names:
+            if sname == ename:
+                continue
+            start = dict(landmarks[sname], name=sname)
+            end = dict(landmarks[ename], name=ename)
+            complete = True
+            for points, params in variants_for_pair(start, end):
+                key = make_route_key("route", points, params, precision)
+                if key in responses:
+                    continue
+                coords = ";".join(f"{p['lon']},{p['lat']}" for p in points)
+                try:
+                    data = osrm_client.route(coords, params)
+                except Exception as e:
+                    print(f"Erreur OSRM {sname} -> {ename}: {e}")
+                    failures += 1
+                    complete = False
+                    continue
+                if data.get("code") == "Ok":
+                    responses[key] = compact_osrm_response(data)
+                if delay:
+                    time.sleep(delay)
+            if complete:
+                pairs.append([sname, ename])
+
+    return {
+        "version": ARTIFACT_VERSION,
+        "generated_at": time.time(),
+        "osrm_base": osrm_client.base_url,
+        "precision": precision,
+        "landmarks": names,
+        "pairs": pairs,
+        "table": {
+            "durations": table.get("durations"),
+            "distances": table.get("distances"),
+        },
+        "responses": responses,
+        "failures": failures,
+    }
+
+
+def save_artifact(artifact, path):
+    """Écriture atomique: les workers ne lisent jamais un fichier à moitié écrit"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(artifact, f, separators=(",", ":"), ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class PrecomputedRoutes:
+    """Réponses OSRM pré-calculées, servies depuis la mémoire"""
+
+    def __init__(self, artifact=None, path=None):
+        artifact = artifact or {}
+        self.path = path
+        self.generated_at = artifact.get("generated_at")
+        self.osrm_base = artifact.get("osrm_base")
+        self.precision = artifact.get("precision", 5)
+        self.landmarks = artifact.get("landmarks", [])
+        self.table = artifact.get("table") or {}
+        self.responses = artifact.get("responses", {})
+        self.pairs = {tuple(pair) for pair in artifact.get("pairs", [])}
+        self.hits = 0
+
+    @classmethod
+    def load(cls, path, backend_url=None):
+        """Charge l'artefact; ignoré s'il a été produit par un autre moteur que `backend_url`"""
+        if not path or not os.path.exists(path):
+            return cls(path=path)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                artifact = json.load(f)
+        except Exception as e:
+            print(f"Erreur chargement itinéraires pré-calculés {path}: {e}")
+            return cls(path=path)
+        if artifact.get("version") != ARTIFACT_VERSION:
+            print(f"Version d'itinéraires pré-calculés non supportée: {artifact.get('version')}")
+            return cls(path=path)
+        if backend_url is not None and artifact.get("osrm_base") != backend_url:
+            print(f"Itinéraires pré-calculés {path} ignorés: produits par {artifact.get('osrm_base')}, "
+                  f"moteur configuré {backend_url}")
+            return cls(path=path)
+        return cls(artifact, path=path)
+
+    def key(self, points, params):
+        return make_route_key("route", points, params, self.precision)
+
+    def get(self, points, params):
+        if not self.responses:
+            return None
+        data = self.responses.get(self.key(points, params))
+        if data is not None:
+            self.hits += 1
+        return data
+
+    def has_pair(self, start_name, end_name):
+        return (start_name, end_name) in self.pairs
+
+    def age_s(self):
+        if self.generated_at is None:
+            return None
+        return round(time.time() - self.generated_at, 1)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "loaded": self.generated_at is not None,
+            "generated_at": self.generated_at,
+            "age_s": self.age_s(),
+            "osrm_base": self.osrm_base,
+            "landmarks": len(self.landmarks),
+            "pairs": len(self.pairs),
+            "responses": len(self.responses),
+            "hits": self.hits,
+        }
+
+
+def build_route_bundle(pairs, compute_pair, meta=None):
+    """Réponses /api/routes de chaque paire (start, end), indexées routes[start][end].
+
+    `compute_pair(start_name, end_name)` retourne la réponse, ou None si
+    aucun itinéraire n'est trouvé (paire comptée dans `failures`).
+    """
+    routes = {}
+    failures = 0
+    for start_name, end_name in pairs:
+        payload = compute_pair(start_name, end_name)
+        if payload is None:
+            failures += 1
+            continue
+        routes.setdefault(start_name, {})[end_name] = payload
+    return {
+        "version": BUNDLE_VERSION,
+        "generated_at": time.time(),
+        **(meta or {}),
+        "pairs": len(pairs) - failures,
+        "failures": failures,
+        "routes": routes,
+    }
+
+
+class RouteBundle:
+    """Fichier gzip du lot d'itinéraires, gardé compressé en mémoire et relu quand il change"""
+
+    def __init__(self, path):
+        self.path = path
+        self.loaded_at = None
+        self.served = 0
+        self._signature = None
+        self._current = (None, None)
+        self._lock = threading.Lock()
+
+    def current(self):
+        """(contenu gzip, ETag), ou (None, None) si le fichier n'existe pas"""
+        try:
+            stat = os.stat(self.path) if self.path else None
+        except OSError:
+            stat = None
+        signature = (stat.st_mtime_ns, stat.st_size) if stat else None
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    data = None
+                    if signature is not None:
+                        with open(self.path, "rb") as f:
+                            data = f.read()
+                    # Contenu et ETag remplacés ensemble: un lecteur ne voit jamais l'un sans l'autre
+                    self._current = (data, hashlib.sha1(data).hexdigest()[:16] if data is not None else None)
+                    self.loaded_at = time.time() if data is not None else None
+                    self._signature = signature
+        return self._current
+
+    def stats(self):
+        data, etag = self.current()
+        return {
+            "path": self.path,
+            "loaded": data is not None,
+            "bytes": len(data) if data is not None else None,
+            "etag": etag,
+            "loaded_at": self.loaded_at,
+            "served": self.served,
+        }
@@ -0,0 +1,236 @@
+"""Cache des réponses OSRM, clé = coordonnées arrondies + paramètres OSRM"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+
+def make_route_key(service, points, params, precision=5):
+    """Clé de cache: service, points (départ, waypoints, arrivée) arrondis et paramètres triés"""
+    coords = ";".join(f"{p['lon']:.{precision}f},{p['lat']:.{precision}f}" for p in points)
+    query = "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+    return f"{service}/{coords}?{query}"
+
+
+class MemoryBackend:
+    """Cache en mémoire du worker: LRU borné en nombre d'entrées et en octets"""
+
+    name = "memory"
+
+    def __init__(self, max_entries=2000, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value, size = item
+            if expires_at < time.time():
+                del self._data[key]
+                self.total_bytes -= size
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        size = len(json.dumps(value, separators=(",", ":")))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+            self._data[key] = (time.time() + ttl, value, size)
+            self.total_bytes += size
+            while len(self._data) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (_, _, old_size) = self._data.popitem(last=False)
+                self.total_bytes -= old_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.name,
+                "entries": len(self._data),
+                "bytes": self.total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+class SQLiteBackend:
+    """Cache dans un fichier SQLite partagé par tous les workers gunicorn"""
+
+    name = "sqlite"
+
+    def __init__(self, path, max_entries=20000, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS route_cache ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS route_cache_lru ON route_cache (last_access)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires_at FROM route_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at < now:
+            conn.execute("DELETE FROM route_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE route_cache SET last_access = ? WHERE key = ?", (now, key))
+        return json.loads(zlib.decompress(value))
+
+    def set(self, key, value, ttl):
+        blob = zlib.compress(json.dumps(value, separators=(",", ":")).encode())
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO route_cache (key, value, size, expires_at, last_access)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (key, blob, len(blob), now + ttl, now),
+        )
+        self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM route_cache WHERE expires_at < ?", (now,))
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM route_cache"
+        ).fetchone()
+        while count > self.max_entries or total > self.max_bytes:
+            # On retire les 10 % les moins récemment utilisés
+            batch = max(1, count // 10)
+            conn.execute(
+                "DELETE FROM route_cache WHERE key IN"
+                " (SELECT key FROM route_cache ORDER BY last_access LIMIT ?)",
+                (batch,),
+            )
+            self.evictions += batch
+            count, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM route_cache"
+            ).fetchone()
+
+    def clear(self):
+        self._conn().execute("DELETE FROM route_cache")
+
+    def stats(self):
+        count, total = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM route_cache"
+        ).fetchone()
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "entries": count,
+            "bytes": total,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+class RouteCache:
+    """Cache TTL + LRU avec compteurs hits/misses, au-dessus d'un backend.
+
+    `namespace` (URL du moteur de routage) préfixe les clés: un cache sqlite
+    persistant ne sert pas les réponses d'un moteur à un autre.
+    """
+
+    def __init__(self, backend, ttl=6 * 3600, precision=5, namespace=""):
+        self.backend = backend
+        self.ttl = ttl
+        self.precision = precision
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, service, points, params):
+        return f"{self.namespace}|{make_route_key(service, points, params, self.precision)}"
+
+    def get(self, key):
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"Erreur cache ({self.backend.name}): {e}")
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        try:
+            self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            print(f"Erreur cache ({self.backend.name}): {e}")
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        stats = self.backend.stats()
+        stats.update({
+            "ttl_s": self.ttl,
+            "precision": self.precision,
+            "namespace": self.namespace,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        })
+        return stats
+
+
+def create_route_cache(backend="memory", path="cache/routes.sqlite3", ttl=6 * 3600,
+                       precision=5, max_entries=2000, max_bytes=64 * 1024 * 1024, namespace=""):
+    """Construit le cache selon la configuration (memory ou sqlite)"""
+    if backend == "sqlite":
+        store = SQLiteBackend(path, max_entries=max_entries, max_bytes=max_bytes)
+    elif backend == "memory":
+        store = MemoryBackend(max_entries=max_entries, max_bytes=max_bytes)
+    else:
+        raise ValueError(f"Backend de cache inconnu: {backend}")
+    return RouteCache(store, ttl=ttl, precision=precision, namespace=namespace)
@@ -0,0 +1,109 @@
+"""Regroupement des appels identiques simultanés (single-flight) vers le moteur de routage"""
+import asyncio
+import threading
+
+
+class SingleFlightStats:
+    """Compteurs communs: appels, exécutions réelles, appels regroupés, erreurs"""
+
+    def __init__(self):
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "coalesce_rate": round(self.coalesced / self.calls, 4) if self.calls else 0.0,
+            "errors": self.errors,
+            "in_flight": len(self._calls),
+        }
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(SingleFlightStats):
+    """Version threads: le premier appelant d'une clé exécute fn(), les suivants attendent son résultat.
+
+    Les appelants suivants partagent aussi l'exception éventuelle. La clé est
+    libérée dès la fin de l'appel: le résultat n'est pas gardé (c'est le rôle du cache).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, timeout=None):
+        """Résultat de fn() pour cette clé; timeout borne l'attente d'un appel déjà en vol"""
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Attente de l'appel en vol dépassée ({timeout}s)")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight(SingleFlightStats):
+    """Version asyncio: les appelants d'une même clé attendent la même tâche.
+
+    La tâche est protégée par asyncio.shield: l'annulation d'un appelant
+    (requête terminée, client parti) n'interrompt pas l'appel pour les autres.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._calls = {}
+
+    async def do(self, key, coro_fn):
+        self.calls += 1
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_fn())
+            self._calls[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._calls.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
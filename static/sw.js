@@ -0,0 +1,210 @@
+// Service worker (servi à la racine par /sw.js): l'application reste utilisable
+// avec un réseau lent ou absent, et une visite répétée ne refait presque aucun aller-retour.
+// - page et bibliothèques (CDN): cache, revalidé en arrière-plan
+// - tuiles /tiles et images /uploads: cache d'abord (URLs stables ou versionnées)
+// - POST /api/routes entre deux landmarks: réseau (durées selon l'heure de départ),
+//   sinon, hors ligne, en réseau lent ou après NETWORK_TIMEOUT_MS, le lot /api/routes/bundle
+const VERSION = 'v1';
+const SHELL_CACHE = `kinshasa-shell-${VERSION}`;
+const TILE_CACHE = `kinshasa-tiles-${VERSION}`;
+const DATA_CACHE = `kinshasa-data-${VERSION}`;
+const BUNDLE_URL = '/api/routes/bundle';
+const SHELL_URLS = [
+  '/',
+  'https://unpkg.com/leaflet/dist/leaflet.css',
+  'https://unpkg.com/leaflet/dist/leaflet.js',
+  'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css',
+  'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js',
+  'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
+];
+const CDN_HOSTS = ['unpkg.com', 'cdn.jsdelivr.net', 'cdnjs.cloudflare.com'];
+const MAX_TILES = 3000;
+const NETWORK_TIMEOUT_MS = 4000;
+
+let bundlePromise = null;
+let tilePuts = 0;
+
+self.addEventListener('install', event => {
+  event.waitUntil((async () => {
+    const shell = await caches.open(SHELL_CACHE);
+    await Promise.all(SHELL_URLS.map(url => cacheUrl(shell, url)));
+    await refreshBundle();
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener('activate', event => {
+  event.waitUntil((async () => {
+    const current = [SHELL_CACHE, TILE_CACHE, DATA_CACHE];
+    const names = await caches.keys();
+    await Promise.all(names.filter(name => !current.includes(name)).map(name => caches.delete(name)));
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener('fetch', event => {
+  const request = event.request;
+  const url = new URL(request.url);
+  const sameOrigin = url.origin === self.location.origin;
+
+  if (request.method === 'POST' && sameOrigin && url.pathname === '/api/routes') {
+    event.respondWith(routesResponse(request));
+    return;
+  }
+  if (request.method !== 'GET') return;
+
+  if (sameOrigin) {
+    if (url.pathname.startsWith('/tiles/')) {
+      event.respondWith(cacheFirst(event, TILE_CACHE, MAX_TILES));
+    } else if (url.pathname.startsWith('/uploads/')) {
+      event.respondWith(cacheFirst(event, SHELL_CACHE));
+    } else if (request.mode === 'navigate') {
+      // Une visite de la page revalide aussi le lot d'itinéraires (304 s'il n'a pas changé)
+      event.waitUntil(refreshBundle());
+      event.respondWith(staleWhileRevalidate(event, SHELL_CACHE));
+    } else if (url.pathname === '/api/landmarks' && !url.search) {
+      event.respondWith(staleWhileRevalidate(event, DATA_CACHE));
+    }
+  } else if (CDN_HOSTS.includes(url.hostname)) {
+    event.respondWith(staleWhileRevalidate(event, SHELL_CACHE));
+  }
+});
+
+async function cacheUrl(cache, url) {
+  try {
+    const sameOrigin = new URL(url, self.location).origin === self.location.origin;
+    const response = await fetch(url, sameOrigin ? {} : { mode: 'no-cors' });
+    if (response.ok || response.type === 'opaque') await cache.put(url, response);
+    return response.ok;
+  } catch (e) {
+    // Hors ligne: la ressource sera mise en cache au prochain passage
+    return false;
+  }
+}
+
+async function refreshBundle() {
+  if (await cacheUrl(await caches.open(DATA_CACHE), BUNDLE_URL)) bundlePromise = null;
+}
+
+async function cacheFirst(event, cacheName, maxEntries) {
+  const cache = await caches.open(cacheName);
+  const cached = await cache.match(event.request);
+  if (cached) return cached;
+  const response = await fetch(event.request);
+  // Seulement les réponses du serveur: une tuile redirigée vers l'amont n'est pas gardée
+  if (response.ok && response.type === 'basic' && !response.redirected) {
+    event.waitUntil(cache.put(event.request, response.clone()).then(() => {
+      if (maxEntries && ++tilePuts % 50 === 0) return trimCache(cache, maxEntries);
+    }));
+  }
+  return response;
+}
+
+async function staleWhileRevalidate(event, cacheName) {
+  const cache = await caches.open(cacheName);
+  const cached = await cache.match(event.request, { ignoreSearch: event.request.mode === 'navigate' });
+  const network = fetch(event.request).then(response => {
+    if (response.ok || response.type === 'opaque') {
+      return cache.put(event.request, response.clone()).then(() => response);
+    }
+    return response;
+  });
+  if (cached) {
+    event.waitUntil(network.catch(() => null));
+    return cached;
+  }
+  return network;
+}
+
+async function trimCache(cache, maxEntries) {
+  // Les clés sont dans l'ordre d'insertion: les plus anciennes partent d'abord
+  const keys = await cache.keys();
+  await Promise.all(keys.slice(0, Math.max(0, keys.length - maxEntries)).map(key => cache.delete(key)));
+}
+
+function loadBundle() {
+  if (!bundlePromise) {
+    bundlePromise = caches.open(DATA_CACHE)
+      .then(cache => cache.match(BUNDLE_URL))
+      .then(response => (response ? response.json() : null))
+      .catch(() => null);
+  }
+  return bundlePromise;
+}
+
+function preferBundle() {
+  const connection = navigator.connection;
+  return !navigator.onLine ||
+    Boolean(connection && (connection.saveData || /2g/.test(connection.effectiveType || '')));
+}
+
+function sseEvent(event, data) {
+  return `event: ${event}\ndata: ${JSON.stringify(data)}\n\n`;
+}
+
+// Réponse /api/routes tirée du lot, au format demandé (JSON ou SSE), ou null si le lot ne couvre pas la requête
+async function bundleResponse(body, accept) {
+  if (!body || !body.start_name || !body.end_name || body.inline_images) return null;
+  // Une heure de départ (même "now") demande des durées prévues: le lot n'en a pas
+  if (body.depart_at) return null;
+  const bundle = await loadBundle();
+  if (!bundle || (body.geometry_format || 'geojson') !== bundle.geometry_format) return null;
+  const payload = ((bundle.routes || {})[body.start_name] || {})[body.end_name];
+  if (!payload) return null;
+
+  const alternatives = Math.min(Math.max(parseInt(body.alternatives ?? 5, 10) || 1, 1), 8);
+  const routes = payload.routes.slice(0, alternatives);
+  const duration = route => route.predicted_duration_min ?? route.duration_min;
+  let shortest = 0;
+  let fastest = 0;
+  routes.forEach((route, idx) => {
+    if (route.distance_km < routes[shortest].distance_km) shortest = idx;
+    if (duration(route) < duration(routes[fastest])) fastest = idx;
+  });
+  const now = Date.now() / 1000;
+  const result = {
+    ...payload,
+    routes,
+    shortest_index: shortest,
+    fastest_index: fastest,
+    total_routes_found: routes.length,
+    precomputed_age_s: bundle.precomputed_generated_at ? Math.round(now - bundle.precomputed_generated_at) : null,
+    bundle_age_s: Math.round(now - bundle.generated_at),
+  };
+
+  if (body.stream || accept.includes('text/event-stream')) {
+    const { start, end, routes: _, ...done } = result;
+    const events = [sseEvent('start', { start, end })];
+    routes.forEach((route, id) => events.push(sseEvent('route', { id, route })));
+    events.push(sseEvent('done', { ...done, order: routes.map((_, idx) => idx) }));
+    return new Response(events.join(''), {
+      headers: { 'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache' },
+    });
+  }
+  return new Response(JSON.stringify(result), { headers: { 'Content-Type': 'application/json' } });
+}
+
+async function routesResponse(request) {
+  let body = null;
+  try {
+    body = await request.clone().json();
+  } catch (e) {
+    // Corps illisible: le serveur répondra l'erreur
+  }
+  const fallback = await bundleResponse(body, request.headers.get('Accept') || '');
+  if (!fallback) return fetch(request);
+  if (preferBundle()) return fallback;
+
+  let timer;
+  const timeout = new Promise((_, reject) => {
+    timer = setTimeout(() => reject(new Error('timeout')), NETWORK_TIMEOUT_MS);
+  });
+  try {
+    const response = await Promise.race([fetch(request), timeout]);
+    return response.status >= 500 ? fallback : response;
+  } catch (e) {
+    return fallback;
+  } finally {
+    clearTimeout(timer);
+  }
+}
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# Les modules de l'application sont à la racine du dépôt
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py lit sa configuration à l'import: moteur local, sans artefacts pré-calculés
+os.environ.setdefault("ROUTING_BACKEND", "local")
+os.environ.setdefault("ROUTE_CACHE_BACKEND", "memory")
+for name in ("PRECOMPUTED_ROUTES_PATH", "TRAFFIC_PROFILE_PATH", "TILES_PATH", "ROUTE_BUNDLE_PATH"):
+    os.environ.setdefault(name, "")
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
@@ -0,0 +1,69 @@
+import pytest
+
+from alternatives import MAX_OVERLAP, VIA_OFFSETS, generate_via_points, is_diverse
+from geometry import RouteGeometry
+
+START = {"lat": -4.3408, "lon": 15.3137}
+END = {"lat": -4.3012, "lon": 15.3179}
+
+
+def test_via_points_lie_on_perpendicular_bisector():
+    points = generate_via_points(START, END)
+    assert len(points) == 5
+    mid_lat, mid_lon = (START["lat"] + END["lat"]) / 2, (START["lon"] + END["lon"]) / 2
+    dlat, dlon = END["lat"] - START["lat"], END["lon"] - START["lon"]
+    norm = (dlat ** 2 + dlon ** 2) ** 0.5
+    for point, offset in zip(points, VIA_OFFSETS):
+        # À égale distance du départ et de l'arrivée, et perpendiculaire au trajet
+        to_start = (point["lat"] - START["lat"]) ** 2 + (point["lon"] - START["lon"]) ** 2
+        to_end = (point["lat"] - END["lat"]) ** 2 + (point["lon"] - END["lon"]) ** 2
+        assert to_start == pytest.approx(to_end, abs=1e-8)
+        vlat, vlon = point["lat"] - mid_lat, point["lon"] - mid_lon
+        assert vlat * dlat + vlon * dlon == pytest.approx(0, abs=1e-8)
+        assert (vlat ** 2 + vlon ** 2) ** 0.5 == pytest.approx(abs(offset) * norm, abs=1e-6)
+
+
+def test_via_points_alternate_sides_and_are_deterministic():
+    points = generate_via_points(START, END, num_points=4)
+    assert points == generate_via_points(START, END, num_points=4)
+    # Côté du point: signe du produit vectoriel (trajet x vecteur milieu -> point)
+    dlat, dlon = END["lat"] - START["lat"], END["lon"] - START["lon"]
+    mid_lat, mid_lon = (START["lat"] + END["lat"]) / 2, (START["lon"] + END["lon"]) / 2
+    sides = [dlat * (p["lon"] - mid_lon) - dlon * (p["lat"] - mid_lat) > 0 for p in points]
+    assert sides == [sides[0], not sides[0], sides[0], not sides[0]]
+
+
+def test_no_via_points_when_start_equals_end():
+    assert generate_via_points(START, START) == []
+
+
+def route(n_shared, n_total=10):
+    """Tracé de n_total segments vers l'est dont les n_shared premiers suivent BASE, les suivants 11 m au sud"""
+    coordinates = [[15.30 + i * 0.001, -4.32] for i in range(n_shared + 1)]
+    coordinates += [[15.30 + i * 0.001, -4.3201] for i in range(n_shared + 1, n_total + 1)]
+    return RouteGeometry(coordinates)
+
+
+BASE = RouteGeometry([[15.30 + i * 0.001, -4.32] for i in range(11)])
+
+
+def test_is_diverse_rejects_routes_above_max_overlap():
+    assert MAX_OVERLAP == 0.8
+    above = route(9)
+    assert above.overlap(BASE) > MAX_OVERLAP
+    assert not is_diverse(above, [BASE])
+    assert not is_diverse(BASE, [BASE])
+
+
+def test_is_diverse_accepts_routes_below_max_overlap():
+    below = route(6)
+    assert below.overlap(BASE) < MAX_OVERLAP
+    assert is_diverse(below, [BASE])
+    # Chaque tracé déjà retenu compte, pas seulement le premier
+    assert not is_diverse(below, [BASE, route(6)])
+    assert not is_diverse(below, [BASE], max_overlap=0.5)
+
+
+def test_is_diverse_first_and_degenerate_routes():
+    assert is_diverse(BASE, [])
+    assert not is_diverse(RouteGeometry([[15.30, -4.32]]), [])
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+VICTOIRE, GARE, GOMBE, MATONGE, LEMBA = "Rond-point Victoire", "Gare Centrale", "Gombe", "Matonge", "Lemba"
+
+
+def ndjson(response):
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+@pytest.fixture
+def compute_calls(app_module, monkeypatch):
+    calls = []
+    compute_routes = app_module.compute_routes
+
+    def counting(start, end, options):
+        calls.append((start["name"], end["name"]))
+        return compute_routes(start, end, options)
+
+    monkeypatch.setattr(app_module, "compute_routes", counting)
+    return calls
+
+
+@pytest.fixture
+def table_calls(app_module, monkeypatch):
+    calls = []
+    table = app_module.routing_backend.table
+
+    def counting(coords, params=None, timeout=None):
+        calls.append((coords, params))
+        return table(coords, params, timeout)
+
+    monkeypatch.setattr(app_module.routing_backend, "table", counting)
+    return calls
+
+
+def test_batch_deduplicates_identical_legs(client, compute_calls):
+    pair = {"start_name": VICTOIRE, "end_name": GARE}
+    lines = ndjson(client.post("/api/routes/batch", json={
+        "alternatives": 2,
+        "pairs": [pair, {"start_name": GOMBE, "end_name": MATONGE}, dict(pair)],
+    }))
+    results = {line["index"]: line for line in lines if "index" in line}
+    assert sorted(results) == [0, 1, 2]
+    assert sorted(compute_calls) == [(GOMBE, MATONGE), (VICTOIRE, GARE)]
+    assert results[0]["routes"] == results[2]["routes"]
+    assert len(results[0]["routes"]) <= 2
+    assert lines[-1] == {"done": True, "pairs": 3, "unique_legs": 2, "errors": 0}
+
+
+def test_batch_pair_options_split_legs(client, compute_calls):
+    pair = {"start_name": VICTOIRE, "end_name": GARE}
+    ndjson(client.post("/api/routes/batch", json={"pairs": [pair, dict(pair, alternatives=1)]}))
+    assert len(compute_calls) == 2
+
+
+def test_batch_unknown_landmark_error_line(client, compute_calls):
+    lines = ndjson(client.post("/api/routes/batch", json={"pairs": [
+        {"start_name": "Atlantide", "end_name": GARE},
+        {"start_name": VICTOIRE, "end_name": GARE},
+    ]}))
+    assert lines[0] == {"index": 0, "error": "Start landmark 'Atlantide' unknown"}
+    assert [line["index"] for line in lines[1:-1]] == [1]
+    assert lines[-1]["errors"] == 1 and lines[-1]["unique_legs"] == 1
+
+
+def test_batch_rejects_empty_pairs(client):
+    assert client.post("/api/routes/batch", json={"pairs": []}).status_code == 400
+
+
+def test_matrix_blocks_split_at_max_coords(client, app_module, monkeypatch, table_calls):
+    monkeypatch.setattr(app_module, "MATRIX_MAX_COORDS", 4)
+    origins = [VICTOIRE, GARE, GOMBE, MATONGE, LEMBA]
+    destinations = [GARE, LEMBA, GARE]
+    lines = ndjson(client.post("/api/matrix", json={"origins": origins, "destinations": destinations}))
+
+    # 2 destinations distinctes: blocs de 4 - 2 = 2 origines, soit 3 appels /table
+    assert len(table_calls) == 3
+    assert all(len(coords.split(";")) <= 4 for coords, _ in table_calls)
+    assert lines[-1]["blocks"] == 3 and lines[-1]["failed_blocks"] == 0
+    assert lines[-1]["unique_destinations"] == 2
+    rows = {line["origin_index"]: line for line in lines[:-1]}
+    assert sorted(rows) == list(range(len(origins)))
+    for row in rows.values():
+        assert len(row["durations_s"]) == len(destinations)
+        assert row["durations_s"][0] == row["durations_s"][2]
+    assert rows[1]["durations_s"][0] == 0
+
+
+def test_matrix_too_many_destinations(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "MATRIX_MAX_COORDS", 3)
+    response = client.post("/api/matrix", json={"origins": [VICTOIRE], "destinations": [GARE, GOMBE, LEMBA]})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("point", [{"lat": "nord", "lon": 15.3}, {"lat": -4.3, "lon": None}, {"lat": -4.3}, 42])
+def test_matrix_rejects_invalid_points(client, point):
+    response = client.post("/api/matrix", json={"origins": [point], "destinations": [GARE]})
+    assert response.status_code == 400
+    assert response.get_json()["error"].startswith("Origin")
+
+
+def test_matrix_unknown_landmark(client):
+    response = client.post("/api/matrix", json={"origins": [VICTOIRE], "destinations": ["Atlantide"]})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Destination landmark 'Atlantide' unknown"}
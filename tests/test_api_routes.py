@@ -0,0 +1,30 @@
+def post_routes(client, **body):
+    body = dict({"start_name": "Rond-point Victoire", "end_name": "Gare Centrale", "alternatives": 5}, **body)
+    response = client.post("/api/routes", json=body)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_without_depart_at_routes_are_ordered_by_distance(client):
+    payload = post_routes(client)
+    distances = [route["distance_km"] for route in payload["routes"]]
+    assert len(distances) > 1
+    assert payload["ranking"] == "distance"
+    assert "depart_at" not in payload
+    assert distances == sorted(distances)
+    assert payload["shortest_index"] == 0
+    assert all("predicted_duration_min" not in route for route in payload["routes"])
+
+
+def test_explicit_depart_at_ranks_by_predicted_duration(client):
+    payload = post_routes(client, depart_at="2024-05-13T07:30")
+    assert payload["ranking"] == "predicted_duration"
+    assert payload["depart_at"] == "2024-05-13T07:30+01:00"
+    predicted = [route["predicted_duration_min"] for route in payload["routes"]]
+    assert predicted == sorted(predicted)
+
+
+def test_invalid_depart_at_is_rejected(client):
+    response = client.post("/api/routes", json={"start_name": "Rond-point Victoire",
+                                                "end_name": "Gare Centrale", "depart_at": "demain"})
+    assert response.status_code == 400
@@ -0,0 +1,58 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+asgi = pytest.importorskip("asgi")
+
+
+def call_api_routes(body):
+    """Appelle asgi.api_routes et retourne (statut, en-têtes, corps)"""
+    sent = []
+    received = {"count": 0}
+
+    async def receive():
+        received["count"] += 1
+        if received["count"] > 1:
+            await asyncio.sleep(3600)
+        return {"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.api_routes({"type": "http", "headers": []}, receive, send))
+    body = b"".join(message.get("body", b"") for message in sent[1:])
+    return sent[0]["status"], dict(sent[0]["headers"]), body
+
+
+@pytest.fixture
+def loop_thread_calls(app_module, monkeypatch):
+    """Appels de stat des lieux et de lecture d'images faits sur le thread de la boucle"""
+    calls = []
+    file_signature = app_module.place_store._file_signature
+    inline_image = app_module.inline_image
+
+    def record(name, fn):
+        def wrapper(*args):
+            if threading.current_thread() is threading.main_thread():
+                calls.append(name)
+            return fn(*args)
+        return wrapper
+
+    monkeypatch.setattr(app_module.place_store, "_file_signature", record("stat", file_signature))
+    monkeypatch.setattr(app_module.place_store, "check_interval", 0)
+    monkeypatch.setattr(app_module, "inline_image", record("inline_image", inline_image))
+    return calls
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_places_and_images_stay_off_the_event_loop(loop_thread_calls, stream):
+    status, headers, body = call_api_routes({"start_name": "Rond-point Victoire", "end_name": "Gare Centrale",
+                                             "alternatives": 2, "inline_images": True, "stream": stream})
+    assert status == 200
+    if stream:
+        assert b"event: done" in body
+    else:
+        assert json.loads(body)["start"]["image"].startswith("data:image/")
+    assert loop_thread_calls == []
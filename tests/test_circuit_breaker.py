@@ -0,0 +1,132 @@
+import pytest
+import requests
+
+import osrm_client
+from osrm_client import CircuitBreaker, CircuitOpenError, DeadlineExceededError, OSRMClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(osrm_client.time, "monotonic", clock)
+    return clock
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow()
+        breaker.record_failure()
+
+
+def test_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10.0)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10.0)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 1
+
+
+def test_half_open_after_reset_timeout_allows_a_single_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0)
+    open_breaker(breaker)
+    clock.now += 9.9
+    assert not breaker.allow()
+    clock.now += 0.2
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 2
+
+
+def test_half_open_probe_success_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0)
+    open_breaker(breaker)
+    clock.now += 10.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+    assert breaker.allow() and breaker.allow()
+
+
+def test_half_open_probe_failure_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0)
+    open_breaker(breaker)
+    clock.now += 10.0
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    clock.now += 10.0
+    assert breaker.allow()
+
+
+def test_client_rejects_without_calling_when_open(clock, monkeypatch):
+    client = OSRMClient("http://osrm.invalid", failure_threshold=2, reset_timeout=10.0)
+    calls = []
+
+    def failing_get(url, **kwargs):
+        calls.append(url)
+        raise requests.ConnectionError("indisponible")
+
+    monkeypatch.setattr(client.session, "get", failing_get)
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            client.route("15.3,-4.3;15.31,-4.31")
+    with pytest.raises(CircuitOpenError):
+        client.route("15.3,-4.3;15.31,-4.31")
+    assert len(calls) == 2
+    assert client.stats()["errors"] == 2
+
+
+def test_client_skips_call_without_remaining_time(monkeypatch):
+    client = OSRMClient("http://osrm.invalid", timeout=7, failure_threshold=1)
+    timeouts = []
+
+    class Response:
+        status_code = 200
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"code": "Ok"}
+
+    def fake_get(url, params=None, timeout=None):
+        timeouts.append(timeout)
+        return Response()
+
+    monkeypatch.setattr(client.session, "get", fake_get)
+    for timeout in (0, 0.0, -1):
+        with pytest.raises(DeadlineExceededError):
+            client.route("15.3,-4.3;15.31,-4.31", timeout=timeout)
+    assert timeouts == []
+    assert client.stats()["requests"] == 0
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+    client.route("15.3,-4.3;15.31,-4.31")
+    client.route("15.3,-4.3;15.31,-4.31", timeout=0.5)
+    assert timeouts == [7, 0.5]
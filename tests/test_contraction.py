@@ -0,0 +1,120 @@
+import heapq
+import random
+
+import pytest
+
+from contraction import ContractionHierarchy, build_contraction_hierarchy, save_index
+from local_router import RoadGraph
+
+SIZE = 8
+
+
+def make_grid(size=SIZE, seed=7):
+    """Grille size x size autour de Kinshasa, vitesses aléatoires, quelques sens uniques"""
+    rng = random.Random(seed)
+    lat, lon = [], []
+    for i in range(size):
+        for j in range(size):
+            lat.append(-4.30 - i * 0.002)
+            lon.append(15.30 + j * 0.002)
+    sources, targets, speeds = [], [], []
+    for i in range(size):
+        for j in range(size):
+            u = i * size + j
+            for v in ((u + 1) if j + 1 < size else None, (u + size) if i + 1 < size else None):
+                if v is None:
+                    continue
+                speed = rng.choice([20, 30, 50, 80])
+                sources.append(u)
+                targets.append(v)
+                speeds.append(speed)
+                if rng.random() > 0.15:
+                    sources.append(v)
+                    targets.append(u)
+                    speeds.append(speed)
+    return RoadGraph(lat, lon, sources, targets, speeds, [-1] * len(sources), [])
+
+
+def dijkstra(graph, source):
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for i in range(graph.fwd_offsets[u], graph.fwd_offsets[u + 1]):
+            v = int(graph.fwd_targets[i])
+            dv = d + float(graph.fwd_durations[i])
+            if dv < dist.get(v, float("inf")):
+                dist[v] = dv
+                heapq.heappush(heap, (dv, v))
+    return dist
+
+
+def path_cost(graph, path):
+    duration = length = 0.0
+    for u, v in zip(path, path[1:]):
+        edge_duration, edge_length, _ = graph.edge(u, v)  # KeyError si l'arc n'existe pas dans le graphe d'origine
+        duration += edge_duration
+        length += edge_length
+    return duration, length
+
+
+@pytest.fixture(scope="module")
+def graph():
+    return make_grid()
+
+
+@pytest.fixture(scope="module")
+def ch(graph):
+    return ContractionHierarchy(build_contraction_hierarchy(graph))
+
+
+def test_query_matches_dijkstra_and_unpacks_to_original_edges(graph, ch):
+    for source in (0, 5, 27, graph.num_nodes - 1):
+        reference = dijkstra(graph, source)
+        for target in range(graph.num_nodes):
+            path, duration, length = ch.query(source, target)
+            if target not in reference:
+                assert path is None
+                continue
+            assert duration == pytest.approx(reference[target], rel=1e-4, abs=1e-3)
+            assert path[0] == source and path[-1] == target
+            path_duration, path_length = path_cost(graph, path)
+            assert path_duration == pytest.approx(duration, rel=1e-4, abs=1e-3)
+            assert path_length == pytest.approx(length, rel=1e-4, abs=1e-2)
+
+
+def test_many_to_many_matches_query(graph, ch):
+    sources, targets = [0, 9, 40], [63, 7, 18, 0]
+    durations, lengths = ch.many_to_many(sources, targets)
+    for i, source in enumerate(sources):
+        for j, target in enumerate(targets):
+            _, duration, length = ch.query(source, target)
+            if durations[i][j] is None:
+                assert duration == float("inf")
+            else:
+                assert durations[i][j] == pytest.approx(duration, rel=1e-4, abs=1e-3)
+                assert lengths[i][j] == pytest.approx(length, rel=1e-4, abs=1e-2)
+
+
+def test_save_load_round_trip(graph, tmp_path):
+    arrays = build_contraction_hierarchy(graph)
+    path = tmp_path / "grid.ch"
+    save_index(arrays, str(path), names=["Boulevard du 30 Juin"])
+    loaded = ContractionHierarchy.load(str(path))
+    assert loaded.names == ["Boulevard du 30 Juin"]
+    assert loaded.num_nodes == graph.num_nodes
+    for key, array in arrays.items():
+        assert getattr(loaded, key).dtype == array.dtype
+        assert (getattr(loaded, key) == array).all()
+    original = ContractionHierarchy(arrays)
+    for source, target in ((0, 63), (63, 0), (12, 50)):
+        assert loaded.query(source, target) == original.query(source, target)
+
+
+def test_load_rejects_bad_magic(tmp_path):
+    path = tmp_path / "bad.ch"
+    path.write_bytes(b"NOPE" + b"\0" * 16)
+    with pytest.raises(ValueError):
+        ContractionHierarchy.load(str(path))
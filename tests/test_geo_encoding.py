@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from geo_encoding import decode_polyline, encode_delta, encode_polyline, format_geometry, simplify
+
+# Vecteur de référence de la documentation Google (Encoded Polyline Algorithm Format)
+GOOGLE_COORDINATES = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+GOOGLE_ENCODED = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def random_route(n=200, seed=3):
+    rng = random.Random(seed)
+    lon, lat = 15.30, -4.32
+    coordinates = []
+    for _ in range(n):
+        lon += rng.uniform(-0.003, 0.003)
+        lat += rng.uniform(-0.003, 0.003)
+        coordinates.append([round(lon, 7), round(lat, 7)])
+    return coordinates
+
+
+def test_google_reference_vector():
+    assert encode_polyline(GOOGLE_COORDINATES, 5) == GOOGLE_ENCODED
+    assert decode_polyline(GOOGLE_ENCODED, 5) == GOOGLE_COORDINATES
+
+
+@pytest.mark.parametrize("precision", [5, 6])
+def test_polyline_round_trip(precision):
+    coordinates = random_route()
+    decoded = decode_polyline(encode_polyline(coordinates, precision), precision)
+    assert len(decoded) == len(coordinates)
+    tolerance = 0.5 / 10 ** precision + 1e-12
+    for (lon, lat), (dlon, dlat) in zip(coordinates, decoded):
+        assert abs(lon - dlon) <= tolerance
+        assert abs(lat - dlat) <= tolerance
+
+
+def test_encode_delta_accumulates_to_coordinates():
+    coordinates = random_route(50)
+    values = encode_delta(coordinates, 6)
+    lon = lat = 0
+    for i, (expected_lon, expected_lat) in enumerate(coordinates):
+        lon += values[2 * i]
+        lat += values[2 * i + 1]
+        assert lon == round(expected_lon * 1e6)
+        assert lat == round(expected_lat * 1e6)
+
+
+def test_simplify_keeps_endpoints_and_drops_collinear_points():
+    line = [[15.30 + i * 0.001, -4.32] for i in range(10)]
+    assert simplify(line, 1e-6) == [line[0], line[-1]]
+    bent = line + [[15.309, -4.31]]
+    assert simplify(bent, 1e-6) == [line[0], line[-1], bent[-1]]
+
+
+def test_format_geometry_polyline6():
+    geometry = {"type": "LineString", "coordinates": GOOGLE_COORDINATES}
+    result = format_geometry(geometry, "polyline6")
+    assert result["type"] == "polyline6"
+    assert decode_polyline(result["value"], 6) == GOOGLE_COORDINATES
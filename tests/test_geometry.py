@@ -0,0 +1,69 @@
+import pytest
+
+from geo import haversine_km
+from geometry import RouteGeometry
+
+# Quatre segments égaux (~1,1 km) d'ouest en est le long de la latitude -4.32
+LINE = [[15.30 + i * 0.01, -4.32] for i in range(5)]
+
+
+def test_identical_and_reversed_routes_overlap_fully():
+    route = RouteGeometry(LINE)
+    assert route.overlap(RouteGeometry(LINE)) == pytest.approx(1.0)
+    assert route.overlap(RouteGeometry(LINE[::-1])) == pytest.approx(1.0)
+
+
+def test_disjoint_routes_do_not_overlap():
+    other = RouteGeometry([[lon, lat - 0.01] for lon, lat in LINE])
+    assert RouteGeometry(LINE).overlap(other) == 0.0
+
+
+def test_partial_overlap_is_a_share_of_length():
+    # Mêmes deux premiers segments, puis un détour vers le sud
+    detour = LINE[:3] + [[15.33, -4.33], [15.34, -4.33]]
+    route = RouteGeometry(LINE)
+    assert route.overlap(RouteGeometry(detour)) == pytest.approx(0.5, abs=0.01)
+    # Le recouvrement est rapporté à la longueur du tracé mesuré
+    assert RouteGeometry(LINE[:3]).overlap(route) == pytest.approx(1.0)
+
+
+def test_rounding_merges_nearly_identical_vertices():
+    jittered = [[lon + 1e-7, lat - 1e-7] for lon, lat in LINE]
+    assert RouteGeometry(LINE).overlap(RouteGeometry(jittered)) == pytest.approx(1.0)
+
+
+def test_empty_route_counts_as_overlapping():
+    assert RouteGeometry([]).overlap(RouteGeometry(LINE)) == 1.0
+
+
+def test_length_and_cumulative_distance():
+    route = RouteGeometry(LINE)
+    expected = haversine_km(-4.32, 15.30, -4.32, 15.34) * 1000.0
+    assert route.length_m == pytest.approx(expected, rel=1e-6)
+    assert route.cumulative_m[2] == pytest.approx(expected / 2, rel=1e-6)
+
+
+def test_project_onto_segment_interior_and_ends():
+    route = RouteGeometry(LINE)
+    distances, positions = route.project([-4.319, -4.32, -4.32], [15.315, 15.36, 15.28])
+    # Au nord du milieu du 2e segment: ~110 m du tracé, à mi-chemin de 1,5 segment
+    assert distances[0] == pytest.approx(110.5, abs=1.0)
+    assert positions[0] == pytest.approx(route.length_m * 1.5 / 4, rel=1e-3)
+    # Au-delà des extrémités: projeté sur l'arrivée, puis sur le départ
+    assert positions[1] == pytest.approx(route.length_m)
+    assert distances[1] == pytest.approx(haversine_km(-4.32, 15.34, -4.32, 15.36) * 1000.0, rel=5e-3)
+    assert positions[2] == 0.0
+
+
+def test_order_along_sorts_records_by_position():
+    records = [{"name": "fin", "lat": -4.321, "lon": 15.335}, {"name": "début", "lat": -4.319, "lon": 15.305}]
+    ordered = RouteGeometry(LINE).order_along(records)
+    assert [record["name"] for record, _, _ in ordered] == ["début", "fin"]
+
+
+def test_project_on_degenerate_routes():
+    distances, _ = RouteGeometry([]).project([-4.32], [15.30])
+    assert distances[0] == float("inf")
+    distances, positions = RouteGeometry([[15.30, -4.32]]).project([-4.33], [15.30])
+    assert distances[0] == pytest.approx(1112, abs=2)
+    assert positions[0] == 0.0
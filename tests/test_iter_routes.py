@@ -0,0 +1,69 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+START = {"name": "A", "lat": -4.3311, "lon": 15.3017}
+END = {"name": "B", "lat": -4.3122, "lon": 15.3291}
+
+
+class RecordingBackend:
+    """Moteur factice: note le délai de chaque appel, sans répondre d'itinéraire"""
+
+    def __init__(self):
+        self.timeouts = []
+
+    def route(self, coords, params=None, timeout=None):
+        self.timeouts.append(timeout)
+        return {"code": "NoRoute"}
+
+
+@pytest.fixture
+def saturated_pool(app_module, monkeypatch):
+    """osrm_executor à un seul thread, occupé jusqu'à release.set()"""
+    executor = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    executor.submit(release.wait, 5)
+    monkeypatch.setattr(app_module, "osrm_executor", executor)
+    yield executor, release
+    release.set()
+    executor.shutdown(wait=True)
+
+
+@pytest.fixture
+def backend(app_module, monkeypatch):
+    backend = RecordingBackend()
+    monkeypatch.setattr(app_module, "routing_backend", backend)
+    return backend
+
+
+def test_queued_call_gets_timeout_computed_when_it_starts(app_module, saturated_pool, backend):
+    executor, release = saturated_pool
+    deadline = time.monotonic() + 1.0
+    future = executor.submit(app_module.get_direct_routes, START, END, deadline)
+    time.sleep(0.4)
+    release.set()
+    assert future.result(timeout=5) is not None
+    assert len(backend.timeouts) == 1
+    assert backend.timeouts[0] <= 0.65
+
+
+def test_queued_call_past_deadline_is_skipped(app_module, saturated_pool, backend):
+    executor, release = saturated_pool
+    deadline = time.monotonic() + 0.2
+    future = executor.submit(app_module.get_direct_routes, START, END, deadline)
+    time.sleep(0.3)
+    release.set()
+    assert future.result(timeout=5) is None
+    assert backend.timeouts == []
+
+
+def test_iter_routes_stops_at_deadline_with_saturated_pool(app_module, saturated_pool, backend):
+    _, release = saturated_pool
+    started = time.monotonic()
+    routes = list(app_module.iter_routes(START, END, 5, started + 0.3))
+    assert routes == []
+    assert time.monotonic() - started < 1.0
+    release.set()
+    assert all(timeout <= 0.3 for timeout in backend.timeouts)
@@ -0,0 +1,118 @@
+import json
+
+import pytest
+
+from alternatives import MAX_OVERLAP
+from contraction import ContractionHierarchy, build_contraction_hierarchy
+from local_router import LocalRouter, RoadGraph
+
+ROWS, COLS = 3, 5
+ISOLATED = ROWS * COLS          # aucun arc
+ONE_WAY_IN = ISOLATED + 1       # un seul arc sortant, vers le nœud 0: injoignable
+
+
+def node(row, col):
+    return row * COLS + col
+
+
+def grid_json():
+    nodes = [[-4.30 - row * 0.005, 15.30 + col * 0.005] for row in range(ROWS) for col in range(COLS)]
+    nodes += [[-4.35, 15.35], [-4.295, 15.295]]
+    edges = []
+    for row in range(ROWS):
+        for col in range(COLS):
+            if col + 1 < COLS:
+                edges.append([node(row, col), node(row, col + 1), 40, 0, row])
+            if row + 1 < ROWS:
+                edges.append([node(row, col), node(row + 1, col), 30, 0, ROWS])
+    edges.append([ONE_WAY_IN, node(0, 0), 30, 1, ROWS])
+    names = ["Avenue du Nord", "Boulevard du 30 Juin", "Avenue du Sud", "Rue transversale"]
+    return {"nodes": nodes, "names": names, "edges": edges}
+
+
+@pytest.fixture(scope="module")
+def graph_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("graph") / "grid.json"
+    path.write_text(json.dumps(grid_json()), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def router(graph_path):
+    return LocalRouter.load(graph_path)
+
+
+def coords(*nodes, graph):
+    return ";".join(f"{graph.lon[n]},{graph.lat[n]}" for n in nodes)
+
+
+def test_csr_build_and_edge_lookup(router):
+    graph = router.graph
+    two_way = (ROWS * (COLS - 1) + (ROWS - 1) * COLS) * 2
+    assert graph.num_nodes == ROWS * COLS + 2
+    assert graph.num_edges == two_way + 1
+    assert int(graph.fwd_offsets[-1]) == int(graph.bwd_offsets[-1]) == graph.num_edges
+    duration, length, name_id = graph.edge(node(1, 0), node(1, 1))
+    assert name_id == 1
+    assert duration == pytest.approx(length / (40 / 3.6), rel=1e-5)
+    assert graph.edge(ONE_WAY_IN, 0)[2] == ROWS
+    with pytest.raises(KeyError):
+        graph.edge(0, ONE_WAY_IN)
+    assert graph.nearest_node(-4.3051, 15.3049) == node(1, 1)
+
+
+def test_start_equals_end(router):
+    assert router.shortest_path(7, 7) == ([7], 0.0)
+    data = router.route(coords(7, 7, graph=router.graph))
+    assert data["code"] == "Ok"
+    assert data["routes"][0]["distance"] == 0
+
+
+def test_unreachable_nodes(router):
+    assert router.shortest_path(0, ISOLATED) == (None, float("inf"))
+    assert router.shortest_path(0, ONE_WAY_IN) == (None, float("inf"))
+    assert router.shortest_path(ONE_WAY_IN, node(2, 4))[0][:2] == [ONE_WAY_IN, 0]
+    assert router.route(coords(0, ISOLATED, graph=router.graph))["code"] == "NoRoute"
+    assert router.alternative_paths(0, ISOLATED, 3) == []
+    table = router.table(coords(0, ISOLATED, graph=router.graph))
+    assert table["durations"][0][1] is None and table["durations"][1][0] is None
+    assert table["durations"][1][1] == 0
+
+
+def test_shortest_path_follows_the_fast_row(router):
+    path, duration = router.shortest_path(node(1, 0), node(1, 4))
+    assert path == [node(1, col) for col in range(COLS)]
+    assert duration == pytest.approx(sum(router.graph.edge(u, v)[0] for u, v in zip(path, path[1:])))
+    data = router.route(coords(node(1, 0), node(1, 4), graph=router.graph))
+    assert data["routes"][0]["legs"][0]["summary"] == "Boulevard du 30 Juin"
+
+
+def test_alternatives_differ_from_primary_route(router):
+    source, target = node(1, 0), node(1, 4)
+    paths = router.alternative_paths(source, target, 3)
+    assert len(paths) >= 2
+    assert paths[0] == router.shortest_path(source, target)[0]
+    assert len({tuple(path) for path in paths}) == len(paths)
+    primary = router._path_edges(paths[0])
+    for path in paths[1:]:
+        assert path[0] == source and path[-1] == target
+        edges = router._path_edges(path)
+        shared = sum(length for key, length in edges.items() if key in primary)
+        assert shared / sum(edges.values()) <= MAX_OVERLAP
+
+    data = router.route(coords(source, target, graph=router.graph), {"alternatives": "true"})
+    geometries = [json.dumps(route["geometry"]) for route in data["routes"]]
+    assert len(geometries) >= 2 and len(set(geometries)) == len(geometries)
+
+
+def test_table_matches_shortest_paths_with_and_without_ch(router):
+    nodes = [node(0, 0), node(1, 2), node(2, 4)]
+    plain = router.table(coords(*nodes, graph=router.graph))
+    with_ch = LocalRouter(router.graph, ch=ContractionHierarchy(build_contraction_hierarchy(router.graph)))
+    fast = with_ch.table(coords(*nodes, graph=router.graph), {"sources": "0;2", "destinations": "1"})
+    for i, source in enumerate(nodes):
+        for j, target in enumerate(nodes):
+            expected = router.shortest_path(source, target)[1]
+            assert plain["durations"][i][j] == pytest.approx(expected, abs=0.1)
+    assert fast["durations"] == [[pytest.approx(plain["durations"][0][1], abs=0.1)],
+                                 [pytest.approx(plain["durations"][2][1], abs=0.1)]]
@@ -0,0 +1,30 @@
+import pytest
+
+from metrics import SamplingProfiler
+
+ROUTE_BODY = {"start_name": "Rond-point Victoire", "end_name": "Gare Centrale", "alternatives": 2}
+
+
+@pytest.fixture
+def profiler(app_module, monkeypatch, tmp_path):
+    profiler = SamplingProfiler(rate=1.0, directory=str(tmp_path))
+    monkeypatch.setattr(app_module, "profiler", profiler)
+    return profiler
+
+
+def test_json_response_is_profiled_and_timed(client, profiler, tmp_path):
+    response = client.post("/api/routes", json=ROUTE_BODY, headers={"X-Trace": "1"})
+    assert response.status_code == 200
+    assert "total;dur=" in response.headers["Server-Timing"]
+    assert len(list(tmp_path.glob("*.prof"))) == 1
+
+
+def test_streamed_response_is_not_profiled_nor_timed(client, profiler, tmp_path):
+    response = client.post("/api/routes", json=dict(ROUTE_BODY, stream=True), headers={"X-Trace": "1"})
+    assert response.status_code == 200
+    assert "event: done" in response.get_data(as_text=True)
+    assert "Server-Timing" not in response.headers
+    assert list(tmp_path.glob("*.prof")) == []
+    # Le profil jeté libère la place: la requête suivante est profilée
+    client.post("/api/routes", json=ROUTE_BODY)
+    assert len(list(tmp_path.glob("*.prof"))) == 1
@@ -0,0 +1,96 @@
+import json
+import os
+
+import pytest
+
+from places import PlaceStore, check_files, name_key
+
+LANDMARKS = [
+    {"name": "Rond-point Victoire", "lat": -4.340787, "lon": 15.313731, "image": "victoire.webp"},
+    {"name": "Gare Centrale", "lat": -4.301203, "lon": 15.317859},
+]
+POINTS_OF_INTEREST = [{"name": "Marché Central", "lat": -4.3125, "lon": 15.3094}]
+
+
+def write_json(path, items, mtime=None):
+    path.write_text(json.dumps(items), encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def store(tmp_path):
+    landmarks = tmp_path / "landmarks.json"
+    points = tmp_path / "points_of_interest.json"
+    write_json(landmarks, LANDMARKS, mtime=1_700_000_000)
+    write_json(points, POINTS_OF_INTEREST, mtime=1_700_000_000)
+    return PlaceStore(str(landmarks), str(points), lambda name, image: image and f"/uploads/{image}",
+                      check_interval=0)
+
+
+def test_initial_load(store):
+    snapshot = store.current()
+    assert sorted(snapshot.landmarks) == ["Gare Centrale", "Rond-point Victoire"]
+    assert snapshot.landmarks["Rond-point Victoire"].image == "/uploads/victoire.webp"
+    assert list(snapshot.points_of_interest) == ["Marché Central"]
+    assert store.stats()["version"] == 1
+
+
+def test_reloads_when_mtime_changes(store, tmp_path):
+    before = store.current()
+    assert store.current() is before
+    write_json(tmp_path / "landmarks.json", LANDMARKS + [{"name": "Gombe", "lat": -4.30, "lon": 15.30}],
+               mtime=1_700_000_100)
+    after = store.current()
+    assert after is not before
+    assert "Gombe" in after.landmarks and "Gombe" not in before.landmarks
+    assert after.version == before.version + 1
+    assert after.etag != before.etag
+    assert store.stats()["reloads"] == 2
+
+
+def test_malformed_file_keeps_previous_set(store, tmp_path, capsys):
+    before = store.current()
+    landmarks = tmp_path / "landmarks.json"
+    landmarks.write_text('[{"name": "Gombe", "lat": ', encoding="utf-8")
+    os.utime(landmarks, (1_700_000_200, 1_700_000_200))
+    assert store.current() is before
+    assert store.stats()["errors"] == 1
+    assert "Erreur chargement des lieux" in capsys.readouterr().out
+    # Pas de nouvelle lecture tant que le fichier ne change pas
+    assert store.current() is before and store.stats()["errors"] == 1
+    write_json(landmarks, LANDMARKS[:1], mtime=1_700_000_300)
+    assert list(store.current().landmarks) == ["Rond-point Victoire"]
+
+
+def test_check_interval_limits_stat_calls(tmp_path):
+    landmarks = tmp_path / "landmarks.json"
+    points = tmp_path / "points_of_interest.json"
+    write_json(landmarks, LANDMARKS, mtime=1_700_000_000)
+    write_json(points, [], mtime=1_700_000_000)
+    store = PlaceStore(str(landmarks), str(points), lambda name, image: image, check_interval=3600)
+    store.current()
+    write_json(landmarks, LANDMARKS[:1], mtime=1_700_000_100)
+    assert len(store.current().landmarks) == 2
+
+
+def test_find_landmark_exact_and_normalized(store):
+    snapshot = store.current()
+    assert snapshot.find_landmark("Gare Centrale").name == "Gare Centrale"
+    assert snapshot.find_landmark("rond point VICTOIRE").name == "Rond-point Victoire"
+    assert snapshot.find_landmark("  Rond-Point   Victoire! ").name == "Rond-point Victoire"
+    assert snapshot.find_landmark("Atlantide") is None
+    assert name_key("Marché Central") == "marche central"
+
+
+def test_current_without_file_checks_serves_snapshot(store, tmp_path):
+    before = store.current()
+    write_json(tmp_path / "landmarks.json", LANDMARKS[:1], mtime=1_700_000_100)
+    token = check_files.set(False)
+    try:
+        assert store.current() is before
+        after = store.refresh()
+    finally:
+        check_files.reset(token)
+    assert list(after.landmarks) == ["Rond-point Victoire"]
+    assert store.current() is after
@@ -0,0 +1,35 @@
+from places import Place
+from poi_index import PoiIndex
+
+
+def make_index(points):
+    return PoiIndex([Place(name, lat, lon) for name, lat, lon in points])
+
+
+def test_within_corridor_finds_poi_on_long_segment():
+    # Sommets à ~6,7 km l'un de l'autre: le POI au milieu du segment est loin de leurs cellules
+    index = make_index([("Milieu", -4.32, 15.33)])
+    result = index.within_corridor([[15.30, -4.32], [15.36, -4.32]], 500)
+    assert [place.name for place, _, _ in result] == ["Milieu"]
+    _, distance_m, position_m = result[0]
+    assert distance_m < 1.0
+    assert 3000 < position_m < 3700
+
+
+def test_within_corridor_diagonal_segment_and_radius():
+    index = make_index([("Proche", -4.3305, 15.3300), ("Loin", -4.3400, 15.3300)])
+    route = [[15.30, -4.30], [15.36, -4.36]]
+    names = [place.name for place, _, _ in index.within_corridor(route, 500)]
+    assert names == ["Proche"]
+
+
+def test_within_corridor_orders_along_route():
+    index = make_index([("B", -4.32, 15.35), ("A", -4.32, 15.31)])
+    result = index.within_corridor([[15.30, -4.32], [15.36, -4.32]], 200)
+    assert [place.name for place, _, _ in result] == ["A", "B"]
+
+
+def test_nearest_sorted_and_limited_by_radius():
+    index = make_index([("Loin", -4.33, 15.30), ("Proche", -4.3205, 15.30), ("Hors", -4.40, 15.30)])
+    result = index.nearest(-4.32, 15.30, radius_m=2000)
+    assert [place.name for place, _ in result] == ["Proche", "Loin"]
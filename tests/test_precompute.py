@@ -0,0 +1,33 @@
+from precompute import ARTIFACT_VERSION, PrecomputedRoutes, save_artifact
+
+OSRM_BASE = "https://router.project-osrm.org"
+
+
+def write_artifact(tmp_path, osrm_base=OSRM_BASE):
+    path = str(tmp_path / "landmark_routes.json.gz")
+    save_artifact({
+        "version": ARTIFACT_VERSION,
+        "generated_at": 1700000000,
+        "osrm_base": osrm_base,
+        "precision": 5,
+        "landmarks": ["Gare Centrale", "Rond-point Victoire"],
+        "responses": {"clé": {"code": "Ok", "routes": []}},
+        "pairs": [["Gare Centrale", "Rond-point Victoire"]],
+    }, path)
+    return path
+
+
+def test_load_matching_backend(tmp_path):
+    routes = PrecomputedRoutes.load(write_artifact(tmp_path), OSRM_BASE)
+    assert routes.stats()["loaded"]
+    assert routes.has_pair("Gare Centrale", "Rond-point Victoire")
+
+
+def test_load_skips_artifact_from_another_backend(tmp_path, capsys):
+    path = write_artifact(tmp_path)
+    for backend_url in ("local", "http://localhost:5000"):
+        routes = PrecomputedRoutes.load(path, backend_url)
+        assert not routes.stats()["loaded"]
+        assert not routes.responses and not routes.pairs
+        assert routes.get([[15.3, -4.3], [15.31, -4.31]], {}) is None
+    assert capsys.readouterr().out.count("ignorés") == 2
@@ -0,0 +1,112 @@
+import json
+
+import pytest
+
+import route_cache
+from route_cache import MemoryBackend, RouteCache, SQLiteBackend, create_route_cache, make_route_key
+
+POINTS = [{"lat": -4.3407871, "lon": 15.3137312}, {"lat": -4.301203, "lon": 15.317859}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(route_cache.time, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend(max_entries=3, max_bytes=10_000)
+    return SQLiteBackend(str(tmp_path / "routes.sqlite3"), max_entries=3, max_bytes=10_000)
+
+
+def test_make_route_key_rounds_coordinates_and_sorts_params():
+    key = make_route_key("route", POINTS, {"steps": "false", "alternatives": "true"}, precision=4)
+    assert key == "route/15.3137,-4.3408;15.3179,-4.3012?alternatives=true&steps=false"
+
+
+def test_ttl_expiry(backend, clock):
+    backend.set("a", {"code": "Ok"}, ttl=60)
+    clock.now += 59
+    assert backend.get("a") == {"code": "Ok"}
+    clock.now += 2
+    assert backend.get("a") is None
+    assert backend.stats()["entries"] == 0
+
+
+def test_lru_eviction_keeps_recently_used(backend, clock):
+    for key in ("a", "b", "c"):
+        backend.set(key, {"key": key}, ttl=60)
+        clock.now += 1
+    assert backend.get("a") == {"key": "a"}
+    clock.now += 1
+    backend.set("d", {"key": "d"}, ttl=60)
+    assert backend.get("b") is None
+    assert [backend.get(key) is not None for key in ("a", "c", "d")] == [True, True, True]
+    assert backend.stats()["evictions"] >= 1
+
+
+def test_memory_byte_cap(clock):
+    value = {"data": "x" * 400}
+    size = len(json.dumps(value, separators=(",", ":")))
+    backend = MemoryBackend(max_entries=100, max_bytes=size * 2)
+    for key in ("a", "b", "c"):
+        backend.set(key, value, ttl=60)
+    assert backend.stats()["bytes"] <= size * 2
+    assert backend.get("a") is None and backend.get("c") == value
+    backend.set("big", {"data": "x" * (size * 3)}, ttl=60)
+    assert backend.get("big") is None
+
+
+def test_sqlite_byte_cap_and_shared_file(tmp_path, clock):
+    path = str(tmp_path / "routes.sqlite3")
+    backend = SQLiteBackend(path, max_entries=100, max_bytes=2_000)
+    # Données peu compressibles: chaque entrée pèse quelques centaines d'octets
+    for i in range(20):
+        backend.set(f"k{i}", {"data": [i * 7919 % 10007 + j * 104729 for j in range(60)]}, ttl=60)
+        clock.now += 1
+    assert backend.stats()["bytes"] <= 2_000
+    assert backend.get("k19") is not None
+    # Un second worker voit les mêmes entrées
+    assert SQLiteBackend(path).get("k19") == backend.get("k19")
+
+
+def test_route_cache_counts_hits_and_namespaces_keys(tmp_path, clock):
+    path = str(tmp_path / "routes.sqlite3")
+    osrm = create_route_cache("sqlite", path, namespace="https://router.project-osrm.org")
+    local = create_route_cache("sqlite", path, namespace="local")
+    key = osrm.key("route", POINTS, {})
+    assert key != local.key("route", POINTS, {})
+    osrm.set(key, {"code": "Ok"})
+    assert osrm.get(key) == {"code": "Ok"}
+    assert local.get(local.key("route", POINTS, {})) is None
+    stats = osrm.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 0, 1.0)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_route_cache("redis")
+
+
+def test_backend_errors_count_as_misses(capsys):
+    class Broken:
+        name = "broken"
+
+        def get(self, key):
+            raise OSError("disque plein")
+
+    cache = RouteCache(Broken())
+    assert cache.get("a") is None
+    assert cache.misses == 1
+    assert "disque plein" in capsys.readouterr().out
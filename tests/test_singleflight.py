@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return {"code": "Ok"}
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", fn, timeout=5)))
+               for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    while flight.calls < 6:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == [{"code": "Ok"}] * 6
+    stats = flight.stats()
+    assert (stats["calls"], stats["executions"], stats["coalesced"], stats["in_flight"]) == (6, 1, 5, 0)
+
+
+def test_leader_exception_reaches_followers():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise ConnectionError("OSRM indisponible")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("k", fn, timeout=5)
+        except ConnectionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while flight.calls < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(errors) == 4
+    assert len({id(e) for e in errors}) == 1
+    assert flight.stats()["errors"] == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_follower_timeout_does_not_wait_forever():
+    flight = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=flight.do, args=("k", lambda: release.wait(5)))
+    leader.start()
+    while flight.calls < 1:
+        time.sleep(0.01)
+    with pytest.raises(TimeoutError):
+        flight.do("k", lambda: None, timeout=0.05)
+    release.set()
+    leader.join(5)
+
+
+def test_async_concurrent_callers_share_one_call():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"code": "Ok"}
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{"code": "Ok"}] * 5
+    assert calls == [1]
+    assert flight.stats()["coalesced"] == 4
+
+
+def test_async_leader_exception_reaches_followers():
+    flight = AsyncSingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ConnectionError("OSRM indisponible")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ConnectionError) for r in results)
+    assert flight.stats()["errors"] == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_cancelled_follower_does_not_cancel_shared_task():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "réponse"
+
+    async def main():
+        leader = asyncio.create_task(flight.do("k", fetch))
+        follower = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(main()) == "réponse"
+    assert calls == [1]
+
+
+def test_async_cancelled_leader_does_not_cancel_shared_task():
+    flight = AsyncSingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "réponse"
+
+    async def main():
+        leader = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == "réponse"
@@ -0,0 +1,109 @@
+import sqlite3
+
+import pytest
+import requests
+
+from tiles import TileStore, build_mbtiles, lonlat_to_tile, tile_count, tile_range, tile_url
+
+# Petite emprise autour de la Gombe
+BBOX = (15.30, -4.32, 15.32, -4.30)
+SOURCE = "https://tiles.example.org/{z}/{x}/{y}.png"
+
+
+class FakeResponse:
+    def __init__(self, content, status=200):
+        self.content = content
+        self.status = status
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise requests.HTTPError(f"HTTP {self.status}")
+
+
+class FakeSession:
+    """Répond à chaque tuile par son adresse XYZ ("z/x/y"); `missing` renvoie 404"""
+
+    def __init__(self, missing=()):
+        self.headers = {}
+        self.missing = set(missing)
+        self.urls = []
+
+    def get(self, url, timeout=None):
+        self.urls.append(url)
+        z, x, y = url.rsplit("/", 3)[1:]
+        address = f"{z}/{x}/{y.split('.')[0]}"
+        return FakeResponse(b"", 404) if address in self.missing else FakeResponse(address.encode())
+
+
+@pytest.fixture
+def mbtiles(tmp_path):
+    path = str(tmp_path / "kinshasa.mbtiles")
+    counts = build_mbtiles(path, BBOX, 10, 12, SOURCE, delay=0, attribution="© Test", session=FakeSession())
+    assert counts == {"fetched": tile_count(BBOX, 10, 12), "skipped": 0, "failed": 0}
+    return path
+
+
+def test_lonlat_to_tile():
+    assert lonlat_to_tile(15.31, -4.31, 0) == (0, 0)
+    x, y = lonlat_to_tile(15.31, -4.31, 12)
+    assert (x, y) == (2222, 2097)
+    assert tile_url("https://{s}.tile.example.org/{z}/{x}/{y}.png", 12, x, y) == \
+        "https://c.tile.example.org/12/2222/2097.png"
+
+
+def test_build_stores_rows_in_tms_order(mbtiles):
+    x_min, y_min, _, _ = tile_range(BBOX, 12)
+    with sqlite3.connect(mbtiles) as conn:
+        data = conn.execute("SELECT tile_data FROM tiles WHERE zoom_level = 12 AND tile_column = ?"
+                            " AND tile_row = ?", (x_min, (1 << 12) - 1 - y_min)).fetchone()[0]
+        metadata = dict(conn.execute("SELECT name, value FROM metadata").fetchall())
+    assert bytes(data) == f"12/{x_min}/{y_min}".encode()
+    assert metadata["format"] == "png"
+    assert (metadata["minzoom"], metadata["maxzoom"]) == ("10", "12")
+    assert metadata["attribution"] == "© Test"
+
+
+def test_build_resumes_and_counts_failures(tmp_path):
+    path = str(tmp_path / "kinshasa.mbtiles")
+    x_min, y_min, _, _ = tile_range(BBOX, 12)
+    missing = f"12/{x_min}/{y_min}"
+    counts = build_mbtiles(path, BBOX, 12, 12, SOURCE, delay=0, session=FakeSession(missing=[missing]))
+    total = tile_count(BBOX, 12, 12)
+    assert counts == {"fetched": total - 1, "skipped": 0, "failed": 1}
+    session = FakeSession()
+    counts = build_mbtiles(path, BBOX, 12, 12, SOURCE, delay=0, session=session)
+    assert counts == {"fetched": 1, "skipped": total - 1, "failed": 0}
+    assert session.urls == [f"https://tiles.example.org/{missing}.png"]
+
+
+def test_tile_store_flips_y(mbtiles):
+    store = TileStore.open(mbtiles)
+    x, y = lonlat_to_tile(15.31, -4.31, 11)
+    assert store.get(11, x, y) == f"11/{x}/{y}".encode()
+    assert store.get(11, x, y + 100) is None
+    assert (store.min_zoom, store.max_zoom, store.mimetype) == (10, 12, "image/png")
+    assert store.stats()["hits"] == 1 and store.stats()["misses"] == 1
+    assert TileStore.open("") is None
+
+
+def test_serve_tiles(client, app_module, monkeypatch, mbtiles):
+    monkeypatch.setattr(app_module, "tile_store", TileStore.open(mbtiles))
+    monkeypatch.setattr(app_module, "MAP_TILE_URL", "")
+    x, y = lonlat_to_tile(15.31, -4.31, 12)
+    response = client.get(f"/tiles/12/{x}/{y}.png")
+    assert response.status_code == 200
+    assert response.mimetype == "image/png"
+    assert response.data == f"12/{x}/{y}".encode()
+    assert response.headers["ETag"]
+    assert client.get(f"/tiles/12/{x}/{y}.png", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+    assert client.get(f"/tiles/12/{x}/{y + 100}.png").status_code == 404
+    assert client.get("/tiles/3/8/0.png").status_code == 404
+
+
+def test_missing_tile_redirects_upstream_when_configured(client, app_module, monkeypatch, mbtiles):
+    monkeypatch.setattr(app_module, "tile_store", TileStore.open(mbtiles))
+    monkeypatch.setattr(app_module, "MAP_TILE_URL", SOURCE)
+    response = client.get("/tiles/5/1/2.png")
+    assert response.status_code == 302
+    assert response.headers["Location"] == "https://tiles.example.org/5/1/2.png"
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from geometry import RouteGeometry
+from traffic import DEFAULT_PROFILE, KINSHASA_TZ, TrafficModel, build_profiles, parse_depart_at
+
+# Cellule de 0,02° [15.30, 15.32) x [-4.32, -4.30): lundi 8 h observé à 50 % de la vitesse libre
+CELL_OBSERVATIONS = [(-4.315, 15.305, 0, 8, ratio) for ratio in (0.45, 0.5, 0.55)]
+INSIDE = RouteGeometry([[15.302, -4.312], [15.308, -4.318]])
+OUTSIDE = RouteGeometry([[15.402, -4.412], [15.408, -4.418]])
+
+
+def at(value):
+    return datetime.fromisoformat(value).replace(tzinfo=KINSHASA_TZ)
+
+
+@pytest.fixture
+def model():
+    return build_profiles(CELL_OBSERVATIONS, cell_deg=0.02)
+
+
+def test_rows_fall_back_to_default_profile(model):
+    rows = model.rows(np.array([-4.315, -4.415]), np.array([15.305, 15.405]))
+    assert rows.tolist() == [0, 1]
+
+
+def test_factor_lookup_by_cell_weekday_and_hour(model):
+    monday_8h = at("2024-05-13T08:00")
+    assert model.predict_duration(INSIDE, 120, monday_8h) == pytest.approx(120 / 0.5)
+    # Même cellule, autre jour ou autre heure: profil par défaut (pas assez d'observations)
+    tuesday_8h = at("2024-05-14T08:00")
+    assert model.predict_duration(INSIDE, 120, tuesday_8h) == pytest.approx(120 / (DEFAULT_PROFILE[1][8] / 100))
+    monday_3h = at("2024-05-13T03:00")
+    assert model.predict_duration(INSIDE, 120, monday_3h) == pytest.approx(120 / (DEFAULT_PROFILE[0][3] / 100))
+    # Hors de la cellule: profil par défaut, y compris le dimanche
+    assert model.predict_duration(OUTSIDE, 120, monday_8h) == pytest.approx(120 / (DEFAULT_PROFILE[0][8] / 100))
+    sunday_8h = at("2024-05-19T08:00")
+    assert model.predict_duration(OUTSIDE, 120, sunday_8h) == pytest.approx(120 / (DEFAULT_PROFILE[6][8] / 100))
+
+
+def test_too_few_samples_keep_default_profile():
+    model = build_profiles(CELL_OBSERVATIONS[:2], cell_deg=0.02)
+    assert model.factors[0, 0, 8] == DEFAULT_PROFILE[0][8]
+
+
+def test_save_load_round_trip(model, tmp_path):
+    path = str(tmp_path / "traffic_profiles.bin")
+    model.save(path)
+    loaded = TrafficModel.load(path)
+    assert loaded.path == path
+    assert loaded.cell_deg == model.cell_deg
+    assert loaded.meta == model.meta
+    assert loaded.keys.tolist() == model.keys.tolist()
+    assert (loaded.factors == model.factors).all()
+    depart_at = at("2024-05-13T08:00")
+    assert loaded.predict_duration(INSIDE, 120, depart_at) == model.predict_duration(INSIDE, 120, depart_at)
+
+
+def test_load_missing_or_invalid_file_uses_default(tmp_path):
+    assert TrafficModel.load(str(tmp_path / "absent.bin")).stats()["source"] == "default"
+    path = tmp_path / "invalid.bin"
+    path.write_bytes(b"PASUNPROFIL")
+    assert TrafficModel.load(str(path)).stats()["source"] == "default"
+
+
+def test_parse_depart_at():
+    assert parse_depart_at(None) == (None, None)
+    depart_at, error = parse_depart_at("2024-05-13T07:30:45Z")
+    assert error is None
+    assert depart_at.isoformat() == "2024-05-13T08:30:00+01:00"
+    assert parse_depart_at("now")[0].tzinfo == KINSHASA_TZ
+    assert parse_depart_at("demain")[0] is None
@@ -0,0 +1,208 @@
+"""Tuiles de carte hors ligne: fichier MBTiles (SQLite) couvrant l'emprise des landmarks.
+
+Format MBTiles 1.3: table `metadata` (name, value) et table `tiles`
+(zoom_level, tile_column, tile_row, tile_data), lignes numérotées en TMS
+(origine en bas: tile_row = 2^z - 1 - y). Le fichier est construit une fois
+(flask build-tiles) puis servi par /tiles/<z>/<x>/<y>.png sans passer par le
+serveur de tuiles amont.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+USER_AGENT = "kinshasa-itineraire/1.0 (build-tiles)"
+
+TILE_MIMETYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "webp": "image/webp",
+    "pbf": "application/x-protobuf",
+}
+
+# Latitude maximale de la projection Web Mercator
+MAX_LATITUDE = 85.0511287798
+
+
+def lonlat_to_tile(lon, lat, zoom):
+    """Tuile (x, y) en numérotation XYZ contenant le point, au niveau `zoom`"""
+    n = 1 << zoom
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_range(bbox, zoom):
+    """Bornes (x_min, y_min, x_max, y_max) des tuiles couvrant l'emprise (ouest, sud, est, nord)"""
+    west, south, east, north = bbox
+    x_min, y_min = lonlat_to_tile(west, north, zoom)
+    x_max, y_max = lonlat_to_tile(east, south, zoom)
+    return x_min, y_min, x_max, y_max
+
+
+def bbox_tiles(bbox, zoom):
+    """Tuiles (x, y) couvrant l'emprise au niveau `zoom`"""
+    x_min, y_min, x_max, y_max = tile_range(bbox, zoom)
+    for x in range(x_min, x_max + 1):
+        for y in range(y_min, y_max + 1):
+            yield x, y
+
+
+def tile_count(bbox, min_zoom, max_zoom):
+    total = 0
+    for zoom in range(min_zoom, max_zoom + 1):
+        x_min, y_min, x_max, y_max = tile_range(bbox, zoom)
+        total += (x_max - x_min + 1) * (y_max - y_min + 1)
+    return total
+
+
+def places_bbox(places, margin_deg=0.02):
+    """Emprise (ouest, sud, est, nord) des lieux, élargie de margin_deg degrés"""
+    lons = [place.lon for place in places]
+    lats = [place.lat for place in places]
+    return (min(lons) - margin_deg, min(lats) - margin_deg, max(lons) + margin_deg, max(lats) + margin_deg)
+
+
+def tile_url(template, zoom, x, y):
+    """URL amont d'une tuile ({z}, {x}, {y} et éventuellement {s} pour les sous-domaines a/b/c)"""
+    return (template.replace("{s}", "abc"[(x + y) % 3])
+            .replace("{z}", str(zoom)).replace("{x}", str(x)).replace("{y}", str(y)))
+
+
+def tile_format(template):
+    extension = os.path.splitext(template.split("?", 1)[0])[1].lstrip(".").lower()
+    return "jpg" if extension == "jpeg" else (extension if extension in TILE_MIMETYPES else "png")
+
+
+def open_mbtiles(path):
+    """Connexion en écriture, schéma créé si besoin"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER,"
+                 " tile_row INTEGER, tile_data BLOB)")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row)")
+    return conn
+
+
+def build_mbtiles(path, bbox, min_zoom, max_zoom, source_url, delay=0.1, name="Kinshasa",
+                  attribution="", timeout=15.0, session=None, progress=None):
+    """Télécharge les tuiles de l'emprise dans le fichier MBTiles `path`.
+
+    Reprend là où une exécution précédente s'est arrêtée: les tuiles déjà
+    présentes ne sont pas redemandées. `delay` espace les requêtes pour
+    respecter la politique d'usage du serveur amont. Retourne les compteurs
+    {fetched, skipped, failed}.
+    """
+    session = session or requests.Session()
+    session.headers.setdefault("User-Agent", USER_AGENT)
+    fmt = tile_format(source_url)
+    west, south, east, north = bbox
+    conn = open_mbtiles(path)
+    metadata = {
+        "name": name,
+        "format": fmt,
+        "type": "baselayer",
+        "version": "1",
+        "bounds": f"{west:.6f},{south:.6f},{east:.6f},{north:.6f}",
+        "center": f"{(west + east) / 2:.6f},{(south + north) / 2:.6f},{min(max_zoom, max(min_zoom, 13))}",
+        "minzoom": str(min_zoom),
+        "maxzoom": str(max_zoom),
+        "attribution": attribution,
+        "generated_at": str(int(time.time())),
+    }
+    conn.executemany("INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)", metadata.items())
+    conn.commit()
+
+    counts = {"fetched": 0, "skipped": 0, "failed": 0}
+    try:
+        for zoom in range(min_zoom, max_zoom + 1):
+            for x, y in bbox_tiles(bbox, zoom):
+                row = (1 << zoom) - 1 - y
+                exists = conn.execute("SELECT 1 FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                                      (zoom, x, row)).fetchone()
+                if exists:
+                    counts["skipped"] += 1
+                    continue
+                try:
+                    r = session.get(tile_url(source_url, zoom, x, y), timeout=timeout)
+                    r.raise_for_status()
+                except requests.RequestException as e:
+                    print(f"Erreur tuile {zoom}/{x}/{y}: {e}")
+                    counts["failed"] += 1
+                    continue
+                conn.execute("INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data)"
+                             " VALUES (?, ?, ?, ?)", (zoom, x, row, sqlite3.Binary(r.content)))
+                counts["fetched"] += 1
+                if counts["fetched"] % 100 == 0:
+                    conn.commit()
+                    if progress:
+                        progress(counts)
+                if delay:
+                    time.sleep(delay)
+        conn.commit()
+    finally:
+        conn.close()
+    return counts
+
+
+class TileStore:
+    """Tuiles d'un fichier MBTiles, lues en lecture seule (une connexion SQLite par thread)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        metadata = dict(self._conn().execute("SELECT name, value FROM metadata").fetchall())
+        self.metadata = metadata
+        self.format = metadata.get("format", "png")
+        self.mimetype = TILE_MIMETYPES.get(self.format, "application/octet-stream")
+        self.min_zoom = int(metadata.get("minzoom", 0))
+        self.max_zoom = int(metadata.get("maxzoom", 22))
+        self.bounds = [float(v) for v in metadata["bounds"].split(",")] if metadata.get("bounds") else None
+
+    @classmethod
+    def open(cls, path):
+        """TileStore du fichier `path`, ou None s'il est absent ou illisible"""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            return cls(path)
+        except sqlite3.Error as e:
+            print(f"Erreur ouverture des tuiles {path}: {e}")
+            return None
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def get(self, zoom, x, y):
+        """Contenu de la tuile XYZ (bytes), ou None si elle n'est pas dans le fichier"""
+        row = self._conn().execute(
+            "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (zoom, x, (1 << zoom) - 1 - y)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return bytes(row[0])
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "format": self.format,
+            "min_zoom": self.min_zoom,
+            "max_zoom": self.max_zoom,
+            "bounds": self.bounds,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
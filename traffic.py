@@ -0,0 +1,208 @@
+"""Temps de parcours selon l'heure de départ: profils de vitesse par zone, jour et heure.
+
+Un profil donne, pour chaque cellule de `cell_deg` degrés, jour de la semaine
+(0 = lundi) et heure, la vitesse observée en pourcentage de la vitesse libre
+estimée par OSRM. Les cellules sans observations suivent le profil par défaut.
+Fichier binaire compact, mappable en mémoire comme l'index CH:
+
+    b"KTP1" | longueur de l'en-tête (uint32) | en-tête JSON | tableaux alignés
+
+- keys: int64 [n], clés des cellules (ix << 32 | iy), triées
+- factors: uint8 [n + 1, 7, 24], pourcentages; la dernière ligne est le profil par défaut
+"""
+import csv
+import json
+import mmap
+import os
+import struct
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+MAGIC = b"KTP1"
+ALIGN = 64
+
+# Heure de Kinshasa (WAT, UTC+1, sans heure d'été)
+KINSHASA_TZ = timezone(timedelta(hours=1), "WAT")
+
+# Facteur minimum appliqué (5 % de la vitesse libre) pour borner les prédictions
+MIN_FACTOR = 0.05
+
+# Profil par défaut (% de la vitesse libre), heure par heure: pointes du matin et du soir
+# en semaine, samedi plus diffus, dimanche matin chargé autour des offices
+WEEKDAY_PROFILE = [95, 100, 100, 100, 95, 80, 55, 40, 35, 45, 60, 65,
+                   65, 60, 55, 45, 38, 35, 40, 55, 70, 80, 90, 95]
+SATURDAY_PROFILE = [95, 100, 100, 100, 100, 95, 85, 75, 65, 60, 55, 55,
+                    55, 55, 55, 55, 55, 60, 65, 70, 75, 85, 90, 95]
+SUNDAY_PROFILE = [100, 100, 100, 100, 100, 100, 95, 80, 70, 70, 75, 75,
+                  80, 85, 85, 85, 80, 75, 75, 80, 85, 90, 95, 100]
+DEFAULT_PROFILE = [WEEKDAY_PROFILE] * 5 + [SATURDAY_PROFILE, SUNDAY_PROFILE]
+
+
+def cell_keys(lats, lons, cell_deg):
+    """Clés int64 des cellules contenant les points"""
+    ix = np.floor(np.asarray(lons) / cell_deg).astype(np.int64)
+    iy = np.floor(np.asarray(lats) / cell_deg).astype(np.int64)
+    return (ix << 32) | (iy & 0xFFFFFFFF)
+
+
+def parse_depart_at(value):
+    """Heure de départ ISO 8601 (heure de Kinshasa si sans fuseau) ou "now"; retourne (datetime, erreur).
+
+    Arrondie à la minute: les requêtes d'une même minute partagent la même clé (lots dédupliqués).
+    Sans valeur, retourne (None, None): pas de prédiction, classement par distance.
+    """
+    if value is None:
+        return None, None
+    if value == "now":
+        depart_at = datetime.now(KINSHASA_TZ)
+    else:
+        try:
+            depart_at = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None, "depart_at must be an ISO 8601 datetime (e.g. 2024-05-13T07:30) or 'now'"
+        if depart_at.tzinfo is None:
+            depart_at = depart_at.replace(tzinfo=KINSHASA_TZ)
+    return depart_at.astimezone(KINSHASA_TZ).replace(second=0, microsecond=0), None
+
+
+class TrafficModel:
+    """Profils de vitesse chargés en mémoire; prédit la durée d'un tracé pour une heure de départ"""
+
+    def __init__(self, keys, factors, cell_deg=0.02, meta=None, path=None):
+        self.keys = np.asarray(keys, dtype=np.int64)
+        self.factors = np.asarray(factors, dtype=np.uint8)
+        # Vue [cellule, créneau de la semaine] en facteurs (1.0 = vitesse libre)
+        self.slots = self.factors.reshape(len(self.factors), 7 * 24).astype(np.float64) / 100.0
+        np.maximum(self.slots, MIN_FACTOR, out=self.slots)
+        self.cell_deg = cell_deg
+        self.meta = meta or {}
+        self.path = path
+        self.predictions = 0
+
+    @classmethod
+    def default(cls):
+        """Profil par défaut seul, sans cellules observées"""
+        return cls(np.zeros(0, dtype=np.int64), np.array([DEFAULT_PROFILE], dtype=np.uint8),
+                   meta={"source": "default"})
+
+    @classmethod
+    def load(cls, path):
+        """Profils du fichier `path`; profil par défaut si le fichier est absent ou invalide"""
+        if not path or not os.path.exists(path):
+            return cls.default()
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError("en-tête invalide")
+                (header_len,) = struct.unpack("<I", f.read(4))
+                header = json.loads(f.read(header_len).decode("utf-8"))
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception as e:
+            print(f"Erreur chargement profils de trafic {path}: {e}")
+            return cls.default()
+        data_start = len(MAGIC) + 4 + header_len
+        data_start += (-data_start) % ALIGN
+        arrays = {}
+        for spec in header["arrays"]:
+            dtype = np.dtype(spec["dtype"])
+            shape = tuple(spec["shape"])
+            arrays[spec["name"]] = np.frombuffer(buffer, dtype=dtype, count=int(np.prod(shape)),
+                                                 offset=data_start + spec["offset"]).reshape(shape)
+        return cls(arrays["keys"], arrays["factors"], header["cell_deg"], header.get("meta"), path=path)
+
+    def save(self, path):
+        """Écrit les profils (écriture atomique)"""
+        arrays = {"keys": np.ascontiguousarray(self.keys), "factors": np.ascontiguousarray(self.factors)}
+        specs = []
+        offset = 0
+        for name, array in arrays.items():
+            specs.append({"name": name, "dtype": array.dtype.str, "shape": list(array.shape), "offset": offset})
+            offset += array.nbytes
+            offset += (-offset) % ALIGN
+        header = json.dumps({"arrays": specs, "cell_deg": self.cell_deg, "meta": self.meta},
+                            ensure_ascii=False).encode("utf-8")
+        data_start = len(MAGIC) + 4 + len(header)
+        data_start += (-data_start) % ALIGN
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            for spec in specs:
+                f.write(b"\0" * (data_start + spec["offset"] - f.tell()))
+                f.write(arrays[spec["name"]].tobytes())
+        os.replace(tmp_path, path)
+
+    def rows(self, lats, lons):
+        """Ligne de profil de chaque point (profil par défaut hors des cellules observées)"""
+        default = len(self.factors) - 1
+        if len(self.keys) == 0:
+            return np.full(len(np.atleast_1d(lats)), default)
+        keys = cell_keys(lats, lons, self.cell_deg)
+        index = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[index] == keys, index, default)
+
+    def predict_duration(self, shape, duration_s, depart_at):
+        """Durée prévue (s) d'un tracé (RouteGeometry) de durée libre OSRM `duration_s`.
+
+        La durée libre est répartie sur les segments au prorata de leur longueur,
+        puis chaque segment est ralenti selon le profil de sa cellule au créneau
+        où on l'atteint: un second passage recale les créneaux avec les durées
+        prévues du premier (trajet qui déborde sur l'heure suivante).
+        """
+        self.predictions += 1
+        slot_start = depart_at.weekday() * 24 + depart_at.hour + depart_at.minute / 60.0
+        total_km = float(shape.segment_km.sum()) if len(shape) > 1 else 0.0
+        if total_km == 0:
+            rows = self.rows(shape.lat[:1], shape.lon[:1]) if len(shape) else np.array([len(self.factors) - 1])
+            return duration_s / self.slots[rows[0], int(slot_start) % 168]
+
+        rows = self.rows((shape.lat[:-1] + shape.lat[1:]) / 2, (shape.lon[:-1] + shape.lon[1:]) / 2)
+        free_flow = duration_s * shape.segment_km / total_km
+        offsets_h = np.zeros(len(free_flow))
+        for _ in range(2):
+            slots = (slot_start + offsets_h).astype(np.int64) % 168
+            times = free_flow / self.slots[rows, slots]
+            offsets_h = (np.cumsum(times) - times) / 3600.0
+        return float(times.sum())
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "cells": int(len(self.keys)),
+            "cell_deg": self.cell_deg,
+            "source": self.meta.get("source"),
+            "predictions": self.predictions,
+        }
+
+
+def build_profiles(observations, cell_deg=0.02, min_samples=3):
+    """Profils depuis des observations (lat, lon, jour 0-6, heure 0-23, rapport vitesse/vitesse libre).
+
+    Médiane par cellule et créneau; les créneaux avec moins de `min_samples`
+    observations reprennent le profil par défaut.
+    """
+    samples = {}
+    for lat, lon, weekday, hour, ratio in observations:
+        key = int(cell_keys(lat, lon, cell_deg))
+        samples.setdefault(key, {}).setdefault((int(weekday), int(hour)), []).append(float(ratio))
+
+    keys = sorted(samples)
+    factors = np.empty((len(keys) + 1, 7, 24), dtype=np.uint8)
+    factors[:] = np.array(DEFAULT_PROFILE, dtype=np.uint8)
+    for row, key in enumerate(keys):
+        for (weekday, hour), ratios in samples[key].items():
+            if len(ratios) >= min_samples:
+                factors[row, weekday, hour] = int(np.clip(round(np.median(ratios) * 100), 1, 255))
+    meta = {"source": "observations", "samples": sum(len(r) for cell in samples.values() for r in cell.values())}
+    return TrafficModel(np.array(keys, dtype=np.int64), factors, cell_deg, meta)
+
+
+def read_observations(path):
+    """Observations CSV avec en-tête: lat, lon, weekday, hour, speed_ratio"""
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield (float(row["lat"]), float(row["lon"]), int(row["weekday"]), int(row["hour"]),
+                   float(row["speed_ratio"]))